@@ -0,0 +1,84 @@
+from signal_filters import SmaFilter
+
+
+class AccessPoint:
+    def __init__(self, ssid: str, bssid: str, ip: str):
+        self.ssid = ssid
+        self.bssid = bssid.lower()
+        self.ip = ip
+
+    def __repr__(self):
+        return "{} ({})".format(self.ssid, self.bssid)
+
+
+class ApSelector:
+    """
+    Ranks the candidate APs by their filtered signal (scan results or, for the AP the station is connected to, link
+    measurements). 'signal_filter' creates the filter of each AP, by default a moving average over 'window' samples.
+    An AP qualifies if its latest signal reaches 'min_signal'. Another AP is only preferred over the current one if its
+    average signal is at least 'hysteresis' dB stronger, so the station does not roam back and forth between two APs
+    with similar signals.
+    """
+
+    def __init__(self, aps: list, window: int = 3, hysteresis: float = 3.0, min_signal: float = -70.0,
+                 signal_filter=None):
+        self.aps = {ap.bssid: ap for ap in aps}
+        self.hysteresis = hysteresis
+        self.min_signal = min_signal
+        self.filters = {ap.bssid: signal_filter() if signal_filter else SmaFilter(window) for ap in aps}
+        self.last_signals = {ap.bssid: None for ap in aps}
+
+    def __len__(self):
+        return len(self.aps)
+
+    def get(self, bssid: str):
+        return self.aps.get(bssid.lower()) if bssid else None
+
+    def update(self, bssid: str, signal: float):
+        """
+        Adds a signal measurement of an AP. Measurements of BSSs that are no candidates are ignored.
+        """
+        bssid = bssid.lower()
+        if bssid in self.filters and signal is not None:
+            self.filters[bssid].update(signal)
+            self.last_signals[bssid] = signal
+
+    def clear(self, bssid: str = None):
+        """
+        Forgets the measurements of one AP (e.g. after the connection to it was lost) or of all APs.
+        """
+        for key, signal_filter in self.filters.items():
+            if bssid is None or key == bssid.lower():
+                signal_filter.reset()
+                self.last_signals[key] = None
+
+    def average(self, bssid: str):
+        signal_filter = self.filters.get(bssid.lower())
+        return signal_filter.value if signal_filter else None
+
+    def qualifies(self, bssid: str):
+        signal = self.last_signals.get(bssid.lower())
+        return signal is not None and signal >= self.min_signal
+
+    def ranking(self):
+        """
+        Returns the qualifying APs as a list of tuples (average signal, AP), strongest first.
+        """
+        return sorted(((self.average(bssid), ap) for bssid, ap in self.aps.items() if self.qualifies(bssid)),
+                      key=lambda item: item[0], reverse=True)
+
+    def best(self, current: str = None, exclude: str = None):
+        """
+        Returns the AP to connect to or None if no AP qualifies.
+        If 'current' (the BSSID of the connected AP) is given, another AP is only returned if it beats the current one
+        by the hysteresis, otherwise the current AP is returned. 'exclude' skips an AP (e.g. the one that was just lost).
+        """
+        ranking = [(average, ap) for average, ap in self.ranking() if not exclude or ap.bssid != exclude.lower()]
+        if not ranking:
+            return None
+        average, ap = ranking[0]
+        current_average = self.average(current) if current else None
+        if current and ap.bssid != current.lower() and current_average is not None and \
+                average < current_average + self.hysteresis:
+            return self.get(current)
+        return ap
@@ -0,0 +1,86 @@
+import argparse
+import random
+import re
+import timeit
+
+from scan_table import ScanTable
+
+
+def synthetic_scan_dump(entries: int, seed: int = 0):
+    """
+    Returns an 'iw scan dump' like output with the given number of BSS entries (including some information elements).
+    The last entry is the AP that is looked up.
+    """
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(entries):
+        bssid = "02:00:00:{:02x}:{:02x}:00".format(i // 256, i % 256)
+        blocks.append("BSS {}(on sta1-wlan1)\n"
+                      "\tTSF: {} usec (0d, 00:00:00)\n"
+                      "\tfreq: {}\n"
+                      "\tbeacon interval: 100 TUs\n"
+                      "\tcapability: ESS ShortSlotTime (0x0401)\n"
+                      "\tsignal: {:.2f} dBm\n"
+                      "\tlast seen: {} ms ago\n"
+                      "\tSSID: ssid-{}\n"
+                      "\tSupported rates: 1.0* 2.0* 5.5* 11.0* 6.0 9.0 12.0 18.0 \n"
+                      "\tDS Parameter set: channel {}\n"
+                      "\tRSN:\t * Version: 1\n"
+                      "\t\t * Group cipher: CCMP\n"
+                      "\t\t * Pairwise ciphers: CCMP\n"
+                      "\t\t * Authentication suites: PSK\n".format(bssid, rng.randint(0, 10 ** 9),
+                                                                  rng.choice([2412, 2437, 2462, 5180]),
+                                                                  rng.uniform(-90, -30), rng.randint(0, 1000), i,
+                                                                  rng.randint(1, 11)))
+    return ''.join(blocks), "02:00:00:{:02x}:{:02x}:00".format((entries - 1) // 256, (entries - 1) % 256), \
+        "ssid-{}".format(entries - 1)
+
+
+def legacy_signal(data: str, bssid: str, ssid: str):
+    """
+    The former lookup of the controller: split the dump on 'BSS ' and build a dict with a regex per entry.
+    """
+    for d in data.split('BSS '):
+        if d.startswith(bssid) and 'SSID: ' + ssid in d:
+            entry = list(filter(None, d.split('\n\t')[1:]))
+            entry = dict(map(lambda x: (x.split(':', 1) + [''])[:2], entry))
+            signal = re.findall(r"[-+]?\d+\.\d*|[-+]?\d+|[-+]?\.\d+", entry['signal'].strip())
+            if signal:
+                return float(signal[0])
+    return None
+
+
+def indexed_signal(data: str, bssid: str, table: ScanTable):
+    table.update(data)
+    return table.signal(bssid)
+
+
+def main(sizes: list, repeat: int):
+    """
+    Compares the former search for the signal of one BSSID with building the table of all BSSs and the table of the
+    candidate BSSID only (as the scanner does) from the same dump, and with the lookup of one BSSID in the table.
+    """
+    print("entries, legacy lookup (ms), full table update (ms), candidate table update (ms), table lookup (us), "
+          "candidate table update / legacy lookup")
+    for size in sizes:
+        data, bssid, ssid = synthetic_scan_dump(size)
+        table = ScanTable()
+        candidates = ScanTable([bssid])
+        assert legacy_signal(data, bssid, ssid) == indexed_signal(data, bssid, table) == \
+            indexed_signal(data, bssid, candidates)
+        legacy = min(timeit.repeat(lambda: legacy_signal(data, bssid, ssid), number=repeat, repeat=3)) / repeat
+        full = min(timeit.repeat(lambda: indexed_signal(data, bssid, table), number=repeat, repeat=3)) / repeat
+        indexed = min(timeit.repeat(lambda: indexed_signal(data, bssid, candidates), number=repeat,
+                                    repeat=3)) / repeat
+        lookup = min(timeit.repeat(lambda: table.signal(bssid), number=repeat * 100, repeat=3)) / (repeat * 100)
+        print("{}, {:.3f}, {:.3f}, {:.3f}, {:.3f}, {:.2f}".format(size, legacy * 1e3, full * 1e3, indexed * 1e3,
+                                                                 lookup * 1e6, indexed / legacy))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--entries", help="Numbers of BSS entries of the synthetic scan dumps",
+                        type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument("-r", "--repeat", help="Number of parses per measurement", type=int, default=100)
+    args = parser.parse_args()
+    main(args.entries, args.repeat)
@@ -0,0 +1,110 @@
+import re
+
+SHAPING_MODES = ['fixed', 'capacity']
+
+
+def parse_bitrate(bitrate):
+    """
+    Returns the bitrate in kbit/s of an iw/nl80211 bitrate string (e.g. '54.0 MBit/s MCS 3') or None if it has none.
+    """
+    match = re.match(r"\s*([\d.]+)\s*MBit/s", bitrate) if isinstance(bitrate, str) else None
+    return float(match.group(1)) * 1000 if match else None
+
+
+class CapacityShaper:
+    """
+    Chooses the HTB rate (kbit/s) of the outgoing traffic from the capacity of the current link, so the queue in front
+    of the radio stays short.
+    At an AP the capacity is the moving average (EWMA with 'alpha') of the measured TX bitrate, in the MANET it is the
+    configured 'mesh_rate'. The rate is 'utilisation' times the capacity, scaled down linearly to 'min_rate' with the
+    headroom of the link (1: far away from a handover, 0: handover imminent). The headroom shrinks once the signal is
+    less than 'margin' dB above the disconnect threshold or is predicted to reach it within 'lead' handover durations.
+    During a handover the rate drops to 'min_rate'; afterwards it grows by the factor 'ramp_up' per update until it
+    reaches the rate of the new link.
+    A new rate is only returned if it differs by more than 'change' (fraction) from the applied one, which keeps the
+    number of tc calls low.
+    """
+
+    def __init__(self, utilisation: float = 0.8, min_rate: float = 100.0, max_rate: float = None,
+                 mesh_rate: float = 1000.0, margin: float = 5.0, ramp_up: float = 2.0, alpha: float = 0.3,
+                 change: float = 0.1, lead: float = 2.0):
+        self.utilisation = utilisation
+        self.min_rate = max(min_rate, 1.0)
+        self.max_rate = max_rate
+        self.mesh_rate = mesh_rate
+        self.margin = margin
+        self.lead = lead
+        self.alpha = alpha
+        self.ramp_up = max(ramp_up, 1.0)
+        self.change = change
+        self.capacity = None
+        # Applied rate and the limit of the ramp-up after a handover (None: no ramp)
+        self.rate = None
+        self.ceiling = None
+
+    def observe(self, bitrate: float):
+        if bitrate is None or bitrate <= 0:
+            return
+        self.capacity = bitrate if self.capacity is None else self.capacity + self.alpha * (bitrate - self.capacity)
+
+    def headroom(self, signal: float, threshold: float, time_to_threshold: float = None,
+                 handover_duration: float = None):
+        """
+        Returns the headroom (0 to 1) of the link from the distance of the signal to the disconnect threshold and, if
+        given, the predicted time until the signal reaches it.
+        """
+        headroom = (signal - threshold) / self.margin if self.margin > 0 else 1.0
+        if time_to_threshold is not None and handover_duration:
+            headroom = min(headroom, time_to_threshold / (self.lead * handover_duration))
+        return min(max(headroom, 0.0), 1.0)
+
+    def target(self, headroom: float = 1.0):
+        """
+        Returns the rate for the current capacity and headroom or None while the capacity is unknown.
+        """
+        if self.capacity is None:
+            return None
+        headroom = min(max(headroom, 0.0), 1.0)
+        rate = self.min_rate + (self.utilisation * self.capacity - self.min_rate) * headroom
+        if self.max_rate:
+            rate = min(rate, self.max_rate)
+        return max(rate, self.min_rate)
+
+    def update(self, bitrate: float = None, headroom: float = 1.0):
+        """
+        Adds a bitrate measurement (kbit/s, None in the MANET or if unknown) and advances the ramp-up.
+        Returns the new rate if it should be applied, else None.
+        """
+        self.observe(bitrate)
+        rate = self.target(headroom)
+        if rate is None:
+            return None
+        if self.ceiling is not None:
+            self.ceiling *= self.ramp_up
+            if self.ceiling >= rate:
+                self.ceiling = None
+            else:
+                rate = self.ceiling
+        return self.apply(rate)
+
+    def apply(self, rate: float, force: bool = False):
+        rate = int(round(rate))
+        if not force and self.rate and abs(rate - self.rate) <= self.change * self.rate:
+            return None
+        self.rate = rate
+        return rate
+
+    def handover(self):
+        """
+        Drops to the minimum rate at the start of a handover; the following updates ramp up from there.
+        Returns the rate to apply or None if it is applied already.
+        """
+        self.ceiling = self.min_rate
+        return self.apply(self.min_rate, self.rate != int(round(self.min_rate)))
+
+    def enter_mesh(self):
+        self.capacity = self.mesh_rate
+
+    def enter_link(self):
+        # The capacity of the new link is unknown until its first bitrate measurement
+        self.capacity = None
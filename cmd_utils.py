@@ -1,37 +1,265 @@
+import asyncio
+import logging
+import math
+import os
 import subprocess
+import threading
+import time
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import PIPE
 
+log = logging.getLogger('logger')
+
+# Deadline in seconds of a command unless the runner is configured otherwise. Scans take several seconds.
+DEFAULT_TIMEOUT = 5.0
+COMMAND_TIMEOUTS = {'iw scan': 15.0}
+
+
+def command_name(args: list):
+    """
+    Returns the name latencies of a command are recorded under, e.g. 'iw link' for 'iw dev sta1-wlan0 link' or
+    'ip link set' for 'ip link set sta1-wlan0 up'.
+    """
+    if args[0] == 'iw' and len(args) > 3 and args[1] == 'dev':
+        return 'iw ' + args[3]
+    if args[0] == 'ip' and len(args) > 2:
+        return ' '.join(args[:3])
+    return os.path.basename(args[0])
+
+
+def percentile(samples: list, p: float):
+    """
+    Returns the p-th percentile (0-100) of the samples (nearest rank).
+    """
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, math.ceil(p / 100.0 * len(samples)) - 1))]
+
+
+class CommandOutput(tuple):
+    """
+    Output and errors of a command. Unpacks like the (stdout, stderr) tuple of the cmd functions; 'timed_out' is set if
+    the command was killed after its timeout and 'cancelled' if it was killed by CommandRunner.cancel, so its output is
+    incomplete and an empty output does not mean success.
+    """
+
+    def __new__(cls, stdout: bytes, stderr: bytes, timed_out: bool = False, cancelled: bool = False):
+        output = super().__new__(cls, (stdout, stderr))
+        output.timed_out = timed_out
+        output.cancelled = cancelled
+        return output
+
+    @property
+    def killed(self):
+        return self.timed_out or self.cancelled
+
+
+class CommandStats:
+    """
+    Latencies of one command: the number of runs and timeouts and the last 'history' durations for percentiles.
+    """
+
+    def __init__(self, history: int = 1000):
+        self.count = 0
+        self.timeouts = 0
+        self.durations = deque(maxlen=history)
+
+    def summary(self):
+        durations = list(self.durations)
+        summary = {'count': self.count, 'timeouts': self.timeouts}
+        for p in (50, 90, 99):
+            summary['p{}'.format(p)] = percentile(durations, p) if durations else None
+        summary['max'] = max(durations) if durations else None
+        return summary
+
+
+class CommandRunner:
+    """
+    Runs shell commands with a deadline and records the latency of every command.
+    A command that does not finish within its timeout ('timeouts' maps command names to seconds, others get
+    'timeout') is killed and the output it produced so far is returned marked as timed out, so a hung 'iw' or 'ip'
+    call cannot stall the controller loop.
+    Commands can be run blocking (run), concurrently in a thread pool of 'max_workers' threads (submit, returns a
+    Future that can be cancelled with cancel) or as coroutines (run_async, killed if the task is cancelled).
+    Each controller has its own runner (see use_runner), so the latencies of one station are not mixed with those of
+    the other stations of the process. The runner is thread-safe.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, timeouts: dict = None, max_workers: int = 4,
+                 history: int = 1000):
+        self.timeout = timeout
+        self.timeouts = dict(COMMAND_TIMEOUTS if timeouts is None else timeouts)
+        self.max_workers = max_workers
+        self.history = history
+        self.executor = None
+        self.stats = {}
+        # Running processes of submitted commands by the token of their Future, to kill them on cancel
+        self.processes = {}
+        self.futures = {}
+        self.cancelled = set()
+        self.lock = threading.Lock()
+
+    def command_timeout(self, args: list, timeout: float = None):
+        if timeout is not None:
+            return timeout
+        return self.timeouts.get(command_name(args), self.timeout)
+
+    def record(self, args: list, duration: float, timed_out: bool = False):
+        name = command_name(args)
+        with self.lock:
+            if name not in self.stats:
+                self.stats[name] = CommandStats(self.history)
+            stats = self.stats[name]
+            stats.count += 1
+            stats.durations.append(duration)
+            if timed_out:
+                stats.timeouts += 1
+        if timed_out:
+            log.info("*** Command '{}' killed after {:.3f} s".format(' '.join(args), duration))
+
+    def run(self, args: list, timeout: float = None, token=None, **kwargs):
+        """
+        Runs the command and waits until it finished or its timeout has passed.
+        Returns output and errors of the command (CommandOutput).
+        """
+        start = time.monotonic()
+        process = subprocess.Popen(args, stdout=PIPE, stderr=PIPE, **kwargs)
+        if token is not None:
+            with self.lock:
+                self.processes[token] = process
+        cancelled = False
+        try:
+            stdout, stderr = process.communicate(timeout=self.command_timeout(args, timeout))
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            process.kill()
+            stdout, stderr = process.communicate()
+            timed_out = True
+        finally:
+            if token is not None:
+                with self.lock:
+                    self.processes.pop(token, None)
+                    cancelled = token in self.cancelled
+                    self.cancelled.discard(token)
+        self.record(args, time.monotonic() - start, timed_out)
+        return CommandOutput(stdout, stderr, timed_out, cancelled)
+
+    def submit(self, args: list, timeout: float = None, **kwargs):
+        """
+        Runs the command in the thread pool of the runner.
+        Returns a Future of the output and errors of the command (CommandOutput).
+        """
+        token = object()
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.max_workers, 'command')
+            future = self.executor.submit(self.run, args, timeout, token, **kwargs)
+            self.futures[future] = token
+        future.add_done_callback(self.forget)
+        return future
+
+    def forget(self, future):
+        with self.lock:
+            self.futures.pop(future, None)
+
+    def cancel(self, future):
+        """
+        Cancels a submitted command: a queued command is not started, a running one is killed and its output is marked
+        as cancelled.
+        """
+        if future.cancel():
+            return
+        with self.lock:
+            token = self.futures.get(future)
+            process = self.processes.get(token)
+            if process and process.poll() is None:
+                self.cancelled.add(token)
+                process.kill()
+
+    async def run_async(self, args: list, timeout: float = None, **kwargs):
+        """
+        Runs the command as an asyncio subprocess. The process is killed if the timeout passes or the task is cancelled.
+        Returns output and errors of the command (CommandOutput).
+        """
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec(*args, stdout=PIPE, stderr=PIPE, **kwargs)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), self.command_timeout(args, timeout))
+            timed_out = False
+        except asyncio.TimeoutError:
+            process.kill()
+            stdout, stderr = await process.communicate()
+            timed_out = True
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        self.record(args, time.monotonic() - start, timed_out)
+        return CommandOutput(stdout, stderr, timed_out)
+
+    def summary(self):
+        """
+        Returns the latency summary of every command (dict name -> count, timeouts, p50, p90, p99 and max in seconds).
+        """
+        with self.lock:
+            return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+
+# Runner of the cmd functions below in threads without a runner of their own
+runner = CommandRunner()
+local = threading.local()
+
+
+def use_runner(command_runner: CommandRunner):
+    """
+    Makes the cmd functions called by the current thread run on (and record their latencies in) the given runner.
+    """
+    local.runner = command_runner
+
+
+def current_runner():
+    return getattr(local, 'runner', runner)
+
 
 def cmd(*args, **kwargs):
     """
     Executes the given command with given args as a subprocess.
-    Returns output and errors of the subprocess after it has terminated.
+    Returns output and errors of the subprocess after it has terminated (CommandOutput).
     """
-    stdout, stderr = subprocess.Popen(args, stdout=PIPE, stderr=PIPE, **kwargs).communicate()
-    return stdout, stderr
+    return current_runner().run(list(args), **kwargs)
 
 
 def cmd_iw_dev(interface: str, cmd: str, *args):
     """
     Executes iw dev with given args including the interface in a subprocess.
-    Returns output and errors of the subprocess after it has terminated.
+    Returns output and errors of the subprocess after it has terminated (CommandOutput).
     """
     args = [arg for arg in args]
-    stdout, stderr = subprocess.Popen(["iw", "dev", interface, cmd] + args, stdout=PIPE, stderr=PIPE).communicate()
-    return stdout, stderr
+    return current_runner().run(["iw", "dev", interface, cmd] + args)
 
 
 def cmd_ip_link_set(interface: str, *args):
     """
     Executes sets the link state of a given interface to a given state by executing the ip command in a subprocess.
-    Returns output and errors of the subprocess after it has terminated.
+    Returns output and errors of the subprocess after it has terminated (CommandOutput).
     """
     args = [arg for arg in args]
-    stdout, stderr = subprocess.Popen(["ip", "link", "set", interface] + args, stdout=PIPE, stderr=PIPE).communicate()
-    return stdout, stderr
+    return current_runner().run(["ip", "link", "set", interface] + args)
 
 
 def cmd_ip_link_show(interface: str):
-    stdout, stderr = subprocess.Popen(["ip", "link", "show", interface], stdout=PIPE, stderr=PIPE).communicate()
-    return stdout, stderr
+    return current_runner().run(["ip", "link", "show", interface])
+
+
+def cmd_ip_addr(cmd: str, *args):
+    """
+    Executes ip addr with the given command (e.g. add, del, show) and args in a subprocess.
+    Returns output and errors of the subprocess after it has terminated (CommandOutput).
+    """
+    args = [arg for arg in args]
+    return current_runner().run(["ip", "addr", cmd] + args)
@@ -0,0 +1,149 @@
+import csv
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger('logger')
+
+STOP = None
+
+
+class BufferedCsvWriter(threading.Thread):
+    """
+    Appends rows to CSV files in a background thread so that no file I/O happens on the control path.
+    File handles stay open, rows are batched and flushed every 'flush_interval' seconds, but no row waits longer than
+    'max_latency' seconds before it is flushed. A header is written when a file is new or empty, so the files have the
+    same format as if every row had been appended separately.
+    When the queue is full (more than 'max_queue' pending rows) new rows are dropped and counted.
+    Plain text (e.g. the JSON lines of the handover trace) is appended to a file the same way with write_text().
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_latency: float = 1.0, max_queue: int = 100000):
+        super().__init__(daemon=True)
+        self.flush_interval = flush_interval
+        self.max_latency = max_latency
+        self.queue = queue.Queue(max_queue)
+        self.files = {}
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.pending = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def write(self, file: str, csv_columns: list, data: dict):
+        """
+        Queues a row for the given file without blocking.
+        Returns False if the row was dropped.
+        """
+        return self.put((file, csv_columns, dict(data)))
+
+    def write_text(self, file: str, text: str):
+        """
+        Queues text that is appended to the given file as it is, without blocking.
+        Returns False if the text was dropped.
+        """
+        return self.put((file, None, text))
+
+    def put(self, item: tuple):
+        try:
+            if self.closed:
+                raise queue.Full
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.queued += 1
+        return True
+
+    def run(self):
+        last_flush = time.monotonic()
+        oldest = None
+        while True:
+            now = time.monotonic()
+            if oldest is None:
+                timeout = self.flush_interval
+            else:
+                timeout = max(0.0, min(last_flush + self.flush_interval, oldest + self.max_latency) - now)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is STOP:
+                break
+            if item:
+                self.write_item(item)
+                if oldest is None:
+                    oldest = time.monotonic()
+            now = time.monotonic()
+            if oldest is not None and (now - last_flush >= self.flush_interval or now - oldest >= self.max_latency):
+                self.flush()
+                last_flush = now
+                oldest = None
+        self.drain()
+
+    def write_item(self, item: tuple):
+        try:
+            self.write_row(*item)
+        except (OSError, ValueError) as e:
+            log.info("*** CSV writer: Writing to {} failed ({})".format(item[0], e))
+            with self.lock:
+                self.dropped += 1
+
+    def write_row(self, file: str, csv_columns: list, data):
+        if file not in self.files:
+            handle = open(file, 'a', newline='')
+            writer = csv.DictWriter(handle, fieldnames=csv_columns) if csv_columns else None
+            if writer and handle.tell() == 0:
+                writer.writeheader()
+            self.files[file] = (handle, writer)
+        handle, writer = self.files[file]
+        if writer:
+            writer.writerow(data)
+        else:
+            handle.write(data)
+        self.pending += 1
+
+    def flush(self):
+        for handle, writer in self.files.values():
+            handle.flush()
+        self.written += self.pending
+        self.pending = 0
+
+    def drain(self):
+        """
+        Writes all rows that are still queued, flushes and closes the files.
+        """
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not STOP:
+                self.write_item(item)
+        self.flush()
+        for handle, writer in self.files.values():
+            handle.close()
+        self.files = {}
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stops accepting rows, writes everything that is queued and logs how many rows were queued and dropped.
+        Safe to call from a signal handler and more than once.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.is_alive():
+            try:
+                self.queue.put(STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self.join(timeout)
+        else:
+            self.drain()
+        log.info("*** CSV writer closed: {} rows queued, {} written, {} dropped".format(self.queued, self.written,
+                                                                                       self.dropped))
@@ -0,0 +1,112 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from scipy.signal import lfilter
+
+from signal_filters import FILTERS, KalmanFilter
+
+
+def sma(x, window: int):
+    """
+    Moving average over the last 'window' samples, equal to SmaFilter.
+    """
+    x = np.asarray(x, dtype=float)
+    window = max(window, 1)
+    totals = np.concatenate(([0.0], np.cumsum(x)))
+    index = np.arange(1, len(x) + 1)
+    return (totals[1:] - totals[np.maximum(index - window, 0)]) / np.minimum(index, window)
+
+
+def median(x, window: int):
+    """
+    Median of the last 'window' samples, equal to MedianFilter.
+    """
+    x = np.asarray(x, dtype=float)
+    window = max(window, 1)
+    result = np.empty(len(x))
+    head = min(window - 1, len(x))
+    for i in range(head):
+        result[i] = np.median(x[:i + 1])
+    if len(x) >= window:
+        result[head:] = np.median(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+    return result
+
+
+def ewma(x, alpha: float = 0.5):
+    """
+    Exponentially weighted moving average, equal to EwmaFilter up to floating point rounding.
+    y[i] = (1 - alpha) * y[i-1] + alpha * x[i] is a first order IIR filter; the initial state makes y[0] = x[0].
+    """
+    x = np.asarray(x, dtype=float)
+    if not len(x):
+        return np.empty(0)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return y
+
+
+def kalman(x, process_noise: float = 0.5, measurement_noise: float = 4.0, tolerance: float = 1e-12):
+    """
+    Scalar Kalman filter, equal to KalmanFilter up to floating point rounding.
+    The gains do not depend on the samples and converge to a steady state gain: the samples until the gain changes by
+    less than 'tolerance' are filtered one by one, the rest as first order IIR filter with the steady state gain.
+    """
+    x = np.asarray(x, dtype=float)
+    if not len(x):
+        return np.empty(0)
+    kalman_filter = KalmanFilter(process_noise, measurement_noise)
+    y = np.empty(len(x))
+    y[0] = kalman_filter.update(x[0])
+    gain = None
+    i = 1
+    while i < len(x):
+        previous, gain = gain, kalman_filter.gain()
+        y[i] = y[i - 1] + gain * (x[i] - y[i - 1])
+        i += 1
+        if previous is not None and abs(gain - previous) < tolerance:
+            break
+    if i < len(x):
+        y[i:], _ = lfilter([gain], [1.0, gain - 1.0], x[i:], zi=[(1.0 - gain) * y[i - 1]])
+    return y
+
+
+def apply_filter(x, name: str = 'sma', window: int = 3, alpha: float = 0.5, process_noise: float = 0.5,
+                 measurement_noise: float = 4.0):
+    """
+    Filters a recorded signal with the offline version of the named filter (one of FILTERS).
+    """
+    if name == 'sma':
+        return sma(x, window)
+    if name == 'ewma':
+        return ewma(x, alpha)
+    if name == 'median':
+        return median(x, window)
+    if name == 'kalman':
+        return kalman(x, process_noise, measurement_noise)
+    raise ValueError("Unknown signal filter '{}'".format(name))
+
+
+def main(file: str, output: str, name: str, window: int, alpha: float, process_noise: float,
+         measurement_noise: float):
+    df_signal = pd.read_csv(file, sep=',')
+    df_signal['signal_' + name] = apply_filter(df_signal['signal'].to_numpy(dtype=float), name, window, alpha,
+                                               process_noise, measurement_noise)
+    df_signal.to_csv(output, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Filter a recorded <interface>_signal.csv file")
+    parser.add_argument("-f", "--file", help="Signal file", type=str, required=True)
+    parser.add_argument("-o", "--output", help="Output file (default: <file>_<filter>.csv)", type=str, default=None)
+    parser.add_argument("-F", "--filter", help="Signal filter (default: sma)", type=str, choices=FILTERS,
+                        default='sma')
+    parser.add_argument("-w", "--window", help="Window of the sma and median filters (default: 3)", type=int,
+                        default=3)
+    parser.add_argument("--alpha", help="Smoothing factor of the ewma filter (default: 0.5)", type=float, default=0.5)
+    parser.add_argument("--processnoise", help="Process noise of the kalman filter (default: 0.5)", type=float,
+                        default=0.5)
+    parser.add_argument("--measurementnoise", help="Measurement noise of the kalman filter (default: 4.0)",
+                        type=float, default=4.0)
+    args = parser.parse_args()
+    output = args.output if args.output else args.file.rsplit('.csv', 1)[0] + '_' + args.filter + '.csv'
+    main(args.file, output, args.filter, args.window, args.alpha, args.processnoise, args.measurementnoise)
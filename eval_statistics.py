@@ -1,7 +1,8 @@
 import argparse
 import numpy as np
 import pandas as pd
-from collections import deque
+
+from eval_signal import sma
 
 
 def main(path: str, start_time: float):
@@ -148,12 +149,7 @@ def timestamp_to_second(df, column_time):
 
 
 def rolling_mean(x, window: int):
-    window_deque = deque(maxlen=window)
-    rolling_means = []
-    for i in x:
-        window_deque.append(i)
-        rolling_means.append(sum(window_deque) / len(window_deque))
-    return rolling_means
+    return sma(x, window).tolist()
 
 
 if __name__ == '__main__':
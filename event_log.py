@@ -0,0 +1,73 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger('logger')
+
+EVENT_COLUMNS = ['time', 'disconnect', 'reconnect', 'scanner_start', 'scanner_stop', 'scan_trigger', 'flap', 'handover_aborted', 'olsrd_steady']
+
+STOP = None
+
+
+class ExperimentClock:
+    """
+    High-resolution monotonic clock anchored to the start time of the experiment.
+    now() returns the seconds since 'start_time' like datetime.now().timestamp() - start_time, but is not affected by
+    wall clock adjustments. The clock is shared by all threads of the controller (e.g. the scanner and the prober).
+    """
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.anchor = time.perf_counter()
+        self.offset = time.time() - start_time
+
+    def now(self):
+        return self.offset + time.perf_counter() - self.anchor
+
+
+class EventLog:
+    """
+    Single writer of the <station>_events.csv file.
+    Events can be logged from any thread (e.g. the controller and the scanner thread), they are passed through a queue
+    and written in order by one sink thread.
+    """
+
+    def __init__(self, file: str, clock: ExperimentClock):
+        self.file = file
+        self.clock = clock
+        self.queue = queue.Queue()
+        self.sink = None
+
+    def log(self, event: str, value: int = 1):
+        """
+        Logs an event with the current time of the experiment clock. Safe to call from every thread.
+        """
+        self.queue.put((self.clock.now(), event, value))
+
+    def start(self, csv_writer):
+        """
+        Starts the sink thread that hands the events to the given CSV writer.
+        """
+        self.sink = threading.Thread(target=self.run_sink, args=(csv_writer,), daemon=True)
+        self.sink.start()
+
+    def run_sink(self, csv_writer):
+        while True:
+            item = self.queue.get()
+            if item is STOP:
+                break
+            timestamp, event, value = item
+            data = {k: 0 for k in EVENT_COLUMNS}
+            data.update({'time': timestamp, event: value})
+            csv_writer.write(self.file, EVENT_COLUMNS, data)
+
+    def close(self, timeout: float = 5.0):
+        """
+        Writes all events logged so far and stops the sink thread.
+        """
+        if self.sink and self.sink.is_alive():
+            self.queue.put(STOP)
+            self.sink.join(timeout)
+            if self.sink.is_alive():
+                log.info("*** Event log: sink did not stop within {} s".format(timeout))
@@ -1,23 +1,44 @@
 import os
+import sys
 import signal
 import argparse
-import subprocess
 import time
-import csv
 import logging
 import re
 import threading
 import json
+import queue
 
-from collections import deque
+from functools import partial
 from subprocess import Popen, PIPE
 from datetime import datetime
 
-from cmd_utils import cmd_iw_dev, cmd_ip_link_set, cmd_ip_link_show
+import cmd_utils
+from cmd_utils import cmd_iw_dev, cmd_ip_link_set, cmd_ip_link_show, cmd_ip_addr
+from nl80211 import Nl80211
+from link_events import LinkEventMonitor
+from poll_scheduler import AdaptivePollScheduler
+from scan_scheduler import AdaptiveScanScheduler
+from ap_selection import AccessPoint, ApSelector
+from handover_predictor import HandoverPredictor
+from signal_filters import FILTERS, SmaFilter, create_filter
+from handover_policy import HandoverPolicy
+from wait_utils import wait_for
+from olsrd_supervisor import OlsrdSupervisor
+from olsr_info import OlsrInfo
+from olsrd_config import olsrd_parameters, write_olsrd_config
+from csv_writer import BufferedCsvWriter
+from event_log import ExperimentClock, EventLog
 from scanner import Scanner
+from tc_session import TcSession
+from capacity_shaper import SHAPING_MODES, CapacityShaper, parse_bitrate
+from reachability_prober import ReachabilityProber
+from handover_trace import HandoverTrace
 
 log = logging.getLogger('logger')
 
+IBSS = {'ssid': 'adhocNet', 'freq': '2432', 'ht_cap': 'HT40+', 'bssid': '02:CA:FF:EE:BA:01'}
+
 
 def main(args):
     """
@@ -26,6 +47,30 @@ def main(args):
     While OLSR is activated the program continuously scans for the APs SSID to reappear in range.
     When the APs SSID is again in range the program deactivates OLSR and reconnects to the AP.
     """
+    # Raise SystemExit on SIGTERM as well so that buffered statistics are flushed in any case, also when the signal
+    # arrives while the station and the controller are being set up
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Owned here rather than by the controller, so it is closed even if the setup is interrupted
+    csv_writer = BufferedCsvWriter(args.csvflushinterval, args.csvmaxlatency)
+    csv_writer.start()
+    controller = None
+    try:
+        statistics_dir, qdisc_rates = prepare_station(args)
+        controller = create_controller(args, statistics_dir, qdisc_rates, csv_writer)
+        controller.run_controller()
+    finally:
+        if controller:
+            controller.close()
+        csv_writer.close()
+
+
+def prepare_station(args):
+    """
+    Connects the interface to the AP, creates the statistics directory, sets up the qdisc and records the start
+    parameters of the station.
+    Returns the statistics directory and the qdisc rates.
+    """
+    cmd_utils.runner.timeout = args.commandtimeout
     cmd_iw_dev(args.interface, "connect", args.apssid)
     if args.scaninterface:
         scaninterface = args.scaninterface
@@ -33,14 +78,32 @@ def main(args):
         scaninterface = args.interface
     path = os.path.dirname(os.path.abspath(__file__))
     statistics_dir = path + '/data/statistics/' + args.outputpath + '/'
-    if not os.path.isdir(statistics_dir):
-        os.makedirs(statistics_dir)
+    # Several stations of a multi-station controller may create the directory at the same time
+    os.makedirs(statistics_dir, exist_ok=True)
 
-    if args.qdiscdisconnect > 0 and args.qdiscreconnect > 0:
+    # With make-before-break the traffic leaves via the second radio while OLSR runs on it, so it is shaped as well
+    shaped_interfaces = [args.interface]
+    if args.makebeforebreak and scaninterface != args.interface:
+        shaped_interfaces.append(scaninterface)
+    if args.shaping == 'capacity':
+        # The shaper sets the rate from the first link measurement on and replaces the fixed throttle rates
+        rate, unit = args.meshrate, 'kbit'
+        print("*** Setting up qdisc with HTB rate {} {}".format(rate, unit))
+        for interface in shaped_interfaces:
+            result = init_qdisc(interface, rate, unit)
+            log.info("*** {}: Qdisc set up with HTB rate {} {} in {:.3f} s".format(interface, rate, unit,
+                                                                                 result.duration))
+        qdisc = 'capacity'
+        qdisc_rates = {'disconnect': 0, 'reconnect': 0, 'unit': 'kbit', 'utilisation': args.shapeutil,
+                       'min': args.shapemin, 'max': args.shapemax, 'mesh': args.meshrate,
+                       'margin': args.shapemargin, 'ramp_up': args.rampup}
+    elif args.qdiscdisconnect > 0 and args.qdiscreconnect > 0:
         rate, unit = 1, 'mbit'
         print("*** Setting up qdisc with HTB rate {} {}".format(rate, unit))
-        init_qdisc(args.interface, rate, unit)
-        log.info("*** {}: Qdisc set up with HTB rate {} {}".format(args.interface, rate, unit))
+        for interface in shaped_interfaces:
+            result = init_qdisc(interface, rate, unit)
+            log.info("*** {}: Qdisc set up with HTB rate {} {} in {:.3f} s".format(interface, rate, unit,
+                                                                                 result.duration))
         qdisc = 'on'
         qdisc_rates = {'standard': 1, 'std_unit': 'mbit', 'disconnect': args.qdiscdisconnect,
                        'reconnect': args.qdiscreconnect, 'throttle_unit': 'bit', 'throttled': False}
@@ -51,29 +114,115 @@ def main(args):
         olsr = 'off'
     else:
         olsr = 'on'
+    olsrd_params, olsrd_steady_params = olsrd_profiles(args)
     parameters = {'start_time': args.starttime, 'OLSR': olsr, 'interface': args.interface,
+                  'make_before_break': args.makebeforebreak,
+                  'link_backend': args.linkbackend, 'link_events': args.linkevents,
                   'qdisc': {'mode': qdisc, 'rates': qdisc_rates},
-                  'AP': {'ssid': args.apssid, 'bssid': args.apbssid, 'ip': args.apip},
+                  'AP': {'ssid': args.apssid, 'bssid': args.apbssid, 'ip': args.apip,
+                         'candidates': args.ap if args.ap else [],
+                         'roam': {'hysteresis': args.roamhysteresis, 'margin': args.roammargin}},
+                  'signal_filter': {'name': args.signalfilter, 'window': args.signalwindow,
+                                    'alpha': args.ewmaalpha, 'process_noise': args.kalmanq,
+                                    'measurement_noise': args.kalmanr},
+                  'policy': {'min_ap_dwell': args.mindwellap, 'min_olsr_dwell': args.mindwellolsr,
+                             'hold_down': args.holddown, 'max_per_minute': args.maxhandovers,
+                             'flap_window': args.flapwindow},
+                  'prediction': {'enabled': args.predict, 'window': args.predictwindow,
+                                 'handover_duration': args.handoverduration},
                   'scan': {'interface': scaninterface, 'interval': args.scaninterval,
                            'moving_avg_window': args.signalwindow,
+                           'min_interval': args.scanmin, 'max_interval': args.scanmax, 'backoff': args.scanbackoff,
+                           'frequencies': args.scanfreq, 'rising_slope': args.scanrising,
+                           'poll': {'min_interval': args.pollmin, 'max_interval': args.pollmax,
+                                    'margin': args.pollmargin},
                            'reconnect_threshold': args.reconnectthreshold,
-                           'disconnect_threshold': args.disconnectthreshold}}
+                           'disconnect_threshold': args.disconnectthreshold},
+                  'olsrd': {'binary': args.olsrdbin, 'info': args.olsrinfo, 'info_port': args.olsrinfoport,
+                            'profile': args.olsrprofile, 'config': olsrd_params,
+                            'steady_profile': args.olsrsteadyprofile, 'steady_config': olsrd_steady_params,
+                            'steady_after': args.olsrsteadyafter},
+                  'probe': {'rate': args.probe, 'timeout': args.probetimeout},
+                  'csv': {'flush_interval': args.csvflushinterval, 'max_latency': args.csvmaxlatency},
+                  'timeouts': {'association': args.associationtimeout, 'link_up': args.linkuptimeout,
+                               'olsr_route': args.routetimeout, 'olsrd_ready': args.olsrdreadytimeout}}
     with open(statistics_dir + args.interface.split('-')[0] + '_start-params.json', 'w') as file:
         json.dump(parameters, file, indent=4)
-    controller = FlexibleSdnOlsrController(args.interface, scaninterface, args.scaninterval, args.reconnectthreshold,
-                                           args.disconnectthreshold, args.pingto, statistics_dir, args.apssid,
-                                           args.apbssid, args.apip, args.signalwindow, args.starttime, qdisc_rates,
-                                           args.noolsr)
-    controller.run_controller()
+    return statistics_dir, qdisc_rates
+
+
+def olsrd_profiles(args):
+    """
+    Returns the olsrd parameters of the handover profile and of the steady profile (None if not given) set on the CLI.
+    """
+    olsrd_params = olsrd_parameters(args.olsrprofile, {'HelloInterval': args.hellointerval,
+                                                       'TcInterval': args.tcinterval,
+                                                       'LinkQualityLevel': args.lqlevel})
+    olsrd_steady_params = None
+    if args.olsrsteadyprofile:
+        olsrd_steady_params = olsrd_parameters(args.olsrsteadyprofile, {'LinkQualityLevel': args.lqlevel})
+    return olsrd_params, olsrd_steady_params
+
+
+def create_controller(args, statistics_dir: str, qdisc_rates: dict, csv_writer: BufferedCsvWriter = None):
+    """
+    Creates the controller with the schedulers, filters and policies configured by the parsed CLI arguments.
+    Several controllers in one process can share a CSV writer.
+    """
+    scaninterface = args.scaninterface if args.scaninterface else args.interface
+    olsrd_params, olsrd_steady_params = olsrd_profiles(args)
+    return FlexibleSdnOlsrController(args.interface, scaninterface, args.scaninterval, args.reconnectthreshold,
+                                     args.disconnectthreshold, args.pingto, statistics_dir, args.apssid,
+                                     args.apbssid, args.apip, args.signalwindow, args.starttime, qdisc_rates,
+                                     args.noolsr, args.linkbackend, args.linkevents, args.linkeventreplay,
+                                     AdaptivePollScheduler(args.pollmin, args.pollmax, args.pollmargin),
+                                     args.associationtimeout, args.linkuptimeout, args.makebeforebreak,
+                                     args.routetimeout, args.olsrdbin, args.olsrdreadytimeout, args.olsrinfo,
+                                     args.olsrinfoport, olsrd_params, olsrd_steady_params, args.olsrsteadyafter,
+                                     args.csvflushinterval, args.csvmaxlatency,
+                                     AdaptiveScanScheduler(args.scaninterval, args.scanmin, args.scanmax,
+                                                           args.scanbackoff, args.scanfreq,
+                                                           args.signalwindow, args.scanrising),
+                                     [AccessPoint(*ap) for ap in args.ap] if args.ap else None,
+                                     args.roamhysteresis, args.roammargin,
+                                     HandoverPredictor(args.disconnectthreshold, args.predictwindow,
+                                                       handover_duration=args.handoverduration)
+                                     if args.predict else None,
+                                     partial(create_filter, args.signalfilter, args.signalwindow,
+                                             args.ewmaalpha, args.kalmanq, args.kalmanr),
+                                     HandoverPolicy(args.mindwellap, args.mindwellolsr, args.holddown,
+                                                    args.maxhandovers, args.flapwindow), csv_writer,
+                                     CapacityShaper(args.shapeutil, args.shapemin, args.shapemax, args.meshrate,
+                                                    args.shapemargin, args.rampup)
+                                     if args.shaping == 'capacity' else None, args.probe, args.probetimeout,
+                                     args.commandtimeout)
 
 
 class FlexibleSdnOlsrController:
     def __init__(self, interface: str, scaninterface: str, scan_interval: float, reconnect_threshold: float,
                  disconnect_threshold: float, pingto: str, out_path: str, ap_ssid: str, ap_bssid: str, ap_ip: str,
-                 signal_window: int, start_time: float, qdisc: dict, no_olsr: bool = False):
+                 signal_window: int, start_time: float, qdisc: dict, no_olsr: bool = False,
+                 link_backend: str = 'iw', link_events: str = 'nl80211', link_event_replay: str = None,
+                 poll_scheduler: AdaptivePollScheduler = None, association_timeout: float = 10.0,
+                 link_up_timeout: float = 5.0, make_before_break: bool = False, route_timeout: float = 10.0,
+                 olsrd_bin: str = 'olsrd', olsrd_ready_timeout: float = 5.0, olsr_info: str = 'kernel',
+                 olsr_info_port: int = None, olsrd_params: dict = None, olsrd_steady_params: dict = None,
+                 olsrd_steady_after: float = 30.0, flush_interval: float = 0.5, max_latency: float = 1.0,
+                 scan_scheduler: AdaptiveScanScheduler = None, aps: list = None, roam_hysteresis: float = 3.0,
+                 roam_margin: float = 5.0, predictor: HandoverPredictor = None, signal_filter=None,
+                 policy: HandoverPolicy = None, csv_writer: BufferedCsvWriter = None, shaper: CapacityShaper = None,
+                 probe_rate: float = 0.0, probe_timeout: float = 1.0,
+                 command_timeout: float = cmd_utils.DEFAULT_TIMEOUT):
         self.interface = interface
         self.station = interface.split('-')[0]
         self.scan_interface = scaninterface
+        self.olsr_interface = interface
+        # Make-before-break: OLSR runs on the second radio while the first one is still associated with the AP.
+        # The scanner always uses the idle radio: the second one while at the AP, the first one while in the MANET.
+        self.make_before_break = make_before_break and scaninterface != interface
+        if self.make_before_break:
+            self.olsr_interface = scaninterface
+        self.route_timeout = route_timeout
         self.scan_interval = scan_interval
         self.reconnect_threshold = reconnect_threshold
         self.disconnect_threshold = disconnect_threshold
@@ -81,107 +230,287 @@ class FlexibleSdnOlsrController:
         self.pingto = pingto
         self.out_path = out_path
         self.signal_file = out_path + interface + '_signal.csv'
-        self.ap_ssid = ap_ssid
-        self.ap_bssid = ap_bssid
-        self.ap_ip = ap_ip
+        # A CSV writer passed in is shared with other controllers and closed by its owner
+        self.own_csv_writer = csv_writer is None
+        self.csv_writer = csv_writer if csv_writer else BufferedCsvWriter(flush_interval, max_latency)
+        if self.own_csv_writer:
+            self.csv_writer.start()
+        # All events (also those of the scanner thread) go through one event log with a monotonic clock
+        self.clock = ExperimentClock(start_time)
+        self.event_log = EventLog(out_path + self.station + '_events.csv', self.clock)
+        self.event_log.start(self.csv_writer)
+        # Spans of the handover steps, viewable in chrome://tracing or Perfetto
+        self.trace = HandoverTrace(out_path + self.station + '_trace.json', self.clock, self.station,
+                                   self.csv_writer)
+        # Candidate APs: the AP the station starts at and the additional APs it may roam to
+        self.ap = AccessPoint(ap_ssid, ap_bssid, ap_ip)
+        self.aps = [self.ap] + [ap for ap in (aps if aps else []) if ap.bssid != self.ap.bssid]
+        self.select_access_point(self.ap)
+        # Creates the filter that smooths the signal of an AP (default: moving average over 'signal_window' samples)
+        self.signal_filter = signal_filter if signal_filter else partial(SmaFilter, signal_window)
+        self.selector = ApSelector(self.aps, signal_window, roam_hysteresis, reconnect_threshold, self.signal_filter)
+        self.roam_margin = roam_margin
         self.signal_window = signal_window
         self.start_time = start_time
         self.qdisc = qdisc
         self.qdisc.update({'throttled': False})
+        # The rate changes during a handover go through one persistent tc process instead of a shell per change
+        self.tc = TcSession()
+        # The iw/ip commands of this station (controller and scanner thread) run on a runner of their own, which keeps
+        # their latencies apart from those of the other stations of a multi-station controller
+        self.commands = cmd_utils.CommandRunner(command_timeout)
+        cmd_utils.use_runner(self.commands)
+        # Capacity shaping: the HTB rate follows the measured link capacity instead of the fixed throttle rates
+        self.shaper = shaper
+        if self.shaper or self.qdisc['disconnect'] > 0:
+            # Starts tc in the namespace of the station now, so the first handover does not wait for its start
+            self.tc.start()
         self.no_olsr = no_olsr
-        self.olsrd_pid = 0
-        self.link_signal_deque = deque(maxlen=signal_window)
-        self.scan_signal_deque = deque(maxlen=signal_window)
-        self.scanner = Scanner(scaninterface, scan_interval, out_path, self.station, start_time, ap_ssid)
-
-        log.info("*** {}: Interface: {}, Scan-interface: {}".format(interface.split('-')[0], interface, scaninterface))
-        stdout, stderr = cmd_iw_dev(interface, "link")
-        while b'Connected to ' + ap_bssid.encode() not in stdout:
-            stdout, stderr = cmd_iw_dev(interface, "link")
+        # olsrd is started with the (fast converging) handover configuration and, if a steady configuration is given,
+        # warm restarted with it once OLSR has been running for 'olsrd_steady_after' seconds
+        plugin = olsr_info if olsr_info != 'kernel' else None
+        self.olsrd_config = write_olsrd_config(out_path + self.olsr_interface + '-olsrd.conf', self.olsr_interface,
+                                               olsrd_params if olsrd_params else olsrd_parameters(), plugin,
+                                               olsr_info_port)
+        self.olsrd_steady_config = None
+        if olsrd_steady_params:
+            self.olsrd_steady_config = write_olsrd_config(out_path + self.olsr_interface + '-olsrd-steady.conf',
+                                                          self.olsr_interface, olsrd_steady_params, plugin,
+                                                          olsr_info_port)
+        self.olsrd_steady_after = olsrd_steady_after
+        self.olsrd_steady = False
+        self.olsrd_started = time.monotonic()
+        self.olsrd = OlsrdSupervisor(self.olsr_interface, self.olsrd_config, olsrd_bin,
+                                     out_path + self.olsr_interface + '_olsrd.log', olsrd_ready_timeout)
+        # True while the station is in the MANET (IBSS joined and olsrd started)
+        self.olsr_active = False
+        self.olsr_info = OlsrInfo(olsr_info, self.olsr_interface, port=olsr_info_port)
+        self.handover_start = time.monotonic()
+        self.association_timeout = association_timeout
+        self.link_up_timeout = link_up_timeout
+        self.link_filter = self.signal_filter()
+        # Dwell times, hold-down and rate cap of voluntary handovers
+        self.policy = policy if policy else HandoverPolicy()
+        self.policy.target = self.ap_bssid.lower()
+        self.blocked_reason = None
+        # Prediction mode: start the handover before the signal falls below the disconnect threshold
+        self.predictor = predictor
+        # Latest AP measurements published by the scanner thread
+        self.scan_results = queue.Queue()
+        # Scanning on the interface that carries the MANET traffic takes it off the IBSS channel
+        data_freq = int(IBSS['freq']) if self.scan_interface == self.olsr_interface and not self.make_before_break \
+            else None
+        self.scanner = Scanner(self.scan_interface, scan_interval, self.event_log,
+                               sorted({ap.ssid for ap in self.aps}), self.handle_scan_results,
+                               [ap.bssid for ap in self.aps], scan_scheduler, data_freq, self.commands)
+        self.nl80211 = None
+        if link_backend == 'nl80211':
+            try:
+                self.nl80211 = Nl80211(interface)
+                log.info("*** {}: Reading link signal via nl80211".format(interface))
+            except OSError as e:
+                log.info("*** {}: nl80211 not available ({}), falling back to iw".format(interface, e))
+        self.poll_scheduler = poll_scheduler if poll_scheduler else AdaptivePollScheduler(1.0, 1.0)
+        self.poll_interval = self.poll_scheduler.max_interval
+        # Set by the link event monitor as soon as the kernel reports that the AP connection is gone
+        self.link_lost = threading.Event()
+        self.link_event_monitor = None
+        if link_event_replay:
+            self.link_event_monitor = LinkEventMonitor(interface, self.handle_link_event, 'replay', link_event_replay)
+        elif link_events != 'off':
+            self.link_event_monitor = LinkEventMonitor(interface, self.handle_link_event, link_events)
+
+        log.info("*** {}: Interface: {}, Scan-interface: {}, OLSR-interface: {}".format(
+            self.station, interface, self.scan_interface, self.olsr_interface))
+        self.ip_address = self.get_ip_address() if self.make_before_break else None
+        if not self.wait('association', self.is_associated, association_timeout).success:
+            log.info("*** {}: Not associated with {} at start".format(interface, ap_bssid))
+        else:
+            self.scanner.scheduler.add_frequency(self.get_ap_frequency(), self.ap_bssid)
         stdout, stderr = Popen(["ping", "-c1", ap_ip], stdout=PIPE, stderr=PIPE).communicate()
         if self.pingto:
             Popen(["ping", "-c1", pingto]).communicate()
+        # Measures RTT, loss and the data plane outage of every handover with ICMP probes to the AP and -p destination
+        self.prober = None
+        if probe_rate > 0:
+            try:
+                self.prober = ReachabilityProber([ap_ip, pingto], probe_rate, probe_timeout, self.clock,
+                                                 self.log_probe, self.log_outage)
+                log.info("*** {}: Probing {} at {} Hz".format(interface, ', '.join(self.prober.destinations),
+                                                             probe_rate))
+            except OSError as e:
+                log.info("*** {}: Reachability probes not available ({})".format(interface, e))
+        if self.link_event_monitor:
+            self.link_event_monitor.start()
+        self.scanner.start()
+        if self.prober:
+            self.prober.start()
 
     def run_controller(self):
         print("ssid, time (s), signal (dBm), signal_avg (dBm)")
         while True:
-            time.sleep(1)
+            # The poll interval only matters for threshold decisions, a reported disconnect wakes the loop at once
+            self.step(self.link_lost.wait(self.poll_interval))
+
+    def step(self, link_lost: bool = False):
+        """
+        One iteration of the monitor loop: polls the AP signal (unless the link event monitor reported the loss of the
+        AP connection) and starts a handover if necessary.
+        """
+        if link_lost:
+            self.link_lost.clear()
+            self.link_filter.reset()
+            self.selector.clear(self.ap_bssid)
+            if self.predictor:
+                self.predictor.reset()
+            ap_link_signal = None
+        else:
             ap_link_signal = self.get_link_signal_quality()
+        self.log_poll_rate()
+        self.poll_interval = self.poll_scheduler.next_interval()
+        if self.predictor:
+            self.log_prediction(self.predictor.expire(self.clock.now()))
+        if ap_link_signal:
+            ap_link_signal.update({'signal_avg': self.link_filter.update(ap_link_signal['signal'])})
+            self.poll_interval = self.poll_scheduler.next_interval(ap_link_signal['signal_avg'],
+                                                                   self.disconnect_threshold)
+            self.shape_traffic(ap_link_signal)
+            prediction = self.predict_signal_loss(ap_link_signal)
+            if (ap_link_signal['signal_avg'] >= self.disconnect_threshold and not prediction) or \
+                    not self.handover_allowed():
+                print("{}, {}, {}, {:.2f}".format(ap_link_signal['SSID'], ap_link_signal['time'],
+                                                  ap_link_signal['signal'], ap_link_signal['signal_avg']))
+                self.write_signal_to_file(ap_link_signal)
+                # if self.qdisc['disconnect'] > 0:
+                #     if ap_link_signal['signal_avg'] <= self.disconnect_threshold + 2 and not self.qdisc['throttled']:
+                #         self.set_qdisc_rate('signal_throttle', self.qdisc['disconnect'],
+                #                             self.qdisc['throttle_unit'], True)
+                #     elif ap_link_signal['signal_avg'] > self.disconnect_threshold + 2 and self.qdisc['throttled']:
+                #         self.set_qdisc_rate('signal_restore', self.qdisc['standard'], self.qdisc['std_unit'], False)
+                ap = self.find_better_access_point(ap_link_signal)
+                if ap and self.handover_allowed():
+                    if self.handover_to_access_point(ap):
+                        self.complete_reconnect()
+                    else:
+                        self.policy.failed()
+                return
+            if prediction:
+                self.accept_prediction(prediction)
+        if self.scanner.paused:
             if ap_link_signal:
-                signal = float(ap_link_signal['signal'].rstrip(' dBm'))
-                self.link_signal_deque.append(signal)
-                ap_link_signal.update({'signal': signal,
-                                       'signal_avg': sum(self.link_signal_deque) / len(self.link_signal_deque)})
-                if ap_link_signal['signal_avg'] >= self.disconnect_threshold:
-                    print("{}, {}, {}, {:.2f}".format(ap_link_signal['SSID'], ap_link_signal['time'],
-                                                      ap_link_signal['signal'], ap_link_signal['signal_avg']))
-                    self.write_signal_to_file(ap_link_signal)
-                    # if self.qdisc['disconnect'] > 0:
-                    #     if ap_link_signal['signal_avg'] <= self.disconnect_threshold + 2 and not self.qdisc['throttled']:
-                    #         update_qdisc(self.interface, self.qdisc['disconnect'], self.qdisc['throttle_unit'])
-                    #         self.qdisc.update({'throttled': True})
-                    #     elif ap_link_signal['signal_avg'] > self.disconnect_threshold + 2 and self.qdisc['throttled']:
-                    #         update_qdisc(self.interface, self.qdisc['standard'], self.qdisc['std_unit'])
-                    #         self.qdisc.update({'throttled': False})
-                    continue
-            if not self.scanner.is_alive():
-                if ap_link_signal:
-                    print("*** AP signal too weak (last signal: {} / {})".format(ap_link_signal['signal'],
-                                                                                 self.disconnect_threshold))
-                else:
-                    print("*** AP connection lost")
-                print("*** Starting background scan")
-                self.scanner.start()
-                self.log_event('scanner_start', 1)
-            scan_signal = self.get_scan_dump_signal()
-            if scan_signal and 'signal' in scan_signal:
-                self.scan_signal_deque.append(scan_signal['signal'])
-                scan_signal.update({'signal_avg': sum(self.scan_signal_deque) / len(self.scan_signal_deque)})
-                log.info("*** {}: Scan detected {} in range (signal: {} / {})".format(self.scan_interface, self.ap_ssid,
-                                                                                      scan_signal['signal'],
-                                                                                      self.reconnect_threshold))
-                self.write_signal_to_file(scan_signal)
-                print("{}, {}, {}, {:.2f}".format(scan_signal['SSID'], scan_signal['time'], scan_signal['signal'],
-                                                  scan_signal['signal_avg']))
-                if scan_signal['signal'] >= self.reconnect_threshold:
-                    self.log_event('reconnect', 1)
-                    self.reconnect_to_access_point()
-                    self.connected_to_ap = True
-                    self.log_event('reconnect', 2)
-                    if self.scanner.is_alive():
-                        print("*** Stopping background scan")
-                        self.scanner.terminate()
-                        self.log_event('scanner_stop', 1)
-                        self.scanner = Scanner(self.scan_interface, self.scan_interval, self.out_path, self.station,
-                                               self.start_time, self.ap_ssid)
-                    time.sleep(0.5)
-                    print("*** Reconnected to AP.")
-                    print("*** OLSRd PID: ", self.olsrd_pid)
-                    stdout, stderr = Popen(["ping", "-c1", self.ap_ip], stdout=PIPE, stderr=PIPE).communicate()
-                    continue
-            if self.olsrd_pid == 0 and not self.no_olsr:
-                print("*** Starting OLSRd")
-                self.log_event('disconnect', 1)
-                self.switch_to_olsr()
-                self.connected_to_ap = False
-                self.log_event('disconnect', 2)
-                if self.pingto:
-                    spthread = threading.Thread(target=sleep_and_ping,
-                                                kwargs={'sleep_interval': 1.0, 'ip': self.pingto},
-                                                daemon=True)
-                    spthread.start()
-            elif self.no_olsr and self.connected_to_ap:
-                self.log_event('disconnect', 1)
+                print("*** AP signal too weak (last signal: {} / {})".format(ap_link_signal['signal'],
+                                                                             self.disconnect_threshold))
+            else:
+                print("*** AP connection lost")
+            print("*** Starting background scan")
+            self.scanner.resume()
+            self.log_event('scanner_start', 1)
+        scan_signals = self.get_scan_signals()
+        for bssid, scan_signal in scan_signals:
+            self.log_scan_signal(bssid, scan_signal)
+        ap = None
+        if scan_signals or (self.connected_to_ap and len(self.selector) > 1):
+            # Another AP in range is preferred over the MANET, while the station is still connected to the weak
+            # AP only the other APs are candidates
+            roaming = self.connected_to_ap and len(self.selector) > 1
+            ap = self.selector.best(exclude=self.ap_bssid if roaming else None)
+        # Leaving the AP after the connection was lost is forced, a reconnect from the MANET is voluntary
+        if ap and self.handover_allowed(self.connected_to_ap and ap_link_signal is None):
+            if not self.handover_to_access_point(ap):
+                # Fall through: the loop switches back to OLSR while the scanner keeps looking for the AP
+                print("*** Reconnect to AP failed")
+                self.policy.failed()
+            else:
+                self.complete_reconnect()
+                return
+        if self.olsr_active:
+            self.shape_traffic()
+        if self.olsr_active and not self.olsrd.running:
+            print("*** OLSRd exited, restarting it")
+            self.restart_olsrd()
+        elif self.olsr_active and self.olsrd_steady_config and not self.olsrd_steady and \
+                time.monotonic() - self.olsrd_started >= self.olsrd_steady_after:
+            self.switch_to_steady_profile()
+        if not self.olsr_active and not self.no_olsr:
+            print("*** Starting OLSRd")
+            self.handover_start = time.monotonic()
+            self.log_event('disconnect', 1)
+            with self.trace.span('handover_olsr', make_before_break=self.make_before_break):
+                left_ap = self.switch_to_olsr()
+            if not left_ap:
+                print("*** Handover to OLSR aborted, staying at the AP")
+                self.log_event('handover_aborted', 1)
+                self.policy.failed()
+                return
+            self.connected_to_ap = False
+            self.log_event('disconnect', 2)
+            if self.policy.state != 'olsr':
+                self.record_handover('olsr')
+            if self.olsr_active and not self.make_before_break:
+                # Make-before-break already waited for the OLSR routes before leaving the AP
+                threading.Thread(target=self.wait_for_olsr_convergence, daemon=True).start()
+        elif self.no_olsr and self.connected_to_ap:
+            self.log_event('disconnect', 1)
+            with self.trace.span('iw_disconnect'):
                 cmd_iw_dev(self.interface, 'disconnect')
-                self.connected_to_ap = False
-                self.log_event('disconnect', 2)
+            self.connected_to_ap = False
+            self.log_event('disconnect', 2)
+            self.record_handover('olsr')
+
+    def close(self):
+        """
+        Stops the helper threads and processes of the controller and flushes the buffered statistics.
+        """
+        if self.link_event_monitor:
+            self.link_event_monitor.stop()
+        self.scanner.stop()
+        self.scanner.join(self.scan_interval + 5.0)
+        if self.prober:
+            self.prober.stop()
+            self.prober.join(self.prober.timeout + 1.0)
+            for destination, stats in self.prober.stats.items():
+                log.info("*** {}: Probes to {}: {} sent, {} lost, {} outages".format(
+                    self.interface, destination, stats['sent'], stats['lost'], stats['outages']))
+        self.trace.close()
+        log.info("*** {}: Handover policy: {} flaps, {} handovers suppressed".format(self.interface, self.policy.flaps,
+                                                                                    self.policy.suppressed))
+        if self.predictor:
+            log.info("*** {}: Handover predictions: {} hits, {} misses, {} unverified".format(
+                self.interface, self.predictor.stats['hit'], self.predictor.stats['miss'],
+                self.predictor.stats['unverified']))
+        self.tc.close()
+        self.commands.close()
+        self.event_log.close()
+        if self.own_csv_writer:
+            self.csv_writer.close()
+
+    def handle_link_event(self, event):
+        """
+        Callback of the link event monitor (runs in the monitor thread).
+        Wakes up the controller loop when the kernel reports the loss of the AP connection or a roam to another AP.
+        """
+        if not self.connected_to_ap:
+            return
+        if event.link_lost or (event.kind in ('connected', 'roamed') and event.bssid
+                               and event.bssid != self.ap_bssid.lower()):
+            log.info("*** {}: Link event '{}' (BSSID: {}, reason: {}, by AP: {})".format(
+                self.interface, event.kind, event.bssid, event.reason, event.by_ap))
+            self.link_lost.set()
 
     def get_link_signal_quality(self):
         """
         Fetches the signal strength on a given wifi interface as long as it is connected to an AP with a matching ssid.
+        Uses the persistent nl80211 socket if available and falls back to parsing the output of 'iw dev <if> link'.
         Returns the signal data if the connection is present.
         Returns None if the AP is not connected.
         """
+        if self.nl80211:
+            try:
+                return self.get_nl80211_signal_quality()
+            except OSError as e:
+                log.info("*** {}: nl80211 request failed ({}), falling back to iw".format(self.interface, e))
+                self.nl80211.close()
+                self.nl80211 = None
         stdout, stderr = cmd_iw_dev(self.interface, "link")
         data = stdout.decode()
         if 'Connected to ' + self.ap_bssid in data and 'SSID: ' + self.ap_ssid in data:
@@ -190,170 +519,584 @@ class FlexibleSdnOlsrController:
             signal_data = {k.replace(' ', '_'): (data[k].strip() if k in data else 'NaN') for k in ['SSID', 'signal',
                                                                                                     'rx bitrate',
                                                                                                     'tx bitrate']}
-            signal_data.update({'time': datetime.now().timestamp() - self.start_time})
+            signal_data.update({'time': self.clock.now(),
+                                'signal': float(signal_data['signal'].rstrip(' dBm'))})
             return signal_data
         return None
 
+    def get_nl80211_signal_quality(self):
+        """
+        Fetches the signal strength via nl80211 as typed values.
+        Returns the signal data in the same format as the iw path or None if the AP is not connected.
+        """
+        station = self.nl80211.get_station_info()
+        if station and station.bssid == self.ap_bssid.lower() and station.ssid == self.ap_ssid:
+            return {'SSID': station.ssid, 'signal': float(station.signal), 'rx_bitrate': station.rx_bitrate,
+                    'tx_bitrate': station.tx_bitrate, 'time': self.clock.now()}
+        return None
+
     def write_signal_to_file(self, signal_data: dict):
         csv_columns = ['time', 'SSID', 'signal', 'signal_avg', 'rx_bitrate', 'tx_bitrate']
-        write_or_append_csv_to_file(signal_data, csv_columns, self.signal_file)
-
-    def get_scan_dump_signal(self):
-        stdout, stderr = cmd_iw_dev(self.scan_interface, "scan", "dump")
-        scan_data = stdout.decode()
-        if "BSS " + self.ap_bssid in scan_data and "SSID: " + self.ap_ssid in scan_data:
-            scan_signal = self.signal_strength_from_scan_dump(scan_data)
-            scan_data = {'time': datetime.now().timestamp() - self.start_time, 'signal': scan_signal,
-                         'SSID': self.ap_ssid, 'rx_bitrate': 0, 'tx_bitrate': 0}
-            return scan_data
-        return None
+        self.csv_writer.write(self.signal_file, csv_columns, signal_data)
 
-    def signal_strength_from_scan_dump(self, data: str):
-        for d in data.split('BSS '):
-            signal = self.extract_signal_strength(d)
-            if signal:
-                return signal
-        return None
+    def handle_scan_results(self, results: dict, report: dict):
+        """
+        Callback of the scanner (runs in the scanner thread).
+        Writes the scan report to <station>_scans.csv and publishes the signal of the AP to the controller loop if the
+        AP was found by the scan.
+        """
+        report.update({'time': self.clock.now()})
+        csv_columns = ['time', 'interface', 'frequencies', 'duration', 'off_channel', 'found', 'bssid', 'signal',
+                       'timed_out', 'next_interval']
+        self.csv_writer.write(self.out_path + self.station + '_scans.csv', csv_columns, report)
+        for ap in self.aps:
+            bss = results.get(ap.bssid)
+            if bss and bss['ssid'] == ap.ssid and bss['signal'] is not None:
+                self.scan_results.put((ap.bssid, {'time': report['time'], 'signal': bss['signal'], 'SSID': ap.ssid,
+                                                  'rx_bitrate': 0, 'tx_bitrate': 0}))
 
-    def extract_signal_strength(self, data: str):
-        if data.startswith(self.ap_bssid) and 'SSID: ' + self.ap_ssid in data:
-            entry = list(filter(None, data.split('\n\t')[1:]))
-            entry = dict(map(lambda x: (x.split(':', 1) + [''])[:2], entry))
-            signal = entry['signal'].strip()
-            signal = re.findall(r"[-+]?\d+\.\d*|[-+]?\d+|[-+]?\.\d+", signal)
-            if signal:
-                return float(signal[0])
-        return None
+    def get_scan_signals(self):
+        """
+        Returns the AP measurements (tuples of BSSID and signal data) the scanner found since the last call.
+        """
+        scan_signals = []
+        while True:
+            try:
+                scan_signals.append(self.scan_results.get_nowait())
+            except queue.Empty:
+                return scan_signals
+
+    def log_scan_signal(self, bssid: str, scan_signal: dict):
+        """
+        Adds a scan measurement of an AP to the AP selection and writes it to the signal file.
+        """
+        self.selector.update(bssid, scan_signal['signal'])
+        if self.predictor and bssid == self.ap_bssid:
+            self.log_prediction(self.predictor.observe(scan_signal['time'], scan_signal['signal']))
+        scan_signal.update({'signal_avg': self.selector.average(bssid)})
+        self.poll_interval = self.poll_scheduler.next_interval(scan_signal['signal_avg'], self.reconnect_threshold)
+        log.info("*** {}: Scan detected {} ({}) in range (signal: {} / {})".format(
+            self.scan_interface, scan_signal['SSID'], bssid, scan_signal['signal'], self.reconnect_threshold))
+        self.write_signal_to_file(scan_signal)
+        print("{}, {}, {}, {:.2f}".format(scan_signal['SSID'], scan_signal['time'], scan_signal['signal'],
+                                          scan_signal['signal_avg']))
+
+    def find_better_access_point(self, ap_link_signal: dict):
+        """
+        Roaming between several APs while connected: once the averaged link signal comes within 'roam_margin' dB of the
+        disconnect threshold the scanner looks for the other APs.
+        Returns an AP that beats the current one by the hysteresis or None.
+        """
+        if len(self.selector) < 2:
+            return None
+        self.selector.update(self.ap_bssid, ap_link_signal['signal'])
+        weak = ap_link_signal['signal_avg'] < self.disconnect_threshold + self.roam_margin
+        if weak and self.scanner.paused:
+            print("*** AP signal weakening, scanning for other APs")
+            self.scanner.resume()
+            self.log_event('scanner_start', 1)
+        elif not weak and not self.scanner.paused:
+            print("*** Stopping background scan")
+            self.scanner.pause()
+            self.log_event('scanner_stop', 1)
+        for bssid, scan_signal in self.get_scan_signals():
+            self.log_scan_signal(bssid, scan_signal)
+        ap = self.selector.best(current=self.ap_bssid)
+        return ap if ap and ap.bssid != self.ap_bssid else None
+
+    def predict_signal_loss(self, ap_link_signal: dict):
+        """
+        Prediction mode: adds the link measurement to the trend and checks whether the signal will fall below the
+        disconnect threshold before a handover could complete.
+        Returns the prediction if the handover should start now, else None. The prediction is only recorded (see
+        accept_prediction) if the handover policy lets the handover start.
+        """
+        if not self.predictor:
+            return None
+        self.log_prediction(self.predictor.observe(ap_link_signal['time'], ap_link_signal['signal']))
+        self.predictor.update(ap_link_signal['time'], ap_link_signal['signal'])
+        return self.predictor.predict(ap_link_signal['time'])
+
+    def accept_prediction(self, prediction: dict):
+        print("*** AP signal predicted to fall below {} in {:.2f} s (handover takes {:.2f} s)".format(
+            self.disconnect_threshold, prediction['horizon'], prediction['handover_duration']))
+        self.predictor.accept(prediction)
+
+    def log_prediction(self, prediction: dict):
+        """
+        Writes an evaluated prediction (trigger time, horizon, hit/miss) to <station>_predictions.csv.
+        """
+        if not prediction:
+            return
+        csv_columns = ['time', 'horizon', 'handover_duration', 'slope', 'crossing', 'outcome', 'observed_signal',
+                       'delay']
+        self.csv_writer.write(self.out_path + self.station + '_predictions.csv', csv_columns, prediction)
+
+    def select_access_point(self, ap: AccessPoint):
+        self.ap = ap
+        self.ap_ssid = ap.ssid
+        self.ap_bssid = ap.bssid
+        self.ap_ip = ap.ip
+
+    def handover_to_access_point(self, ap: AccessPoint):
+        """
+        Connects to the given AP: from the MANET (reconnect) or directly from another AP (roam).
+        Returns True if the station is associated with the AP.
+        """
+        self.handover_start = time.monotonic()
+        self.log_event('reconnect', 1)
+        with self.trace.span('handover_ap', bssid=ap.bssid, roaming=self.connected_to_ap):
+            if ap.bssid != self.ap_bssid:
+                log.info("*** {}: Roaming from {} to {}".format(self.interface, self.ap, ap))
+                if self.connected_to_ap:
+                    with self.trace.span('iw_disconnect'):
+                        stdout, stderr = cmd_iw_dev(self.interface, "disconnect")
+                if self.prober:
+                    # The AP reachability is measured to the AP the station roams to
+                    self.prober.replace_destination(self.ap_ip, ap.ip)
+                self.select_access_point(ap)
+                self.link_filter.reset()
+                if self.predictor:
+                    self.predictor.reset()
+            reconnected = self.reconnect_to_access_point()
+        self.log_event('reconnect', 2)
+        return reconnected
+
+    def handover_allowed(self, forced: bool = False):
+        """
+        Asks the handover policy whether a handover may start now. The reason of a suppressed handover is logged once.
+        """
+        reason = self.policy.blocked(forced)
+        if reason and reason != self.blocked_reason:
+            log.info("*** {}: Handover suppressed: {}".format(self.interface, reason))
+            self.policy.suppressed += 1
+        self.blocked_reason = reason
+        return reason is None
+
+    def record_handover(self, state: str, target: str = None):
+        """
+        Records a completed handover in the handover policy and logs a flap event if the station returned to its
+        previous AP or to the MANET within the flap window.
+        """
+        if self.policy.record(state, target=target):
+            print("*** Flap: back to {} after less than {} s".format(state, self.policy.flap_window))
+            self.log_event('flap', self.policy.flaps)
+
+    def complete_reconnect(self):
+        self.connected_to_ap = True
+        self.link_lost.clear()
+        self.record_handover('ap', self.ap_bssid)
+        if not self.scanner.paused:
+            print("*** Stopping background scan")
+            self.scanner.pause()
+            self.log_event('scanner_stop', 1)
+            # Discard measurements of a scan that finished during the reconnect
+            self.get_scan_signals()
+        self.wait_for_ap_convergence()
+        print("*** Reconnected to AP {}.".format(self.ap))
+        print("*** OLSRd PID: ", self.olsrd.pid)
+
+    def is_associated(self):
+        stdout, stderr = cmd_iw_dev(self.interface, "link")
+        return b'Connected to ' + self.ap_bssid.encode() in stdout
+
+    def get_ap_frequency(self):
+        """
+        Returns the frequency (MHz) of the current AP connection or None.
+        """
+        stdout, stderr = cmd_iw_dev(self.interface, "link")
+        freq = re.findall(r"freq: (\d+)", stdout.decode())
+        return int(freq[0]) if freq else None
+
+    def is_link_up(self):
+        stdout, stderr = cmd_ip_link_show(self.olsr_interface)
+        return b'state DOWN' not in stdout
+
+    def has_olsr_route(self):
+        """
+        Checks whether olsrd has a route to the ping destination or, if none is configured, at least one neighbour.
+        """
+        if self.pingto:
+            return self.olsr_info.has_route(self.pingto)
+        return bool(self.olsr_info.neighbours())
+
+    def is_ap_reachable(self):
+        process = Popen(["ping", "-c1", "-W1", self.ap_ip], stdout=PIPE, stderr=PIPE)
+        process.communicate()
+        return process.returncode == 0
+
+    def wait_for_olsr_convergence(self, handover: str = 'disconnect', start: float = None):
+        """
+        Waits until OLSR can forward to the configured destination and logs the convergence time of the handover
+        (measured from 'start', default: the start of the last handover).
+        """
+        result = self.wait('olsr_route', self.has_olsr_route, self.route_timeout)
+        self.log_convergence(handover, self.pingto if self.pingto else 'neighbour', result.success, start)
+        if result.success and self.pingto:
+            Popen(["ping", "-c1", self.pingto], stdout=PIPE, stderr=PIPE).communicate()
+        return result.success
+
+    def wait_for_ap_convergence(self):
+        """
+        Waits until the AP answers after a reconnect and logs the convergence time of the handover.
+        """
+        result = self.wait('ap_route', self.is_ap_reachable, self.route_timeout)
+        self.log_convergence('reconnect', self.ap_ip, result.success)
+        return result.success
+
+    def log_convergence(self, handover: str, destination: str, success: bool, start: float = None):
+        convergence_time = time.monotonic() - (self.handover_start if start is None else start)
+        if self.predictor and handover == 'disconnect' and success:
+            self.predictor.add_handover_duration(convergence_time)
+        log.info("*** {}: Handover ({}) {} after {:.3f} s".format(self.interface, handover,
+                                                                 "complete" if success else "not converged",
+                                                                 convergence_time))
+        data = {'time': self.clock.now(), 'handover': handover,
+                'destination': destination, 'convergence_time': convergence_time, 'success': int(success)}
+        csv_columns = ['time', 'handover', 'destination', 'convergence_time', 'success']
+        self.csv_writer.write(self.out_path + self.station + '_convergence.csv', csv_columns, data)
+
+    def get_ip_address(self):
+        """
+        Returns the IPv4 address with prefix length (e.g. 10.0.0.1/8) of the primary interface.
+        """
+        stdout, stderr = cmd_ip_addr("show", "dev", self.interface)
+        address = re.findall(r"inet (\S+)", stdout.decode())
+        return address[0] if address else None
+
+    def wait(self, name: str, condition, timeout: float):
+        """
+        Waits with backoff until the condition is met or the timeout has passed.
+        The duration of every wait is written to <station>_waits.csv.
+        Returns the WaitResult.
+        """
+        with self.trace.span('wait_' + name):
+            result = wait_for(condition, name, timeout, raise_on_timeout=False)
+        if result.success:
+            log.info("*** {}: Waited {:.3f} s for {} ({} attempts)".format(self.interface, result.duration, name,
+                                                                         result.attempts))
+        else:
+            log.info("*** {}: Waiting for {} timed out after {:.3f} s ({} attempts)".format(
+                self.interface, name, result.duration, result.attempts))
+        self.record_wait(result)
+        return result
+
+    def record_wait(self, result):
+        data = {'time': self.clock.now(), 'name': result.name,
+                'duration': result.duration, 'attempts': result.attempts, 'success': int(result.success)}
+        csv_columns = ['time', 'name', 'duration', 'attempts', 'success']
+        self.csv_writer.write(self.out_path + self.station + '_waits.csv', csv_columns, data)
+
+    def log_poll_rate(self):
+        """
+        Counts a poll of the monitor loop and periodically logs the achieved poll rate.
+        """
+        report = self.poll_scheduler.tick()
+        if report:
+            log.info("*** {}: Poll rate {:.2f} Hz (current interval: {:.3f} s)".format(self.interface, report['rate'],
+                                                                                     report['interval']))
+            report.update({'time': self.clock.now()})
+            csv_columns = ['time', 'polls', 'rate', 'interval']
+            self.csv_writer.write(self.out_path + self.station + '_poll-rate.csv', csv_columns, report)
+            self.log_command_latency()
+
+    def log_command_latency(self):
+        """
+        Logs the latency percentiles and timeouts of the iw/ip/tc commands run so far to <station>_commands.csv.
+        """
+        now = self.clock.now()
+        csv_columns = ['time', 'command', 'count', 'timeouts', 'p50', 'p90', 'p99', 'max']
+        for command, summary in sorted(self.commands.summary().items()):
+            log.info("*** {}: Command '{}': {} runs, {} timeouts, p50 {:.3f} s, p99 {:.3f} s, max {:.3f} s".format(
+                self.interface, command, summary['count'], summary['timeouts'], summary['p50'], summary['p99'],
+                summary['max']))
+            summary.update({'time': now, 'command': command})
+            self.csv_writer.write(self.out_path + self.station + '_commands.csv', csv_columns, summary)
 
     def log_event(self, event: str, value: int):
-        csv_columns = ['time', 'disconnect', 'reconnect', 'scanner_start', 'scanner_stop', 'scan_trigger']
-        data = {k: 0 for k in csv_columns}
-        data.update({'time': datetime.now().timestamp() - self.start_time, event: value})
-        file = self.out_path + self.station + '_events.csv'
-        write_or_append_csv_to_file(data, csv_columns, file)
+        self.event_log.log(event, value)
+
+    def log_probe(self, probe: dict):
+        csv_columns = ['time', 'destination', 'seq', 'rtt', 'lost']
+        self.csv_writer.write(self.out_path + self.station + '_probes.csv', csv_columns, probe)
+
+    def log_outage(self, outage: dict):
+        """
+        Writes a data plane outage measured by the prober (callback in the prober thread) to <station>_outages.csv.
+        """
+        log.info("*** {}: {} unreachable for {:.3f} s ({} probes lost)".format(
+            self.interface, outage['destination'], outage['duration'], outage['lost']))
+        csv_columns = ['start', 'end', 'duration', 'destination', 'lost']
+        self.csv_writer.write(self.out_path + self.station + '_outages.csv', csv_columns, outage)
+
+    @property
+    def data_interface(self):
+        """
+        The interface that carries the traffic: the OLSR interface while olsrd runs, else the AP interface.
+        """
+        return self.olsr_interface if self.olsr_active else self.interface
+
+    def set_qdisc_rate(self, step: str, rate: float, rate_unit: str, throttled: bool, category: str = 'handover'):
+        """
+        Changes the HTB rate of the qdisc of the data interface during a handover step (e.g. 'disconnect_throttle').
+        The duration of every rate change is written to <station>_qdisc.csv and traced in the given category.
+        """
+        interface = self.data_interface
+        with self.trace.span('update_qdisc', category, step=step, interface=interface, rate=str(rate) + rate_unit):
+            result = update_qdisc(interface, rate, rate_unit, self.tc)
+        self.qdisc.update({'throttled': throttled})
+        data = {'time': self.clock.now(), 'step': step, 'interface': interface, 'rate': rate, 'unit': rate_unit,
+                'duration': result.duration, 'success': int(result.success)}
+        csv_columns = ['time', 'step', 'interface', 'rate', 'unit', 'duration', 'success']
+        self.csv_writer.write(self.out_path + self.station + '_qdisc.csv', csv_columns, data)
+
+    def shape_traffic(self, ap_link_signal: dict = None):
+        """
+        Capacity shaping: adjusts the HTB rate to the TX bitrate of the AP link (or to the mesh rate while in the
+        MANET) and lowers it while the signal approaches the disconnect threshold.
+        """
+        if not self.shaper:
+            return
+        if ap_link_signal:
+            time_to_threshold = self.predictor.time_to_threshold() if self.predictor else None
+            headroom = self.shaper.headroom(ap_link_signal['signal_avg'], self.disconnect_threshold, time_to_threshold,
+                                            self.predictor.handover_duration if self.predictor else None)
+            rate = self.shaper.update(parse_bitrate(ap_link_signal['tx_bitrate']), headroom)
+        else:
+            rate = self.shaper.update()
+        if rate:
+            # Rate changes outside of a handover are traced apart from the handover steps
+            self.set_qdisc_rate('capacity', rate, 'kbit', self.qdisc['throttled'], 'shaping')
+
+    def shape_handover(self, handover: str):
+        """
+        Capacity shaping: drops the HTB rate to the minimum at the start of a handover.
+        """
+        rate = self.shaper.handover() if self.shaper else None
+        if rate:
+            self.set_qdisc_rate(handover + '_ramp_down', rate, 'kbit', self.qdisc['throttled'])
+
+    def move_shaping(self, handover: str):
+        """
+        Capacity shaping with make-before-break: applies the current rate to the interface that carries the traffic
+        after the handover, as the rate changes during the handover went to the other radio.
+        """
+        if self.make_before_break and self.shaper and self.shaper.rate:
+            self.set_qdisc_rate(handover + '_move', self.shaper.rate, 'kbit', self.qdisc['throttled'])
 
     def reconnect_to_access_point(self):
         """
         Connects to the AP if the SSID is in range.
-        Returns 0 after successful reconnect.
+        Returns True after successful reconnect and False if the association timed out.
         """
+        self.shape_handover('reconnect')
         if self.qdisc['reconnect'] > 0:
-            update_qdisc(self.interface, self.qdisc['reconnect'], self.qdisc['throttle_unit'])
-            self.qdisc.update({'throttled': True})
-        if self.olsrd_pid > 0:
-            log.info("*** {}: OLSR runnning: Killing olsrd process (PID: {})".format(self.interface, self.olsrd_pid))
+            self.set_qdisc_rate('reconnect_throttle', self.qdisc['reconnect'], self.qdisc['throttle_unit'], True)
+        if self.olsr_active and not self.make_before_break:
+            log.info("*** {}: OLSR runnning: Stopping olsrd process (PID: {})".format(self.interface, self.olsrd.pid))
             self.stop_olsrd()
-        stdout, stderr = cmd_iw_dev(self.interface, "connect", self.ap_ssid)
-        stdout, stderr = cmd_iw_dev(self.interface, "link")
-        while b'Connected to ' + self.ap_bssid.encode() not in stdout:
-            stdout, stderr = cmd_iw_dev(self.interface, "link")
-        log.info("*** {}: Connected interface to {}".format(self.interface, self.ap_ssid))
+        if self.make_before_break:
+            # Both radios are busy until the primary one is associated and olsrd on the second one is stopped
+            self.scanner.hold()
+        with self.trace.span('iw_connect', ssid=self.ap_ssid):
+            if len(self.aps) > 1:
+                # Several APs may share the SSID, connect to the selected one
+                stdout, stderr = cmd_iw_dev(self.interface, "connect", self.ap_ssid, self.ap_bssid)
+            else:
+                stdout, stderr = cmd_iw_dev(self.interface, "connect", self.ap_ssid)
+        associated = self.wait('association', self.is_associated, self.association_timeout).success
+        if associated:
+            log.info("*** {}: Connected interface to {}".format(self.interface, self.ap_ssid))
+            if self.shaper:
+                self.shaper.enter_link()
+            if self.olsr_active:
+                # Make-before-break: the AP link is up, removing the OLSR routes moves the traffic back to it
+                log.info("*** {}: Stopping olsrd process on {} (PID: {})".format(self.interface, self.olsr_interface,
+                                                                                self.olsrd.pid))
+                self.stop_olsrd()
+        else:
+            log.info("*** {}: Connecting interface to {} failed".format(self.interface, self.ap_ssid))
+        if self.make_before_break:
+            self.move_shaping('reconnect')
+            self.release_scanner()
         if self.qdisc['reconnect'] > 0:
-            update_qdisc(self.interface, self.qdisc['standard'], self.qdisc['std_unit'])
-            self.qdisc.update({'throttled': False})
+            self.set_qdisc_rate('reconnect_restore', self.qdisc['standard'], self.qdisc['std_unit'], False)
+        return associated
 
     def stop_olsrd(self):
         """
         Stops OLSR and configures the wifi interface for a reconnection to the AP.
         """
-        os.kill(self.olsrd_pid, signal.SIGTERM)
-        log.info("*** {}: Killed given olsrd process (PID: {})".format(self.interface, self.olsrd_pid))
-        stdout, stderr = cmd_iw_dev(self.interface, "ibss", "leave")
-        log.info("*** {}: IBSS leave completed".format(self.interface))
-        stdout, stderr = cmd_iw_dev(self.interface, "set", "type", "managed")
-        log.info("*** {}: Set type to managed".format(self.interface))
-        self.olsrd_pid = 0
+        with self.trace.span('stop_olsrd', interface=self.olsr_interface):
+            pid = self.olsrd.pid
+            with self.trace.span('olsrd_stop'):
+                returncode = self.olsrd.stop()
+            log.info("*** {}: Stopped olsrd process (PID: {}, exit code: {})".format(self.olsr_interface, pid,
+                                                                                   returncode))
+            with self.trace.span('ibss_leave'):
+                stdout, stderr = cmd_iw_dev(self.olsr_interface, "ibss", "leave")
+            log.info("*** {}: IBSS leave completed".format(self.olsr_interface))
+            with self.trace.span('set_type_managed'):
+                stdout, stderr = cmd_iw_dev(self.olsr_interface, "set", "type", "managed")
+            log.info("*** {}: Set type to managed".format(self.olsr_interface))
+            if self.make_before_break and self.ip_address:
+                with self.trace.span('ip_addr_del'):
+                    stdout, stderr = cmd_ip_addr("del", self.ip_address, "dev", self.olsr_interface)
+        self.olsr_active = False
 
     def switch_to_olsr(self):
         """
         Configures the given wifi interface for OLSR and starts OLSRd in the background.
-        Returns the PID of the OLSRd process.
+        Returns False if a make-before-break handover was aborted and the station is still connected to the AP.
         """
+        self.shape_handover('disconnect')
         if self.qdisc['disconnect'] > 0 and not self.qdisc['throttled']:
-            update_qdisc(self.interface, self.qdisc['disconnect'], self.qdisc['throttle_unit'])
-            self.qdisc.update({'throttled': True})
-        self.prepare_olsrd(self.interface)
-        self.start_olsrd()
+            self.set_qdisc_rate('disconnect_throttle', self.qdisc['disconnect'], self.qdisc['throttle_unit'], True)
+        left_ap = True
+        if self.make_before_break:
+            left_ap = self.make_before_break_switch_to_olsr()
+        else:
+            self.prepare_olsrd(self.interface)
+            self.start_olsrd()
+        if self.shaper and self.olsr_active:
+            self.shaper.enter_mesh()
+        self.move_shaping('disconnect')
         if self.qdisc['disconnect'] > 0:
-            update_qdisc(self.interface, self.qdisc['standard'], self.qdisc['std_unit'])
-            self.qdisc.update({'throttled': False})
+            self.set_qdisc_rate('disconnect_restore', self.qdisc['standard'], self.qdisc['std_unit'], False)
+        return left_ap
+
+    def make_before_break_switch_to_olsr(self):
+        """
+        Brings up IBSS and OLSRd on the second radio while the primary interface is still associated with the AP.
+        The AP link is only released once olsrd has installed routes, so the traffic moves to the MANET without a gap.
+        The OLSR interface gets the station address without a prefix route, hence only the more specific OLSR routes
+        pull traffic away from the primary interface.
+        If olsrd is not ready or has no routes in time while the AP link is still up, the second radio leaves the IBSS
+        again and the station stays at the AP.
+        Returns True if the station left the AP.
+        """
+        # The second radio leaves scanning for the IBSS, the primary one is busy until the AP link is released
+        self.scanner.hold()
+        self.prepare_olsrd(self.olsr_interface)
+        if self.ip_address:
+            with self.trace.span('ip_addr_add'):
+                stdout, stderr = cmd_ip_addr("add", self.ip_address, "dev", self.olsr_interface, "noprefixroute")
+            log.info("*** {}: Added address {}".format(self.olsr_interface, self.ip_address))
+        converged = self.start_olsrd() and self.wait_for_olsr_convergence()
+        if not converged and self.is_associated():
+            log.info("*** {}: OLSR not ready on {}, keeping the connection to {}".format(
+                self.interface, self.olsr_interface, self.ap_ssid))
+            self.stop_olsrd()
+            self.release_scanner()
+            return False
+        with self.trace.span('iw_disconnect'):
+            stdout, stderr = cmd_iw_dev(self.interface, "disconnect")
+        log.info("*** {}: Disconnected from {}".format(self.interface, self.ap_ssid))
+        self.release_scanner()
+        return True
+
+    def release_scanner(self):
+        """
+        Make-before-break: lets the scanner continue on the radio that is idle in the current state.
+        """
+        self.scan_interface = self.interface if self.olsr_active else self.olsr_interface
+        self.scanner.release(self.scan_interface)
 
     def prepare_olsrd(self, interface: str):
         """
         Configures the given interface for ad-hoc mode and joins IBSS.
         """
-        ibss = {'ssid': 'adhocNet', 'freq': '2432', 'ht_cap': 'HT40+', 'bssid': '02:CA:FF:EE:BA:01'}
-        stdout, stderr = cmd_iw_dev(interface, "set", "type", "ibss")
-        log.info("*** {}: Set type to ibss".format(interface))
-        stdout, stderr = cmd_ip_link_set(interface, "up")
-        log.info("*** {}: Set ip link up".format(interface))
-        stdout, stderr = cmd_iw_dev(interface, "ibss", "join", ibss['ssid'], ibss['freq'], ibss['ht_cap'],
-                                    ibss['bssid'])
-        log.info("*** {}: Join ibss adhocNet".format(interface))
+        with self.trace.span('prepare_olsrd', interface=interface):
+            with self.trace.span('set_type_ibss'):
+                stdout, stderr = cmd_iw_dev(interface, "set", "type", "ibss")
+            log.info("*** {}: Set type to ibss".format(interface))
+            with self.trace.span('link_set_up'):
+                stdout, stderr = cmd_ip_link_set(interface, "up")
+            log.info("*** {}: Set ip link up".format(interface))
+            with self.trace.span('ibss_join'):
+                stdout, stderr = cmd_iw_dev(interface, "ibss", "join", IBSS['ssid'], IBSS['freq'], IBSS['ht_cap'],
+                                            IBSS['bssid'])
+            log.info("*** {}: Join ibss adhocNet".format(interface))
 
     def start_olsrd(self):
         """
-        Starts OLSRd on given interface.
-        Returns the process info of the started OLSRd process.
+        Starts OLSRd on the OLSR interface as a supervised child process and waits until it is ready.
+        The time to ready is written to <station>_waits.csv.
+        Returns True if olsrd is ready.
         """
-        path = os.path.dirname(os.path.abspath(__file__))
-        configfile = path + '/' + self.interface + '-olsrd.conf'
         # Wait for the interface to be in UP or DORMANT state
-        stdout, stderr = cmd_ip_link_show(self.interface)
-        while b'state DOWN' in stdout:
-            stdout, stderr = cmd_ip_link_show(self.interface)
-        log.info("*** {}: Starting OLSR".format(self.interface))
-        stdout, stderr = Popen(["olsrd", "-f", configfile, "-d", "0"], stdout=PIPE, stderr=PIPE).communicate()
-        stdout, stderr = Popen("pgrep -a olsrd | grep " + self.interface, shell=True, stdout=PIPE, stderr=PIPE).communicate()
-        if stdout:
-            self.olsrd_pid = int(stdout.split()[0])
-            log.info("*** {}: Started olsrd in the background (PID: )".format(self.interface, self.olsrd_pid))
-            print("*** OLSRd running (PID: {})".format(self.olsrd_pid))
+        if not self.wait('link_up', self.is_link_up, self.link_up_timeout).success:
+            log.info("*** {}: Interface still DOWN, starting OLSR anyway".format(self.olsr_interface))
+        log.info("*** {}: Starting OLSR".format(self.olsr_interface))
+        self.olsrd.config_file = self.olsrd_config
+        self.olsrd_steady = False
+        self.olsrd_started = time.monotonic()
+        with self.trace.span('olsrd_start'):
+            result = self.olsrd.start()
+        self.record_wait(result)
+        self.olsr_active = self.olsrd.running
+        if self.olsr_active:
+            log.info("*** {}: Started olsrd (PID: {})".format(self.olsr_interface, self.olsrd.pid))
+            print("*** OLSRd running (PID: {})".format(self.olsrd.pid))
         else:
-            log.info("*** {}: Starting olsrd failed".format(self.interface))
+            log.info("*** {}: Starting olsrd failed".format(self.olsr_interface))
             print("*** Starting OLSRd failed!")
+        return result.success
 
+    def restart_olsrd(self, config_file: str = None):
+        """
+        Warm restart of olsrd (e.g. after it exited unexpectedly) while the interface stays in the IBSS.
+        """
+        with self.trace.span('olsrd_restart'):
+            self.record_wait(self.olsrd.restart(config_file))
+        self.olsr_active = self.olsrd.running
+        log.info("*** {}: Restarted olsrd (PID: {})".format(self.olsr_interface, self.olsrd.pid))
 
-def write_or_append_csv_to_file(data: dict, csv_columns: list, file: str):
-    if os.path.isfile(file):
-        with open(file, 'a') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=csv_columns)
-            writer.writerow(data)
-    else:
-        with open(file, 'w') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=csv_columns)
-            writer.writeheader()
-            writer.writerow(data)
+    def switch_to_steady_profile(self):
+        """
+        Warm restarts olsrd with the steady state configuration.
+        olsrd cannot reload its configuration, so the OLSR routes are gone until it has reconverged: the restart is
+        logged as 'olsrd_steady' event and the time until the routes are back as 'olsrd_steady' convergence.
+        """
+        print("*** Switching OLSRd to the steady state configuration")
+        start = time.monotonic()
+        self.log_event('olsrd_steady', 1)
+        self.restart_olsrd(self.olsrd_steady_config)
+        self.olsrd_steady = True
+        if self.olsr_active:
+            threading.Thread(target=self.wait_for_olsr_convergence, args=('olsrd_steady', start), daemon=True).start()
 
 
 # function to create the qdisc
-def init_qdisc(interface: str, rate: float, rate_unit: str, latency: float = 2.0, latency_unit: str = 's'):
-    # deleting rules
-    subprocess.call('tc qdisc del dev ' + interface + ' root', shell=True)
+def init_qdisc(interface: str, rate: float, rate_unit: str, latency: float = 2.0, latency_unit: str = 's',
+               session: TcSession = None):
+    """
+    Replaces the root qdisc with an HTB qdisc limited to the rate. Without a session a tc session is started for the
+    setup only.
+    Returns the TcResult of the setup.
+    """
     # increasing the queue len - Root qdisc and default queue length:
-    subprocess.call('ip link set dev ' + interface + ' txqueuelen 10000', shell=True)
-    subprocess.call('tc qdisc add dev ' + interface + ' root handle 1: htb default 1', shell=True)
-    subprocess.call('tc class add dev ' + interface + ' parent 1: classid 1:1 htb rate ' + str(rate) + rate_unit, shell=True)  # ceil 1mbit
-    # subprocess.call('tc class add dev ' + interface + ' parent 1:1 classid 1:2 htb rate ' + str(rate) + rate_unit,
-    #                 shell=True)
-    # subprocess.call('tc qdisc add dev ' + interface + ' parent 1:2 handle 2: netem delay ' + str(latency) + latency_unit,
-    #                 shell=True)
+    stdout, stderr = cmd_ip_link_set(interface, "txqueuelen", "10000")
+    # tc class add dev <interface> parent 1:1 classid 1:2 htb rate <rate><rate_unit>
+    # tc qdisc add dev <interface> parent 1:2 handle 2: netem delay <latency><latency_unit>
+    tc = session if session else TcSession()
+    try:
+        return tc.init_htb(interface, rate, rate_unit)
+    finally:
+        if not session:
+            tc.close()
 
 
-def update_qdisc(interface: str, rate: float, rate_unit: str):
-    """Updates the HTB rate of the qdisc (Minimum: 8 bit)"""
+def update_qdisc(interface: str, rate: float, rate_unit: str, session: TcSession):
+    """Updates the HTB rate of the qdisc (Minimum: 8 bit) and returns the TcResult"""
     print("*** Updating qdisc with HTB rate {} {}".format(rate, rate_unit))
-    subprocess.call('tc class replace dev ' + interface + ' parent 1: classid 1:1 htb rate ' +
-                    str(rate) + rate_unit, shell=True)
-    log.info("*** {}: Qdisc updated with HTB rate {} {}".format(interface, rate, rate_unit))
-
+    result = session.set_htb_rate(interface, rate, rate_unit)
+    log.info("*** {}: Qdisc updated with HTB rate {} {} in {:.3f} s".format(interface, rate, rate_unit,
+                                                                        result.duration))
+    return result
 
-def sleep_and_ping(sleep_interval: float, ip: str):
-    time.sleep(sleep_interval)
-    subprocess.Popen(["ping", "-c1", ip]).communicate()
 
-
-if __name__ == '__main__':
+def create_parser():
     parser = argparse.ArgumentParser(description="Signal monitoring app")
     parser.add_argument("-i", "--interface", help="The interface to be monitored", type=str, required=True)
     parser.add_argument("-p", "--pingto", help="Define an address to ping after activating OLSR to test", type=str,
@@ -377,13 +1120,140 @@ if __name__ == '__main__':
     parser.add_argument("-w", "--signalwindow", help="Window for the moving average calculation of the signal strength", type=int, default=3)
     parser.add_argument("-t", "--starttime", help="Timestamp of the start of the experiment as synchronizing reference for measurements", type=float, required=True)
     parser.add_argument("-O", "--noolsr", help="Do not use olsr when connection to AP is lost (default: False)", action='store_true', default=False)
+    parser.add_argument("-L", "--linkbackend", help="Backend used to read the link signal: 'nl80211' keeps a netlink "
+                                                    "socket open, 'iw' parses 'iw dev <if> link' (default: iw)",
+                        type=str, choices=['iw', 'nl80211'], default='iw')
+    parser.add_argument("-E", "--linkevents", help="Source of connect/disconnect events that trigger an immediate "
+                                                   "switch to OLSR: 'nl80211' multicast events, 'iw' event or 'off' "
+                                                   "for polling only (default: nl80211)",
+                        type=str, choices=['nl80211', 'iw', 'off'], default='nl80211')
+    parser.add_argument("--linkeventreplay", help="Replay a recorded 'iw event -t' stream from the given file instead "
+                                                  "of listening to the kernel", type=str, default=None)
+    parser.add_argument("--pollmin", help="Shortest interval in seconds between two signal polls, used when the "
+                                          "signal is at a handover threshold (default: 0.1)", type=float, default=0.1)
+    parser.add_argument("--pollmax", help="Longest interval in seconds between two signal polls, used when the signal "
+                                          "is far away from the handover thresholds (default: 1.0)",
+                        type=float, default=1.0)
+    parser.add_argument("--pollmargin", help="Distance in dB to a handover threshold below which the poll interval is "
+                                             "shortened (default: 10.0)", type=float, default=10.0)
+    parser.add_argument("--associationtimeout", help="Seconds to wait for the association with the AP before the "
+                                                     "(re)connect is considered failed (default: 10.0)",
+                        type=float, default=10.0)
+    parser.add_argument("--linkuptimeout", help="Seconds to wait for the interface to leave state DOWN before starting "
+                                                "OLSR (default: 5.0)", type=float, default=5.0)
+    parser.add_argument("-M", "--makebeforebreak", help="Run OLSR on the scan interface and keep the AP connection "
+                                                        "until OLSR routes exist (requires -S, default: False)",
+                        action='store_true', default=False)
+    parser.add_argument("--routetimeout", help="Seconds to wait for OLSR routes before releasing the AP connection in "
+                                               "make-before-break mode (default: 10.0)", type=float, default=10.0)
+    parser.add_argument("--olsrdbin", help="olsrd binary to run (default: olsrd)", type=str, default='olsrd')
+    parser.add_argument("--olsrdreadytimeout", help="Seconds to wait for a started olsrd to become ready "
+                                                    "(default: 5.0)", type=float, default=5.0)
+    parser.add_argument("--olsrinfo", help="Source for OLSR neighbours and routes used to detect when the MANET can "
+                                           "forward: 'txtinfo' or 'jsoninfo' plugin (must be loaded by olsrd) or "
+                                           "'kernel' routing table (default: kernel)",
+                        type=str, choices=['txtinfo', 'jsoninfo', 'kernel'], default='kernel')
+    parser.add_argument("--olsrinfoport", help="Port of the olsrd txtinfo/jsoninfo plugin (default: 2006/9090)",
+                        type=int, default=None)
+    parser.add_argument("-P", "--olsrprofile", help="olsrd emission interval profile used after a handover to OLSR: "
+                                                    "fast, default or relaxed (default: default)",
+                        type=str, choices=['fast', 'default', 'relaxed'], default='default')
+    parser.add_argument("--olsrsteadyprofile", help="olsrd profile to warm restart olsrd with once the MANET is in "
+                                                    "steady state (default: keep the handover profile)",
+                        type=str, choices=['fast', 'default', 'relaxed'], default=None)
+    parser.add_argument("--olsrsteadyafter", help="Seconds after the start of olsrd after which the steady profile is "
+                                                  "applied (default: 30.0)", type=float, default=30.0)
+    parser.add_argument("--hellointerval", help="Override the HelloInterval of the olsrd profile (seconds)",
+                        type=float, default=None)
+    parser.add_argument("--tcinterval", help="Override the TcInterval of the olsrd profile (seconds)", type=float,
+                        default=None)
+    parser.add_argument("--lqlevel", help="olsrd LinkQualityLevel (0: hop count, 2: ETX, default: olsrd default)",
+                        type=int, choices=[0, 2], default=None)
+    parser.add_argument("--csvflushinterval", help="Interval in seconds in which buffered statistics rows are written "
+                                                   "to the CSV files (default: 0.5)", type=float, default=0.5)
+    parser.add_argument("--csvmaxlatency", help="Maximum time in seconds a statistics row is buffered before it is "
+                                                "written (default: 1.0)", type=float, default=1.0)
+    parser.add_argument("--scanmin", help="Interval in seconds between rapid scans while the AP signal is rising "
+                                          "(default: 0.5)", type=float, default=0.5)
+    parser.add_argument("--scanmax", help="Longest interval in seconds between two scans the backoff grows to while "
+                                          "the AP is out of range (default: 20.0)", type=float, default=20.0)
+    parser.add_argument("--scanbackoff", help="Factor the scan interval grows by after every scan that did not find "
+                                              "the AP (default: 2.0)", type=float, default=2.0)
+    parser.add_argument("--scanfreq", help="Frequencies in MHz of the AP to restrict the scans to (default: learned "
+                                           "from the AP connection and previous scans)", type=int, nargs='+',
+                        default=None)
+    parser.add_argument("--scanrising", help="Signal slope in dB/s above which the AP is considered approaching and "
+                                             "rapid scans are used (default: 0.5)", type=float, default=0.5)
+    parser.add_argument("--ap", help="Additional AP the station may roam to, given as SSID BSSID IP (can be used "
+                                     "several times)", type=str, nargs=3, action='append', default=None,
+                        metavar=('SSID', 'BSSID', 'IP'))
+    parser.add_argument("--roamhysteresis", help="Signal in dB another AP must be stronger than the current one to "
+                                                 "roam to it (default: 3.0)", type=float, default=3.0)
+    parser.add_argument("--roammargin", help="Distance in dB to the disconnect threshold below which the scanner looks "
+                                             "for other APs while connected (default: 5.0)", type=float, default=5.0)
+    parser.add_argument("--predict", help="Start the handover to OLSR when the signal trend predicts that the "
+                                          "disconnect threshold is reached before a handover could complete "
+                                          "(default: False)", action='store_true', default=False)
+    parser.add_argument("--predictwindow", help="Number of link measurements the signal trend is fitted to "
+                                                "(default: 10)", type=int, default=10)
+    parser.add_argument("--handoverduration", help="Initial estimate in seconds of the handover duration, replaced by "
+                                                   "the measured convergence times (default: 2.0)",
+                        type=float, default=2.0)
+    parser.add_argument("--signalfilter", help="Filter that smooths the signal strength: moving average (sma, window "
+                                               "-w), exponentially weighted moving average (ewma), median of the last "
+                                               "-w samples (median) or kalman (default: sma)",
+                        type=str, choices=FILTERS, default='sma')
+    parser.add_argument("--ewmaalpha", help="Smoothing factor of the ewma filter (default: 0.5)", type=float,
+                        default=0.5)
+    parser.add_argument("--kalmanq", help="Process noise (dB^2 per sample) of the kalman filter (default: 0.5)",
+                        type=float, default=0.5)
+    parser.add_argument("--kalmanr", help="Measurement noise (dB^2) of the kalman filter (default: 4.0)", type=float,
+                        default=4.0)
+    parser.add_argument("--mindwellap", help="Minimum time in seconds at an AP before a handover due to a weak signal "
+                                             "(default: 2.0)", type=float, default=2.0)
+    parser.add_argument("--mindwellolsr", help="Minimum time in seconds in the MANET before reconnecting to an AP "
+                                               "(default: 2.0)", type=float, default=2.0)
+    parser.add_argument("--holddown", help="Time in seconds no handover is tried after a failed one (default: 5.0)",
+                        type=float, default=5.0)
+    parser.add_argument("--maxhandovers", help="Maximum number of voluntary handovers per minute, 0 for no limit "
+                                               "(default: 10)", type=int, default=10)
+    parser.add_argument("--flapwindow", help="A handover back to the previous state within this time in seconds is "
+                                             "counted as flap (default: 10.0)", type=float, default=10.0)
+    parser.add_argument("--commandtimeout", help="Time in seconds after which a hanging iw or ip command is killed "
+                                                 "(scans: 15.0, default: 5.0)", type=float,
+                        default=cmd_utils.DEFAULT_TIMEOUT)
     parser.add_argument("-qd", "--qdiscdisconnect",
                         help="Bandwidth in bits/s to throttle qdisc to during handover AP to OLSR. 0 means deactivate qdisc (default: 0)",
                         type=int, default=0)
     parser.add_argument("-qr", "--qdiscreconnect",
                         help="Bandwidth in bits/s to throttle qdisc to during handover AP to OLSR. 0 means deactivate (default: 0)",
                         type=int, default=0)
-    args = parser.parse_args()
+    parser.add_argument("--shaping", help="Traffic shaping: 'fixed' throttles to the -qd/-qr rates during a handover, "
+                                          "'capacity' keeps the HTB rate at a share of the measured link capacity, "
+                                          "ramps it down before a handover and up after it (default: fixed)",
+                        type=str, choices=SHAPING_MODES, default='fixed')
+    parser.add_argument("--shapeutil", help="Share of the measured TX bitrate the capacity shaping allows "
+                                            "(default: 0.8)", type=float, default=0.8)
+    parser.add_argument("--shapemin", help="HTB rate in kbit/s the capacity shaping ramps down to during a handover "
+                                           "(default: 100)", type=float, default=100.0)
+    parser.add_argument("--shapemax", help="Upper limit of the capacity shaping rate in kbit/s (default: none)",
+                        type=float, default=None)
+    parser.add_argument("--meshrate", help="Capacity in kbit/s assumed for the MANET by the capacity shaping "
+                                           "(default: 1000)", type=float, default=1000.0)
+    parser.add_argument("--shapemargin", help="Distance in dB to the disconnect threshold below which the capacity "
+                                              "shaping starts to ramp down (default: 5.0)", type=float, default=5.0)
+    parser.add_argument("--rampup", help="Factor the capacity shaping rate grows by per poll after a handover "
+                                         "(default: 2.0)", type=float, default=2.0)
+    parser.add_argument("--probe", help="Rate in Hz of the ICMP probes to the AP and the -p destination that measure "
+                                        "RTT, loss and outages (e.g. 10 to 100, default: 0 = off)", type=float,
+                        default=0.0)
+    parser.add_argument("--probetimeout", help="Seconds after which a probe without reply is lost (default: 1.0)",
+                        type=float, default=1.0)
+    return parser
+
+
+if __name__ == '__main__':
+    args = create_parser().parse_args()
 
     log_format = logging.Formatter(fmt='%(levelname)-8s [%(asctime)s]: %(message)s')
     ch = logging.StreamHandler()
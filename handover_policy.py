@@ -0,0 +1,73 @@
+import time
+
+from collections import deque
+
+
+class HandoverPolicy:
+    """
+    State machine of the connection state ('ap' or 'olsr') that suppresses ping-pong handovers at the cell edge.
+    A handover that is not forced by a lost connection is only allowed if
+        - the station stayed at least 'min_ap_dwell' / 'min_olsr_dwell' seconds in its current state,
+        - no hold-down timer runs ('hold_down' seconds after a failed handover),
+        - fewer than 'max_per_minute' handovers happened during the last 60 seconds (0 disables the cap).
+    A handover back to the previous target (the same AP or the MANET) within 'flap_window' seconds counts as a flap,
+    a handover from one AP via the MANET to another AP does not.
+    """
+
+    def __init__(self, min_ap_dwell: float = 2.0, min_olsr_dwell: float = 2.0, hold_down: float = 5.0,
+                 max_per_minute: int = 10, flap_window: float = 10.0):
+        self.min_dwell = {'ap': min_ap_dwell, 'olsr': min_olsr_dwell}
+        self.hold_down = hold_down
+        self.max_per_minute = max_per_minute
+        self.flap_window = flap_window
+        self.state = 'ap'
+        # Target of the current and the previous state: the BSSID of the AP or 'olsr'
+        self.target = None
+        self.previous_target = None
+        self.entered = time.monotonic()
+        self.hold_down_until = 0.0
+        self.handovers = deque()
+        self.flaps = 0
+        # Number of times a handover was suppressed (counted once per blocking reason)
+        self.suppressed = 0
+
+    def blocked(self, forced: bool = False, now: float = None):
+        """
+        Returns the reason why a handover out of the current state is not allowed now or None if it is allowed.
+        Handovers forced by a lost connection are always allowed.
+        """
+        if forced:
+            return None
+        now = time.monotonic() if now is None else now
+        while self.handovers and now - self.handovers[0] > 60.0:
+            self.handovers.popleft()
+        if now - self.entered < self.min_dwell[self.state]:
+            return "minimum dwell time in {} state".format(self.state)
+        if now < self.hold_down_until:
+            return "hold-down after a failed handover"
+        if self.max_per_minute and len(self.handovers) >= self.max_per_minute:
+            return "{} handovers per minute".format(self.max_per_minute)
+        return None
+
+    def record(self, state: str, now: float = None, target: str = None):
+        """
+        Records a completed handover into 'state' with the given target (BSSID of the AP, default: the state).
+        Returns True if the handover is a flap (back to the previous target within the flap window).
+        """
+        now = time.monotonic() if now is None else now
+        target = target.lower() if target else state
+        flap = target == self.previous_target and now - self.entered < self.flap_window
+        if flap:
+            self.flaps += 1
+        self.previous_target = self.target
+        self.target = target
+        self.state = state
+        self.entered = now
+        self.handovers.append(now)
+        return flap
+
+    def failed(self, now: float = None):
+        """
+        Starts the hold-down timer after a failed handover.
+        """
+        self.hold_down_until = (time.monotonic() if now is None else now) + self.hold_down
@@ -0,0 +1,121 @@
+import logging
+
+from collections import deque
+
+log = logging.getLogger('logger')
+
+
+def linear_fit(samples):
+    """
+    Least squares line through the samples (tuples of time and value).
+    Returns (slope, value of the line at the time of the last sample) or None if the times do not differ.
+    """
+    n = len(samples)
+    if n < 2:
+        return None
+    t0 = samples[0][0]
+    mean_t = sum(t - t0 for t, v in samples) / n
+    mean_v = sum(v for t, v in samples) / n
+    var_t = sum((t - t0 - mean_t) ** 2 for t, v in samples)
+    if var_t <= 0:
+        return None
+    slope = sum((t - t0 - mean_t) * (v - mean_v) for t, v in samples) / var_t
+    return slope, mean_v + slope * (samples[-1][0] - t0 - mean_t)
+
+
+class HandoverPredictor:
+    """
+    Predicts when the AP signal will fall below the disconnect 'threshold' from the trend (least squares line) of the
+    last 'window' link measurements.
+    A handover should start once the predicted time to the threshold is shorter than the time a handover takes, which
+    is the average of the last 'history' measured handover (convergence) times, starting with 'handover_duration'.
+    Every triggered prediction is checked with the first AP measurement (link or scan) after the predicted crossing
+    time: a hit if the signal is below the threshold, a miss if it is not. Predictions without such a measurement within
+    'grace' seconds after the crossing stay unverified.
+    """
+
+    def __init__(self, threshold: float, window: int = 10, min_samples: int = 3, handover_duration: float = 2.0,
+                 history: int = 5, grace: float = 10.0):
+        self.threshold = threshold
+        self.min_samples = max(min_samples, 2)
+        self.samples = deque(maxlen=max(window, self.min_samples))
+        self.durations = deque([handover_duration], maxlen=history)
+        self.grace = grace
+        self.pending = None
+        self.stats = {'hit': 0, 'miss': 0, 'unverified': 0}
+
+    @property
+    def handover_duration(self):
+        return sum(self.durations) / len(self.durations)
+
+    def add_handover_duration(self, duration: float):
+        self.durations.append(duration)
+
+    def update(self, timestamp: float, signal: float):
+        self.samples.append((timestamp, signal))
+
+    def reset(self):
+        self.samples.clear()
+
+    def time_to_threshold(self):
+        """
+        Returns the predicted seconds until the signal falls below the threshold, 0 if the fitted signal already is
+        below it and None if there are too few samples or the signal is not falling.
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        fit = linear_fit(self.samples)
+        if fit is None:
+            return None
+        slope, signal = fit
+        if signal < self.threshold:
+            return 0.0
+        if slope >= 0:
+            return None
+        return (self.threshold - signal) / slope
+
+    def predict(self, timestamp: float):
+        """
+        Returns the prediction if a handover should start now, else None.
+        The prediction is only kept for verification once accept() is called for it.
+        """
+        horizon = self.time_to_threshold()
+        if horizon is None or horizon > self.handover_duration:
+            return None
+        return {'time': timestamp, 'horizon': horizon, 'handover_duration': self.handover_duration,
+                'slope': linear_fit(self.samples)[0], 'crossing': timestamp + horizon}
+
+    def accept(self, prediction: dict):
+        """
+        Keeps the prediction of a handover that has started to verify it later.
+        """
+        self.pending = prediction
+        self.reset()
+
+    def observe(self, timestamp: float, signal: float):
+        """
+        Verifies the pending prediction with an AP measurement.
+        Returns the evaluated prediction (with 'outcome', 'observed_signal' and 'delay') or None.
+        """
+        if not self.pending or timestamp < self.pending['crossing']:
+            return None
+        return self.evaluate('hit' if signal < self.threshold else 'miss', signal,
+                             timestamp - self.pending['crossing'])
+
+    def expire(self, timestamp: float):
+        """
+        Closes a pending prediction that could not be verified within the grace time.
+        Returns the evaluated prediction or None.
+        """
+        if not self.pending or timestamp < self.pending['crossing'] + self.grace:
+            return None
+        return self.evaluate('unverified', None, None)
+
+    def evaluate(self, outcome: str, signal, delay):
+        prediction = self.pending
+        prediction.update({'outcome': outcome, 'observed_signal': signal, 'delay': delay})
+        self.stats[outcome] += 1
+        self.pending = None
+        log.info("*** Handover prediction ({:.2f} s ahead): {} (hits: {}, misses: {}, unverified: {})".format(
+            prediction['horizon'], outcome, self.stats['hit'], self.stats['miss'], self.stats['unverified']))
+        return prediction
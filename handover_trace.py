@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+
+from contextlib import contextmanager
+
+from csv_writer import BufferedCsvWriter
+
+
+class HandoverTrace:
+    """
+    Span trace of the handover steps in the Chrome trace event format (JSON array format), which chrome://tracing and
+    Perfetto open directly.
+    Every span is a complete event ('ph': 'X') with start and duration in microseconds of the experiment clock, so the
+    traces of several stations line up. Spans of the same thread nest by time. The events are written one per line
+    without the closing bracket, which the format allows, so a trace of a killed controller stays readable.
+    The lines are queued to the background writer of the controller, so tracing a handover does no file I/O on the
+    control path.
+    """
+
+    def __init__(self, file: str, clock, name: str, writer: BufferedCsvWriter):
+        self.file = file
+        self.clock = clock
+        self.writer = writer
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.closed = False
+        # The writer appends, the trace of a previous run is replaced
+        open(file, 'w').close()
+        self.writer.write_text(self.file, '[\n')
+        self.write({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0, 'args': {'name': name}})
+        self.threads = set()
+
+    def write(self, event: dict):
+        if not self.closed:
+            self.writer.write_text(self.file, json.dumps(event) + ',\n')
+
+    def thread_id(self):
+        tid = threading.get_native_id()
+        with self.lock:
+            new = tid not in self.threads
+            self.threads.add(tid)
+        if new:
+            self.write({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                        'args': {'name': threading.current_thread().name}})
+        return tid
+
+    @contextmanager
+    def span(self, name: str, category: str = 'handover', **args):
+        """
+        Traces the duration of the with block as span 'name'. The keyword arguments are shown with the span.
+        """
+        start = self.clock.now()
+        try:
+            yield
+        finally:
+            end = self.clock.now()
+            self.write({'name': name, 'cat': category, 'ph': 'X', 'ts': round(start * 1e6, 1),
+                        'dur': round((end - start) * 1e6, 1), 'pid': self.pid, 'tid': self.thread_id(), 'args': args})
+
+    def close(self):
+        """
+        Stops tracing; the events traced so far are written when the writer is closed.
+        """
+        self.closed = True
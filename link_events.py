@@ -0,0 +1,177 @@
+import logging
+import os
+import re
+import select
+import socket
+import struct
+import threading
+import time
+
+from subprocess import Popen, PIPE
+
+from nl80211 import GenlSocket, format_mac, NL80211_ATTR_IFINDEX, NL80211_ATTR_MAC, NL80211_ATTR_REASON_CODE, \
+    NL80211_ATTR_DISCONNECTED_BY_AP, NL80211_CMD_CONNECT, NL80211_CMD_ROAM, NL80211_CMD_DISCONNECT, \
+    NL80211_CMD_DEAUTHENTICATE, NL80211_CMD_DISASSOCIATE
+
+log = logging.getLogger('logger')
+
+NL80211_EVENTS = {NL80211_CMD_CONNECT: 'connected', NL80211_CMD_ROAM: 'roamed', NL80211_CMD_DISCONNECT: 'disconnected',
+                  NL80211_CMD_DEAUTHENTICATE: 'deauth', NL80211_CMD_DISASSOCIATE: 'disassoc'}
+LINK_LOST_EVENTS = ('disconnected', 'deauth', 'disassoc')
+
+# Lines of 'iw event [-t]', e.g. "1612345678.123456: sta1-wlan0 (phy #0): disconnected (by AP) reason: 3: ..."
+IW_EVENT_LINE = re.compile(r"^(?:(?P<time>\d+\.\d+): )?(?P<interface>\S+) \(phy #\d+\): (?P<message>.*)$")
+IW_EVENT_MAC = re.compile(r"([0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5})")
+IW_EVENT_REASON = re.compile(r"reason:? (\d+)")
+
+
+class LinkEvent:
+    """
+    A connect, roam or disconnect event of a wifi interface reported by the kernel.
+    """
+
+    def __init__(self, kind: str, interface: str, bssid: str = None, reason: int = None, by_ap: bool = False,
+                 timestamp: float = None):
+        self.kind = kind
+        self.interface = interface
+        self.bssid = bssid
+        self.reason = reason
+        self.by_ap = by_ap
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @property
+    def link_lost(self):
+        return self.kind in LINK_LOST_EVENTS
+
+
+def parse_iw_event_line(line: str, interface: str):
+    """
+    Parses a single line of 'iw event' output.
+    Returns a LinkEvent if the line reports a connect, roam or disconnect of the given interface, otherwise None.
+    """
+    match = IW_EVENT_LINE.match(line.strip())
+    if not match or match.group('interface') != interface:
+        return None
+    message = match.group('message')
+    timestamp = float(match.group('time')) if match.group('time') else None
+    if message.startswith('connected to '):
+        kind = 'connected'
+    elif message.startswith('disconnected'):
+        kind = 'disconnected'
+    elif message.startswith('deauth'):
+        kind = 'deauth'
+    elif message.startswith('disassoc'):
+        kind = 'disassoc'
+    elif message.startswith('roamed to '):
+        kind = 'roamed'
+    else:
+        return None
+    mac = IW_EVENT_MAC.search(message)
+    reason = IW_EVENT_REASON.search(message)
+    return LinkEvent(kind, interface, mac.group(1).lower() if mac else None, int(reason.group(1)) if reason else None,
+                     '(by AP)' in message, timestamp)
+
+
+class LinkEventMonitor(threading.Thread):
+    """
+    Listens for connect/roam/disconnect events of a wifi interface and hands each event to a callback.
+    Sources:
+        'nl80211': subscribes to the nl80211 'mlme' multicast group (falls back to 'iw' if not available)
+        'iw':      parses the output of a long running 'iw event -t' process
+        'replay':  replays a recorded 'iw event -t' stream from a file, keeping the recorded time gaps
+    A socket-like object can be passed as 'sock' for the nl80211 source, e.g. a fake netlink responder.
+    stop() wakes the thread up through a pipe; the nl80211 socket is closed by the thread itself, never under a
+    blocking recv.
+    """
+
+    def __init__(self, interface: str, callback, source: str = 'nl80211', replay_file: str = None, sock=None):
+        super().__init__(daemon=True)
+        self.interface = interface
+        self.callback = callback
+        self.source = source
+        self.replay_file = replay_file
+        self.genl = None
+        self.process = None
+        self.stopped = threading.Event()
+        # Pipe that wakes the nl80211 thread up on stop(), closed by the thread under the lock
+        self.wakeup = None
+        self.wakeup_lock = threading.Lock()
+        if self.source == 'nl80211':
+            try:
+                self.genl = GenlSocket('nl80211', sock)
+                self.genl.subscribe('mlme')
+                self.ifindex = socket.if_nametoindex(interface)
+            except (OSError, KeyError) as e:
+                log.info("*** {}: nl80211 events not available ({}), falling back to iw event".format(interface, e))
+                if self.genl:
+                    self.genl.close()
+                    self.genl = None
+                self.source = 'iw'
+            else:
+                self.wakeup = os.pipe()
+
+    def run(self):
+        log.info("*** {}: Listening for link events (source: {})".format(self.interface, self.source))
+        if self.source == 'nl80211':
+            self.run_nl80211()
+        elif self.source == 'iw':
+            self.process = Popen(["iw", "event", "-t"], stdout=PIPE, stderr=PIPE, universal_newlines=True)
+            self.run_lines(self.process.stdout)
+        elif self.source == 'replay':
+            with open(self.replay_file) as file:
+                self.run_lines(file, replay=True)
+
+    def run_nl80211(self):
+        try:
+            while not self.stopped.is_set():
+                ready, _, _ = select.select([self.genl.sock, self.wakeup[0]], [], [])
+                if self.wakeup[0] in ready:
+                    break
+                self.handle_nl80211_messages(self.genl.recv_messages())
+        finally:
+            self.genl.close()
+            with self.wakeup_lock:
+                for fd in self.wakeup:
+                    os.close(fd)
+                self.wakeup = None
+
+    def handle_nl80211_messages(self, messages: list):
+        for cmd, attrs in messages:
+            if cmd not in NL80211_EVENTS or NL80211_ATTR_IFINDEX not in attrs:
+                continue
+            if struct.unpack('=I', attrs[NL80211_ATTR_IFINDEX])[0] != self.ifindex:
+                continue
+            bssid = format_mac(attrs[NL80211_ATTR_MAC]) if NL80211_ATTR_MAC in attrs else None
+            reason = struct.unpack('=H', attrs[NL80211_ATTR_REASON_CODE][:2])[0] \
+                if NL80211_ATTR_REASON_CODE in attrs else None
+            self.callback(LinkEvent(NL80211_EVENTS[cmd], self.interface, bssid, reason,
+                                    NL80211_ATTR_DISCONNECTED_BY_AP in attrs))
+
+    def run_lines(self, lines, replay: bool = False):
+        last_timestamp = None
+        for line in lines:
+            if self.stopped.is_set():
+                break
+            event = parse_iw_event_line(line, self.interface)
+            if not event:
+                continue
+            if replay:
+                if last_timestamp is not None and self.stopped.wait(max(0.0, event.timestamp - last_timestamp)):
+                    break
+                last_timestamp = event.timestamp
+                event.timestamp = time.time()
+            self.callback(event)
+
+    def stop(self):
+        self.stopped.set()
+        if self.process:
+            self.process.terminate()
+        with self.wakeup_lock:
+            if self.wakeup and self.is_alive():
+                os.write(self.wakeup[1], b'\0')
+            elif self.wakeup:
+                # The thread was never started
+                for fd in self.wakeup:
+                    os.close(fd)
+                self.wakeup = None
+                self.genl.close()
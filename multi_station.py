@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import ctypes
+import logging
+import os
+import signal
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cmd_utils
+import flexible_sdn
+
+from csv_writer import BufferedCsvWriter
+
+log = logging.getLogger('logger')
+
+CLONE_NEWNET = 0x40000000
+
+
+def enter_netns(pid: int):
+    """
+    Moves the calling thread into the network namespace of the process 'pid' (e.g. the shell of a Mininet-WiFi
+    station). Commands, child processes (olsrd, tc) and sockets (nl80211) created by the thread afterwards belong to
+    that namespace, as do the helper threads it starts.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    fd = os.open('/proc/{}/ns/net'.format(pid), os.O_RDONLY)
+    try:
+        if libc.setns(fd, CLONE_NEWNET) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, "Entering the network namespace of PID {} failed: {}".format(pid,
+                                                                                           os.strerror(errno)))
+    finally:
+        os.close(fd)
+
+
+class LinkLostEvent(threading.Event):
+    """
+    Link-lost flag of a station controller that also wakes up the coroutine of the station, so a disconnect reported
+    by the link event monitor thread is handled at once instead of after the poll interval.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self.wakeup = asyncio.Event()
+
+    def set(self):
+        super().set()
+        self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def wait_async(self, timeout: float):
+        """
+        Waits until the flag is set or the timeout has passed. Returns True if the flag is set.
+        """
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+        return self.is_set()
+
+
+class Station:
+    """
+    Per-station state of the multi-station controller: the parsed arguments of the station, its controller and a
+    single worker thread that runs all blocking work of the station (commands, waits during a handover) in the
+    network namespace of the station ('pid', None for the namespace of this process).
+    """
+
+    def __init__(self, args, pid: int = None):
+        self.args = args
+        self.name = args.interface.split('-')[0]
+        self.pid = pid
+        if pid:
+            self.executor = ThreadPoolExecutor(1, self.name, enter_netns, (pid,))
+        else:
+            self.executor = ThreadPoolExecutor(1, self.name)
+        self.controller = None
+
+
+class MultiStationController:
+    """
+    Runs the controllers of many stations in one process. Each station is a coroutine that sleeps for the poll interval
+    of its controller on the event loop and hands one iteration of the monitor loop (FlexibleSdnOlsrController.step)
+    to the worker thread of the station, so a station that is busy with a handover does not hold up the others.
+    All stations share one CSV writer; the statistics files keep the per-station layout of single-station runs.
+    """
+
+    def __init__(self, stations: list, flush_interval: float = 0.5, max_latency: float = 1.0):
+        self.stations = stations
+        self.csv_writer = BufferedCsvWriter(flush_interval, max_latency)
+
+    async def run(self):
+        self.csv_writer.start()
+        await asyncio.gather(*(self.run_station(station) for station in self.stations))
+
+    async def check_station(self, station: Station):
+        """
+        Checks with 'ip link show' in the network namespace of the station that its interfaces exist. The checks of all
+        stations run concurrently as asyncio subprocesses before the controllers are started.
+        Returns the missing interfaces.
+        """
+        interfaces = [station.args.interface] + ([station.args.scaninterface] if station.args.scaninterface else [])
+        netns = ['nsenter', '--net=/proc/{}/ns/net'.format(station.pid)] if station.pid else []
+        outputs = await asyncio.gather(*(cmd_utils.runner.run_async(netns + ['ip', 'link', 'show', interface])
+                                         for interface in interfaces))
+        return [interface for interface, output in zip(interfaces, outputs) if output.timed_out or not output[0]]
+
+    def start_station(self, station: Station):
+        statistics_dir, qdisc_rates = flexible_sdn.prepare_station(station.args)
+        return flexible_sdn.create_controller(station.args, statistics_dir, qdisc_rates, self.csv_writer)
+
+    async def run_station(self, station: Station):
+        """
+        Starts the controller of the station in its worker thread and runs its monitor loop.
+        A failing station is closed and logged, the other stations keep running.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            missing = await self.check_station(station)
+            if missing:
+                raise RuntimeError("Interface {} not found".format(', '.join(missing)))
+            station.controller = await loop.run_in_executor(station.executor, self.start_station, station)
+            controller = station.controller
+            link_lost = LinkLostEvent(loop)
+            if controller.link_lost.is_set():
+                link_lost.set()
+            controller.link_lost = link_lost
+            log.info("*** {}: Station started (network namespace of PID {})".format(station.name,
+                                                                                 station.pid or os.getpid()))
+            while True:
+                lost = await link_lost.wait_async(controller.poll_interval)
+                await loop.run_in_executor(station.executor, controller.step, lost)
+        except Exception as e:
+            log.exception("*** {}: Station failed ({})".format(station.name, e))
+            print("*** {}: Station failed ({})".format(station.name, e))
+            self.close_station(station)
+
+    def close_station(self, station: Station):
+        if station.controller:
+            station.controller.close()
+            station.controller = None
+        station.executor.shutdown(wait=False)
+
+    def close(self):
+        """
+        Stops the controllers of all stations and flushes the shared CSV writer.
+        """
+        for station in self.stations:
+            self.close_station(station)
+        self.csv_writer.close()
+
+
+def main(args, controller_args: list):
+    pids = {name: int(pid) for name, pid in (args.netns if args.netns else [])}
+    stations = []
+    for interfaces in args.station:
+        station_args = controller_args + ['-i', interfaces[0]]
+        if len(interfaces) > 1:
+            station_args += ['-S', interfaces[1]]
+        station_args = flexible_sdn.create_parser().parse_args(station_args)
+        stations.append(Station(station_args, pids.get(station_args.interface.split('-')[0])))
+    controller = MultiStationController(stations, stations[0].args.csvflushinterval, stations[0].args.csvmaxlatency)
+    # Raise SystemExit on SIGTERM as well so that buffered statistics are flushed in any case
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.quiet:
+            sys.stdout = open(os.devnull, 'w')
+        asyncio.run(controller.run())
+    finally:
+        controller.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the signal monitoring app for several stations in one process. "
+                                                 "All arguments not listed here are passed to the controller of every "
+                                                 "station (see flexible_sdn.py --help), e.g. -o <dir> -t <time>",
+                                     allow_abbrev=False)
+    parser.add_argument("--station", help="Interface of a station to be monitored, optionally followed by its scan "
+                                          "interface (can be used several times)", type=str, nargs='+',
+                        action='append', required=True, metavar='INTERFACE')
+    parser.add_argument("--netns", help="PID of a process in the network namespace of a station, e.g. sta1 1234 (can "
+                                        "be used several times, default: namespace of this process)", type=str,
+                        nargs=2, action='append', default=None, metavar=('STATION', 'PID'))
+    parser.add_argument("--quiet", help="Do not print the console output of the controllers", action='store_true',
+                        default=False)
+    args, controller_args = parser.parse_known_args()
+    if any(len(interfaces) > 2 for interfaces in args.station):
+        parser.error("--station takes an interface and an optional scan interface")
+
+    log_format = logging.Formatter(fmt='%(levelname)-8s [%(asctime)s]: %(message)s')
+    starttime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    path = os.path.dirname(os.path.abspath(__file__))
+    log.setLevel(logging.DEBUG)
+    log_fh = logging.FileHandler(path + '/data/logs/' + starttime + '_debug.log')
+    log_fh.setLevel(logging.DEBUG)
+    log_fh.setFormatter(log_format)
+    log.addHandler(log_fh)
+    log.info('*** Started multi_station.py for {}'.format(', '.join(interfaces[0] for interfaces in args.station)))
+
+    main(args, controller_args)
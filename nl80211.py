@@ -0,0 +1,253 @@
+import os
+import socket
+import struct
+
+# Netlink / generic netlink constants (linux/netlink.h, linux/genetlink.h)
+NETLINK_GENERIC = 16
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+NLA_TYPE_MASK = 0x3fff
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+# nl80211 constants (linux/nl80211.h)
+NL80211_CMD_GET_INTERFACE = 5
+NL80211_CMD_GET_STATION = 17
+NL80211_CMD_DEAUTHENTICATE = 39
+NL80211_CMD_DISASSOCIATE = 40
+NL80211_CMD_CONNECT = 46
+NL80211_CMD_ROAM = 47
+NL80211_CMD_DISCONNECT = 48
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_MAC = 6
+NL80211_ATTR_STA_INFO = 21
+NL80211_ATTR_WIPHY_FREQ = 38
+NL80211_ATTR_SSID = 52
+NL80211_ATTR_REASON_CODE = 54
+NL80211_ATTR_DISCONNECTED_BY_AP = 71
+NL80211_STA_INFO_SIGNAL = 7
+NL80211_STA_INFO_TX_BITRATE = 8
+NL80211_STA_INFO_SIGNAL_AVG = 13
+NL80211_STA_INFO_RX_BITRATE = 14
+NL80211_RATE_INFO_BITRATE = 1
+NL80211_RATE_INFO_BITRATE32 = 5
+
+NLMSGHDR = struct.Struct('=IHHII')
+GENLMSGHDR = struct.Struct('=BBH')
+NLATTR = struct.Struct('=HH')
+
+
+def nla_align(length: int):
+    return (length + 3) & ~3
+
+
+def pack_attr(attr_type: int, payload: bytes):
+    attr = NLATTR.pack(NLATTR.size + len(payload), attr_type) + payload
+    return attr + b'\x00' * (nla_align(len(attr)) - len(attr))
+
+
+def parse_attrs(data: bytes):
+    """
+    Parses a flat sequence of netlink attributes.
+    Returns a dict mapping the attribute type to its raw payload.
+    """
+    attrs = {}
+    offset = 0
+    while offset + NLATTR.size <= len(data):
+        length, attr_type = NLATTR.unpack_from(data, offset)
+        if length < NLATTR.size:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = data[offset + NLATTR.size:offset + length]
+        offset += nla_align(length)
+    return attrs
+
+
+def parse_attr_list(data: bytes):
+    """
+    Parses a nested attribute array (e.g. CTRL_ATTR_MCAST_GROUPS) into a list of attribute dicts.
+    """
+    return [parse_attrs(entry) for entry in parse_attrs(data).values()]
+
+
+def format_mac(data: bytes):
+    return ':'.join('{:02x}'.format(b) for b in data)
+
+
+def format_bitrate(rate_attrs: bytes):
+    """
+    Formats a nested NL80211_RATE_INFO attribute the same way 'iw' does (e.g. '54.0 MBit/s').
+    The bitrate is reported by the kernel in units of 100 kbit/s.
+    """
+    rate = parse_attrs(rate_attrs)
+    if NL80211_RATE_INFO_BITRATE32 in rate:
+        bitrate = struct.unpack('=I', rate[NL80211_RATE_INFO_BITRATE32])[0]
+    elif NL80211_RATE_INFO_BITRATE in rate:
+        bitrate = struct.unpack('=H', rate[NL80211_RATE_INFO_BITRATE])[0]
+    else:
+        return 'NaN'
+    return "{}.{} MBit/s".format(bitrate // 10, bitrate % 10)
+
+
+class GenlSocket:
+    """
+    Minimal generic netlink socket that stays open for the lifetime of the controller.
+    A socket-like object providing bind(), send(), recv() and close() can be passed in instead of a real netlink
+    socket, e.g. a fake netlink responder.
+    """
+
+    def __init__(self, family_name: str, sock=None):
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.sock = sock
+        self.sock.bind((0, 0))
+        self.seq = 0
+        self.family_name = family_name
+        self.family_id, self.mcast_groups = self.resolve_family(family_name)
+
+    def resolve_family(self, family_name: str):
+        """
+        Resolves the numeric id and the multicast groups of a generic netlink family.
+        """
+        replies = self.request(GENL_ID_CTRL, CTRL_CMD_GETFAMILY,
+                               [(CTRL_ATTR_FAMILY_NAME, family_name.encode() + b'\x00')], version=1)
+        if not replies:
+            raise OSError("Generic netlink family {} not found".format(family_name))
+        attrs = replies[0][1]
+        family_id = struct.unpack('=H', attrs[CTRL_ATTR_FAMILY_ID])[0]
+        mcast_groups = {}
+        if CTRL_ATTR_MCAST_GROUPS in attrs:
+            for group in parse_attr_list(attrs[CTRL_ATTR_MCAST_GROUPS]):
+                name = group[CTRL_ATTR_MCAST_GRP_NAME].rstrip(b'\x00').decode()
+                mcast_groups[name] = struct.unpack('=I', group[CTRL_ATTR_MCAST_GRP_ID])[0]
+        return family_id, mcast_groups
+
+    def request(self, family_id: int, cmd: int, attrs: list, dump: bool = False, version: int = 0):
+        """
+        Sends a generic netlink request and collects all replies belonging to it.
+        Returns a list of tuples (cmd, attribute dict).
+        """
+        self.seq += 1
+        payload = GENLMSGHDR.pack(cmd, version, 0) + b''.join(pack_attr(t, p) for t, p in attrs)
+        flags = NLM_F_REQUEST | (NLM_F_DUMP if dump else NLM_F_ACK)
+        self.sock.send(NLMSGHDR.pack(NLMSGHDR.size + len(payload), family_id, flags, self.seq, 0) + payload)
+        replies = []
+        while True:
+            for msg_type, flags, seq, payload in self.parse_messages(self.sock.recv(65536)):
+                if seq != self.seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return replies
+                if msg_type == NLMSG_ERROR:
+                    error = struct.unpack_from('=i', payload)[0]
+                    if error < 0:
+                        raise OSError(-error, os.strerror(-error))
+                    # ACK of a non-dump request: all replies have been received
+                    return replies
+                cmd = GENLMSGHDR.unpack_from(payload)[0]
+                replies.append((cmd, parse_attrs(payload[GENLMSGHDR.size:])))
+
+    def subscribe(self, group: str):
+        """
+        Joins a multicast group of the family (e.g. 'mlme') to receive its events.
+        """
+        self.sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, self.mcast_groups[group])
+
+    def recv_messages(self):
+        """
+        Blocks until the next datagram arrives and returns its generic netlink messages as (cmd, attribute dict).
+        Used for multicast event subscriptions.
+        """
+        messages = []
+        for msg_type, flags, seq, payload in self.parse_messages(self.sock.recv(65536)):
+            if msg_type == self.family_id:
+                cmd = GENLMSGHDR.unpack_from(payload)[0]
+                messages.append((cmd, parse_attrs(payload[GENLMSGHDR.size:])))
+        return messages
+
+    @staticmethod
+    def parse_messages(data: bytes):
+        offset = 0
+        while offset + NLMSGHDR.size <= len(data):
+            length, msg_type, flags, seq, pid = NLMSGHDR.unpack_from(data, offset)
+            if length < NLMSGHDR.size:
+                break
+            yield msg_type, flags, seq, data[offset + NLMSGHDR.size:offset + length]
+            offset += nla_align(length)
+
+    def close(self):
+        self.sock.close()
+
+
+class StationInfo:
+    """
+    Typed link information of a managed interface as reported by nl80211.
+    """
+
+    def __init__(self, bssid: str, ssid: str, signal: int, rx_bitrate: str, tx_bitrate: str, freq: int = None):
+        self.bssid = bssid
+        self.ssid = ssid
+        self.signal = signal
+        self.rx_bitrate = rx_bitrate
+        self.tx_bitrate = tx_bitrate
+        self.freq = freq
+
+
+class Nl80211:
+    """
+    Reads the link quality of a wifi interface through a single, persistent nl80211 socket instead of forking
+    'iw dev <interface> link' for every poll.
+    """
+
+    def __init__(self, interface: str, sock=None):
+        self.interface = interface
+        self.ifindex = socket.if_nametoindex(interface)
+        self.genl = GenlSocket('nl80211', sock)
+
+    def get_station_info(self):
+        """
+        Fetches signal and bitrates of the AP the interface is associated with.
+        Returns None if the interface is not associated.
+        """
+        ifindex = struct.pack('=I', self.ifindex)
+        stations = self.genl.request(self.genl.family_id, NL80211_CMD_GET_STATION,
+                                     [(NL80211_ATTR_IFINDEX, ifindex)], dump=True)
+        if not stations:
+            return None
+        attrs = stations[0][1]
+        if NL80211_ATTR_MAC not in attrs or NL80211_ATTR_STA_INFO not in attrs:
+            return None
+        sta_info = parse_attrs(attrs[NL80211_ATTR_STA_INFO])
+        if NL80211_STA_INFO_SIGNAL in sta_info:
+            signal = struct.unpack('=b', sta_info[NL80211_STA_INFO_SIGNAL][:1])[0]
+        elif NL80211_STA_INFO_SIGNAL_AVG in sta_info:
+            signal = struct.unpack('=b', sta_info[NL80211_STA_INFO_SIGNAL_AVG][:1])[0]
+        else:
+            return None
+        rx_bitrate = format_bitrate(sta_info.get(NL80211_STA_INFO_RX_BITRATE, b''))
+        tx_bitrate = format_bitrate(sta_info.get(NL80211_STA_INFO_TX_BITRATE, b''))
+        bssid = format_mac(attrs[NL80211_ATTR_MAC])
+
+        interfaces = self.genl.request(self.genl.family_id, NL80211_CMD_GET_INTERFACE,
+                                       [(NL80211_ATTR_IFINDEX, ifindex)])
+        ssid, freq = None, None
+        if interfaces:
+            if_attrs = interfaces[0][1]
+            if NL80211_ATTR_SSID in if_attrs:
+                ssid = if_attrs[NL80211_ATTR_SSID].decode(errors='replace')
+            if NL80211_ATTR_WIPHY_FREQ in if_attrs:
+                freq = struct.unpack('=I', if_attrs[NL80211_ATTR_WIPHY_FREQ])[0]
+        return StationInfo(bssid, ssid, signal, rx_bitrate, tx_bitrate, freq)
+
+    def close(self):
+        self.genl.close()
@@ -0,0 +1,146 @@
+import ipaddress
+import json
+import os
+import socket
+import struct
+
+INFO_PORTS = {'txtinfo': 2006, 'jsoninfo': 9090}
+
+
+def proc_net(table: str):
+    """
+    Returns the path of a /proc/net table (e.g. 'route') of the network namespace of the calling thread.
+    /proc/net refers to the namespace of the main thread, which differs if a thread entered the namespace of a station.
+    """
+    path = '/proc/thread-self/net/' + table
+    return path if os.path.exists(path) else '/proc/net/' + table
+
+
+class OlsrInfo:
+    """
+    Queries the neighbours and routes known to the local olsrd.
+    Modes:
+        'txtinfo':  olsrd_txtinfo plugin (default port 2006)
+        'jsoninfo': olsrd_jsoninfo plugin (default port 9090)
+        'kernel':   local stand-in without plugin, reads the host/gateway routes olsrd installed on the OLSR interface
+                    from /proc/net/route
+    """
+
+    def __init__(self, mode: str = 'kernel', interface: str = None, host: str = '127.0.0.1', port: int = None,
+                 timeout: float = 0.5):
+        self.mode = mode
+        self.interface = interface
+        self.host = host
+        self.port = port if port else INFO_PORTS.get(mode)
+        self.timeout = timeout
+
+    def query(self, command: str):
+        """
+        Sends a command (e.g. '/routes') to the info plugin and returns its complete answer.
+        Returns an empty string if the plugin is not reachable (e.g. olsrd is still starting).
+        """
+        data = b''
+        try:
+            with socket.create_connection((self.host, self.port), self.timeout) as sock:
+                sock.sendall(command.encode() + b'\n')
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+        except OSError:
+            return ''
+        data = data.decode(errors='replace')
+        # Strip the HTTP header some plugin versions prepend
+        if data.startswith('HTTP/'):
+            data = data.split('\r\n\r\n', 1)[-1].split('\n\n', 1)[-1]
+        return data
+
+    def neighbours(self):
+        """
+        Returns the set of IP addresses of the symmetric one-hop neighbours.
+        """
+        if self.mode == 'txtinfo':
+            return {row[0] for row in self.txtinfo_table(self.query('/neighbors'), 'Neighbors')
+                    if len(row) > 1 and row[1] == 'YES'}
+        if self.mode == 'jsoninfo':
+            data = self.jsoninfo(self.query('/neighbors'))
+            return {n['ipAddress'] for n in data.get('neighbors', []) if n.get('symmetric', True)}
+        return {destination for destination, gateway in self.kernel_routes() if gateway is None}
+
+    def routes(self):
+        """
+        Returns the OLSR routes as a list of tuples (destination network, gateway or None for direct neighbours).
+        """
+        if self.mode == 'txtinfo':
+            routes = []
+            for row in self.txtinfo_table(self.query('/routes'), 'Routes'):
+                if len(row) > 1:
+                    gateway = row[1] if row[1] != row[0].split('/')[0] else None
+                    routes.append((ipaddress.ip_network(row[0], strict=False), gateway))
+            return routes
+        if self.mode == 'jsoninfo':
+            data = self.jsoninfo(self.query('/routes'))
+            return [(ipaddress.ip_network("{}/{}".format(r['destination'], r['genmask']), strict=False),
+                     r['gateway'] if r['gateway'] != r['destination'] else None) for r in data.get('routes', [])]
+        return [(ipaddress.ip_network(destination), gateway) for destination, gateway in self.kernel_routes()]
+
+    def has_route(self, destination: str):
+        """
+        Checks whether OLSR provides a route to the given destination address.
+        """
+        address = ipaddress.ip_address(destination)
+        return any(address in network for network, gateway in self.routes())
+
+    def kernel_routes(self):
+        """
+        Reads the IPv4 routes of the OLSR interface from /proc/net/route.
+        Only host routes and routes via a gateway count as OLSR routes, the prefix route of the interface and a default
+        route do not.
+        Returns a list of tuples (destination with prefix length, gateway or None).
+        """
+        routes = []
+        try:
+            with open(proc_net('route')) as file:
+                next(file)
+                for line in file:
+                    fields = line.split()
+                    if len(fields) < 8 or fields[0] != self.interface:
+                        continue
+                    destination, gateway, mask = (socket.inet_ntoa(struct.pack('<I', int(fields[i], 16)))
+                                                  for i in (1, 2, 7))
+                    prefix = ipaddress.ip_network("0.0.0.0/{}".format(mask)).prefixlen
+                    if prefix == 32 or (gateway != '0.0.0.0' and prefix > 0):
+                        routes.append(("{}/{}".format(destination, prefix),
+                                       gateway if gateway != '0.0.0.0' else None))
+        except (OSError, StopIteration):
+            pass
+        return routes
+
+    @staticmethod
+    def txtinfo_table(data: str, name: str):
+        """
+        Returns the data rows of the table 'Table: <name>' of a txtinfo answer split into columns.
+        """
+        rows = []
+        in_table = False
+        header_seen = False
+        for line in data.splitlines():
+            if line.startswith('Table: '):
+                in_table = line.strip() == 'Table: ' + name
+                header_seen = False
+                continue
+            if not in_table or not line.strip():
+                continue
+            if not header_seen:
+                header_seen = True
+                continue
+            rows.append(line.split('\t'))
+        return rows
+
+    @staticmethod
+    def jsoninfo(data: str):
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {}
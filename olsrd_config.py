@@ -0,0 +1,61 @@
+# Emission intervals and validity times in seconds.
+# 'fast' converges quickly after a handover at the cost of more control traffic, 'relaxed' is meant for the steady
+# state, 'default' equals the intervals of the formerly shipped static configuration files.
+PROFILES = {
+    'fast': {'HelloInterval': 0.5, 'HelloValidityTime': 5.0, 'TcInterval': 1.0, 'TcValidityTime': 15.0,
+             'MidInterval': 1.0, 'MidValidityTime': 15.0, 'HnaInterval': 1.0, 'HnaValidityTime': 15.0},
+    'default': {'HelloInterval': 2.0, 'HelloValidityTime': 20.0, 'TcInterval': 5.0, 'TcValidityTime': 300.0,
+                'MidInterval': 5.0, 'MidValidityTime': 300.0, 'HnaInterval': 5.0, 'HnaValidityTime': 300.0},
+    'relaxed': {'HelloInterval': 4.0, 'HelloValidityTime': 40.0, 'TcInterval': 10.0, 'TcValidityTime': 300.0,
+                'MidInterval': 10.0, 'MidValidityTime': 300.0, 'HnaInterval': 10.0, 'HnaValidityTime': 300.0},
+}
+
+GLOBAL_KEYS = ['LinkQualityLevel', 'LinkQualityAlgorithm', 'LinkQualityFishEye', 'TcRedundancy', 'MprCoverage',
+               'Pollrate']
+INFO_PLUGINS = {'txtinfo': 'olsrd_txtinfo.so.1.1', 'jsoninfo': 'olsrd_jsoninfo.so.1.1'}
+
+
+def olsrd_parameters(profile: str = 'default', overrides: dict = None):
+    """
+    Returns the olsrd parameters of the given profile updated with the overrides that are not None.
+    """
+    parameters = dict(PROFILES[profile])
+    if overrides:
+        parameters.update({k: v for k, v in overrides.items() if v is not None})
+    return parameters
+
+
+def generate_olsrd_config(interface: str, parameters: dict, info_plugin: str = None, info_port: int = None):
+    """
+    Returns the content of an olsrd configuration file for the given interface.
+    Global keys (e.g. LinkQualityLevel) are written to the top level, all other parameters into the interface block.
+    If 'info_plugin' ('txtinfo' or 'jsoninfo') is given the plugin is loaded and accepts requests from localhost.
+    """
+    lines = ["# Generated by flexible_sdn.py", ""]
+    for key in GLOBAL_KEYS:
+        if key in parameters:
+            lines.append(format_option(key, parameters[key]))
+    if info_plugin in INFO_PLUGINS:
+        lines += ["", 'LoadPlugin "{}"'.format(INFO_PLUGINS[info_plugin]), "{",
+                  '    PlParam "accept" "127.0.0.1"']
+        if info_port:
+            lines.append('    PlParam "port" "{}"'.format(info_port))
+        lines.append("}")
+    lines += ["", 'Interface "{}"'.format(interface), "{", "    Ip4Broadcast      0.0.0.0"]
+    for key, value in parameters.items():
+        if key not in GLOBAL_KEYS:
+            lines.append("    " + format_option(key, value))
+    lines += ["}", ""]
+    return "\n".join(lines)
+
+
+def write_olsrd_config(file: str, interface: str, parameters: dict, info_plugin: str = None, info_port: int = None):
+    with open(file, 'w') as config:
+        config.write(generate_olsrd_config(interface, parameters, info_plugin, info_port))
+    return file
+
+
+def format_option(key: str, value):
+    if isinstance(value, str):
+        return '{} "{}"'.format(key, value)
+    return "{} {}".format(key, value)
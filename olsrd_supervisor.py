@@ -0,0 +1,147 @@
+import logging
+import os
+import subprocess
+import time
+
+from subprocess import Popen, DEVNULL, STDOUT
+
+from olsr_info import proc_net
+from wait_utils import wait_for, WaitResult
+
+log = logging.getLogger('logger')
+
+OLSR_PORT = 698
+
+
+def socket_inodes(pid: int):
+    """
+    Returns the inodes of the sockets the process 'pid' has open.
+    """
+    inodes = set()
+    fd_dir = '/proc/{}/fd'.format(pid)
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return inodes
+    for fd in fds:
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if target.startswith('socket:['):
+            inodes.add(int(target[8:-1]))
+    return inodes
+
+
+def olsr_port_bound(pid: int = None, port: int = OLSR_PORT):
+    """
+    Checks whether a socket is bound to the OLSR port (698/udp) in the network namespace of this process and, if 'pid'
+    is given, whether that process owns the socket: stations that share a namespace each run an olsrd on the port.
+    Reads /proc instead of forking 'ss' or 'netstat'.
+    """
+    inodes = socket_inodes(pid) if pid else None
+    for table in (proc_net('udp'), proc_net('udp6')):
+        try:
+            with open(table) as file:
+                next(file)
+                for line in file:
+                    fields = line.split()
+                    if int(fields[1].rsplit(':', 1)[1], 16) == port and (inodes is None or int(fields[9]) in inodes):
+                        return True
+        except (OSError, StopIteration, IndexError, ValueError):
+            continue
+    return False
+
+
+class OlsrdSupervisor:
+    """
+    Runs olsrd as a direct child process ('-nofork') so that its PID is known without 'pgrep' and its exit can be
+    awaited. The time from starting the process until it is ready (the process bound its socket) is recorded per start.
+    A different binary (e.g. a stub for testing) and readiness check ('ready_check(pid)') can be passed in.
+    """
+
+    def __init__(self, interface: str, config_file: str, olsrd_bin: str = 'olsrd', log_file: str = None,
+                 ready_timeout: float = 5.0, stop_timeout: float = 2.0, ready_check=olsr_port_bound):
+        self.interface = interface
+        self.config_file = config_file
+        self.olsrd_bin = olsrd_bin
+        self.log_file = log_file
+        self.ready_timeout = ready_timeout
+        self.stop_timeout = stop_timeout
+        self.ready_check = ready_check
+        self.process = None
+        self.start_time = None
+        self.time_to_ready = []
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else 0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def is_ready(self):
+        return self.running and self.ready_check(self.pid)
+
+    def start(self):
+        """
+        Starts olsrd and waits until it is ready.
+        Returns the WaitResult of the readiness wait (the process keeps running if it is not ready in time).
+        """
+        if self.running:
+            self.stop()
+        output = open(self.log_file, 'a') if self.log_file else DEVNULL
+        self.start_time = time.monotonic()
+        try:
+            self.process = Popen([self.olsrd_bin, "-f", self.config_file, "-d", "0", "-nofork"], stdout=output,
+                                 stderr=STDOUT, stdin=DEVNULL)
+        except OSError as e:
+            log.info("*** {}: Starting {} failed ({})".format(self.interface, self.olsrd_bin, e))
+            self.process = None
+            return WaitResult('olsrd_ready', None, time.monotonic() - self.start_time, 0, False)
+        finally:
+            if output is not DEVNULL:
+                output.close()
+        result = wait_for(self.is_ready, 'olsrd_ready', self.ready_timeout, raise_on_timeout=False)
+        if result.success:
+            self.time_to_ready.append(result.duration)
+            log.info("*** {}: olsrd ready after {:.3f} s (PID: {})".format(self.interface, result.duration, self.pid))
+        elif not self.running:
+            log.info("*** {}: olsrd exited with code {}".format(self.interface, self.process.returncode))
+            self.process = None
+        else:
+            log.info("*** {}: olsrd not ready after {:.3f} s (PID: {})".format(self.interface, result.duration,
+                                                                             self.pid))
+        return result
+
+    def stop(self):
+        """
+        Stops olsrd gracefully with SIGTERM and kills it if it did not exit within 'stop_timeout' seconds.
+        Returns the exit code of the process or None if no process was running.
+        """
+        if not self.process:
+            return None
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(self.stop_timeout)
+            except subprocess.TimeoutExpired:
+                log.info("*** {}: olsrd did not exit within {} s, killing it (PID: {})".format(
+                    self.interface, self.stop_timeout, self.pid))
+                self.process.kill()
+                self.process.wait()
+        returncode = self.process.returncode
+        self.process = None
+        return returncode
+
+    def restart(self, config_file: str = None):
+        """
+        Warm restart: restarts only the olsrd process (optionally with another configuration) while the interface
+        stays in IBSS mode.
+        Returns the WaitResult of the readiness wait.
+        """
+        if config_file:
+            self.config_file = config_file
+        self.stop()
+        return self.start()
@@ -0,0 +1,46 @@
+import time
+
+
+class AdaptivePollScheduler:
+    """
+    Chooses the sleep interval of the signal monitor loop depending on how close the averaged signal is to the
+    threshold that would trigger the next handover.
+    Far away from the threshold (more than 'margin' dB) the loop polls with 'max_interval', at the threshold it polls
+    with 'min_interval' and in between the interval is interpolated linearly.
+    """
+
+    def __init__(self, min_interval: float = 0.1, max_interval: float = 1.0, margin: float = 10.0,
+                 report_interval: float = 10.0):
+        self.min_interval = min(min_interval, max_interval)
+        self.max_interval = max_interval
+        self.margin = margin
+        self.report_interval = report_interval
+        self.interval = max_interval
+        self.polls = 0
+        self.report_start = time.monotonic()
+
+    def next_interval(self, signal_avg: float = None, threshold: float = None):
+        """
+        Returns the interval until the next poll.
+        Without a signal or a threshold (e.g. while waiting for the first scan results) the slowest rate is used.
+        """
+        if signal_avg is None or threshold is None or self.margin <= 0:
+            self.interval = self.max_interval
+        else:
+            distance = min(abs(signal_avg - threshold), self.margin)
+            self.interval = self.min_interval + (self.max_interval - self.min_interval) * distance / self.margin
+        return self.interval
+
+    def tick(self):
+        """
+        Counts a poll. Returns a report with the achieved poll rate once every 'report_interval' seconds, else None.
+        """
+        self.polls += 1
+        now = time.monotonic()
+        elapsed = now - self.report_start
+        if elapsed < self.report_interval:
+            return None
+        report = {'polls': self.polls, 'rate': self.polls / elapsed, 'interval': self.interval}
+        self.polls = 0
+        self.report_start = now
+        return report
@@ -0,0 +1,221 @@
+import logging
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+from collections import OrderedDict
+
+log = logging.getLogger('logger')
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+
+def icmp_checksum(data: bytes):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack('!{}H'.format(len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class IcmpEchoSocket:
+    """
+    ICMP echo socket to one destination. An unprivileged ICMP datagram socket (net.ipv4.ping_group_range) is used if
+    allowed, else a raw socket (requires CAP_NET_RAW). The kernel sets identifier and checksum of a datagram socket and
+    only delivers its own replies; the replies on a raw socket are filtered by source address and identifier.
+    """
+
+    def __init__(self, destination: str, identifier: int):
+        self.destination = destination
+        self.identifier = identifier & 0xffff
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.raw = False
+        except OSError:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self.raw = True
+        self.sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, seq: int):
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, self.identifier, seq & 0xffff)
+        payload = struct.pack('!d', time.monotonic())
+        packet = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, icmp_checksum(header + payload), self.identifier,
+                             seq & 0xffff) + payload
+        self.sock.sendto(packet, (self.destination, 0))
+
+    def receive(self):
+        """
+        Returns the sequence numbers of the echo replies that have arrived.
+        """
+        replies = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return replies
+            if address[0] != self.destination:
+                continue
+            if self.raw:
+                # Raw sockets receive the IP header as well
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, code, checksum, identifier, seq = struct.unpack('!BBHHH', data[:8])
+            if icmp_type == ICMP_ECHO_REPLY and (not self.raw or identifier == self.identifier):
+                replies.append(seq)
+
+    def close(self):
+        self.sock.close()
+
+
+class ReachabilityProber(threading.Thread):
+    """
+    Sends ICMP echo probes at 'rate' Hz to every destination and measures RTT and loss of the data plane.
+    A probe without a reply within 'timeout' seconds is lost. Every probe is passed in order of its sequence number to
+    'callback(probe)' (time of sending, destination, seq, rtt, lost). A run of at least 'min_outage' lost probes is an
+    outage from the sending of the first lost probe to the sending of the next answered one; it is passed to
+    'outage_callback(outage)' once the destination answers again.
+    Callbacks run in the prober thread. Times are taken from 'clock' (e.g. the ExperimentClock of the controller).
+    A destination can be replaced while the prober runs (e.g. the AP after a roam), see replace_destination().
+    """
+
+    def __init__(self, destinations: list, rate: float = 20.0, timeout: float = 1.0, clock=None, callback=None,
+                 outage_callback=None, min_outage: int = 2):
+        super().__init__(daemon=True)
+        self.destinations = list(OrderedDict.fromkeys(d for d in destinations if d))
+        self.interval = 1.0 / rate
+        self.timeout = timeout
+        self.clock = clock
+        self.callback = callback
+        self.outage_callback = outage_callback
+        self.min_outage = max(min_outage, 1)
+        self.stopped = threading.Event()
+        # The sockets are created in the network namespace of the thread that creates the prober
+        self.sockets = [IcmpEchoSocket(destination, os.getpid() + i) for i, destination in
+                        enumerate(self.destinations)]
+        self.seq = {destination: 0 for destination in self.destinations}
+        # Probes of every destination that have been sent and are not yet answered or expired
+        self.pending = {destination: OrderedDict() for destination in self.destinations}
+        self.outages = {destination: None for destination in self.destinations}
+        self.stats = {destination: {'sent': 0, 'lost': 0, 'outages': 0} for destination in self.destinations}
+        # Sockets of new destinations that replace a destination from the next probe on, swapped in the prober thread
+        self.replacements = []
+        self.lock = threading.Lock()
+
+    def now(self):
+        return self.clock.now() if self.clock else time.time()
+
+    def stop(self):
+        self.stopped.set()
+
+    def replace_destination(self, old: str, new: str):
+        """
+        Probes 'new' instead of 'old' from the next probe on. The probes to 'old' that are still pending are reported
+        as lost if they are not answered by then. Safe to call from every thread; the socket of the new destination is
+        created in the network namespace of the calling thread.
+        """
+        with self.lock:
+            if not new or old == new or old not in self.destinations or new in self.destinations:
+                return
+            identifier = self.sockets[self.destinations.index(old)].identifier
+            self.replacements.append((old, IcmpEchoSocket(new, identifier)))
+
+    def run(self):
+        next_probe = time.monotonic()
+        while not self.stopped.is_set():
+            self.apply_replacements()
+            now = time.monotonic()
+            if now >= next_probe:
+                self.send_probes(now)
+                # Probes that are overdue (e.g. after a stall of the process) are skipped instead of sent in a burst
+                next_probe = max(next_probe + self.interval, now)
+            self.expire(time.monotonic())
+            ready, _, _ = select.select(self.sockets, [], [], max(0.0, next_probe - time.monotonic()))
+            for sock in ready:
+                self.receive(sock)
+        for sock in self.sockets:
+            sock.close()
+        for old, sock in self.replacements:
+            sock.close()
+
+    def apply_replacements(self):
+        with self.lock:
+            for old, sock in self.replacements:
+                index = self.destinations.index(old)
+                # Reports the answered probes and the unanswered ones as lost
+                self.complete(old, float('inf'))
+                self.sockets[index].close()
+                self.sockets[index] = sock
+                self.destinations[index] = new = sock.destination
+                del self.seq[old], self.pending[old], self.outages[old]
+                self.seq[new] = 0
+                self.pending[new] = OrderedDict()
+                self.outages[new] = None
+                self.stats.setdefault(new, {'sent': 0, 'lost': 0, 'outages': 0})
+                log.info("*** Probing {} instead of {}".format(new, old))
+            self.replacements = []
+
+    def send_probes(self, now: float):
+        for sock in self.sockets:
+            destination = sock.destination
+            seq = self.seq[destination] = (self.seq[destination] + 1) & 0xffff
+            self.pending[destination][seq] = {'sent': now, 'time': self.now(), 'rtt': None}
+            self.stats[destination]['sent'] += 1
+            try:
+                sock.send(seq)
+            except OSError:
+                # No route during a handover: the probe counts as lost once it expires
+                pass
+
+    def receive(self, sock: IcmpEchoSocket):
+        now = time.monotonic()
+        pending = self.pending[sock.destination]
+        for seq in sock.receive():
+            probe = pending.get(seq)
+            if probe and probe['rtt'] is None:
+                probe['rtt'] = now - probe['sent']
+        self.complete(sock.destination, now)
+
+    def expire(self, now: float):
+        for destination in self.destinations:
+            self.complete(destination, now)
+
+    def complete(self, destination: str, now: float):
+        """
+        Reports the answered or expired probes at the head of the pending probes of the destination in order.
+        """
+        pending = self.pending[destination]
+        while pending:
+            seq, probe = next(iter(pending.items()))
+            if probe['rtt'] is None and now - probe['sent'] < self.timeout:
+                return
+            del pending[seq]
+            self.report(destination, seq, probe)
+
+    def report(self, destination: str, seq: int, probe: dict):
+        lost = probe['rtt'] is None
+        if self.callback:
+            self.callback({'time': probe['time'], 'destination': destination, 'seq': seq,
+                           'rtt': probe['rtt'] if not lost else float('nan'), 'lost': int(lost)})
+        outage = self.outages[destination]
+        if lost:
+            self.stats[destination]['lost'] += 1
+            if outage is None:
+                self.outages[destination] = outage = {'start': probe['time'], 'lost': 0}
+            outage['lost'] += 1
+        elif outage is not None:
+            self.outages[destination] = None
+            if outage['lost'] >= self.min_outage:
+                self.stats[destination]['outages'] += 1
+                if self.outage_callback:
+                    self.outage_callback({'start': outage['start'], 'end': probe['time'],
+                                          'duration': probe['time'] - outage['start'], 'destination': destination,
+                                          'lost': outage['lost']})
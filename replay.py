@@ -0,0 +1,618 @@
+import argparse
+import bisect
+import csv
+import heapq
+import itertools
+import math
+import os
+import random
+import sys
+import time
+
+from contextlib import redirect_stdout
+from functools import partial
+
+import event_log
+import flexible_sdn
+import handover_policy
+import poll_scheduler
+import scan_scheduler
+import scan_table
+import scanner
+import wait_utils
+
+from ap_selection import AccessPoint
+from cmd_utils import CommandOutput
+from scanner import Scanner
+from tc_session import TcResult
+from wait_utils import WaitResult
+
+
+class ReplayFinished(Exception):
+    """
+    Raised by the virtual clock when the end of the trace is reached. Ends the controller loop.
+    """
+
+
+class VirtualClock:
+    """
+    Replaces the 'time' module of the controller modules during a replay.
+    sleep() does not block but advances the virtual time and runs the timers that are due in between (e.g. the scans
+    of the replay scanner). 'on_advance(start, end)' is called for every interval the clock advances by.
+    Once the clock reaches 'end' it raises ReplayFinished.
+    """
+
+    def __init__(self, start: float = 0.0, end: float = None, on_advance=None):
+        self.now = start
+        self.end = end
+        self.on_advance = on_advance
+        self.timers = []
+        self.sequence = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def call_at(self, due: float, callback):
+        heapq.heappush(self.timers, (due, next(self.sequence), callback))
+
+    def advance_to(self, target: float):
+        if self.end is not None:
+            target = min(target, self.end)
+        while self.timers and self.timers[0][0] <= target:
+            due, sequence, callback = heapq.heappop(self.timers)
+            self.set_time(max(due, self.now))
+            callback()
+        self.set_time(max(target, self.now))
+
+    def set_time(self, t: float):
+        if self.on_advance and t > self.now:
+            self.on_advance(self.now, t)
+        self.now = t
+
+    def sleep(self, seconds: float):
+        self.advance_to(self.now + max(seconds, 0.0))
+        if self.end is not None and self.now >= self.end:
+            raise ReplayFinished()
+
+
+class VirtualEvent:
+    """
+    threading.Event on the virtual clock: wait() advances the clock by the timeout.
+    """
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        self.flag = True
+
+    def clear(self):
+        self.flag = False
+
+    def wait(self, timeout: float = None):
+        if not self.flag:
+            self.clock.sleep(timeout if timeout is not None else 1.0)
+        return self.flag
+
+
+class InlineThread:
+    """
+    Runs the target of a helper thread of the controller (e.g. the wait for OLSR convergence) inline when it is
+    started. The controller loop resumes after the target has finished, so decisions that would be taken in parallel
+    are delayed until then.
+    """
+
+    def __init__(self, target=None, args=(), kwargs=None, daemon=None):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs if kwargs else {}
+
+    def start(self):
+        self.target(*self.args, **self.kwargs)
+
+
+class VirtualThreading:
+    """
+    Stand-in for the 'threading' module of the controller.
+    """
+
+    def __init__(self, clock: VirtualClock):
+        self.Event = partial(VirtualEvent, clock)
+        self.Thread = InlineThread
+
+
+class SignalTrace:
+    """
+    Signal of one AP over time as a list of samples (time, signal in dBm).
+    The signal at a time is the one of the last sample before it. If the last sample is older than 'max_gap' seconds
+    (or there is none yet) the AP is out of range.
+    """
+
+    def __init__(self, samples: list, max_gap: float = 10.0):
+        samples = sorted(samples)
+        self.times = [t for t, signal in samples]
+        self.signals = [signal for t, signal in samples]
+        self.max_gap = max_gap
+
+    @property
+    def start(self):
+        return self.times[0] if self.times else 0.0
+
+    @property
+    def end(self):
+        return self.times[-1] if self.times else 0.0
+
+    def signal(self, t: float):
+        i = bisect.bisect_right(self.times, t) - 1
+        if i < 0 or t - self.times[i] > self.max_gap:
+            return None
+        return self.signals[i]
+
+
+def load_signal_trace(file: str, ssid: str = None, max_gap: float = 10.0):
+    """
+    Loads the AP measurements (link and scan) of a recorded <interface>_signal.csv file, optionally only those of one
+    SSID.
+    """
+    samples = []
+    with open(file, newline='') as csv_file:
+        for row in csv.DictReader(csv_file):
+            if ssid and row['SSID'] != ssid:
+                continue
+            try:
+                samples.append((float(row['time']), float(row['signal'])))
+            except ValueError:
+                continue
+    return SignalTrace(samples, max_gap)
+
+
+def synthetic_trace(duration: float = 600.0, period: float = 120.0, near: float = -40.0, far: float = -95.0,
+                    noise: float = 2.0, step: float = 0.1, phase: float = 0.0, seed: int = 0):
+    """
+    Signal of a station that moves periodically towards the AP and away from it: the signal follows a cosine between
+    'near' and 'far' dBm with 'period' seconds (shifted by 'phase' periods) plus Gaussian noise with standard deviation
+    'noise' dB, sampled every 'step' seconds.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for i in range(int(duration / step) + 1):
+        t = i * step
+        level = 0.5 + 0.5 * math.cos(2 * math.pi * (t / period + phase))
+        samples.append((t, far + (near - far) * level + rng.gauss(0.0, noise)))
+    return SignalTrace(samples, 2 * step)
+
+
+def synthetic_traces(aps: list, duration: float = 600.0, period: float = 120.0, near: float = -40.0,
+                     far: float = -95.0, noise: float = 2.0, seed: int = 0):
+    """
+    Returns synthetic traces (BSSID -> SignalTrace) for the given APs. The phases are spread evenly over the period,
+    so the station passes the APs one after the other.
+    """
+    return {ap.bssid: synthetic_trace(duration, period, near, far, noise, phase=i / len(aps), seed=seed + i)
+            for i, ap in enumerate(aps)}
+
+
+def parse_controller_args(controller_args: list = None, out_path: str = '.'):
+    """
+    Parses arguments of flexible_sdn.py for a replay. Interface, output path and start time are preset.
+    """
+    return flexible_sdn.create_parser().parse_args(['-i', 'sta1-wlan0', '-o', out_path, '-t', '0'] +
+                                                   (controller_args if controller_args else []))
+
+
+def access_points(args):
+    """
+    Returns the APs of the parsed controller arguments: the AP given by -A/-B/-I followed by those given by --ap.
+    """
+    return [AccessPoint(args.apssid, args.apbssid, args.apip)] + [AccessPoint(*ap) for ap in (args.ap if args.ap else [])]
+
+
+class FakeRadio:
+    """
+    Answers the 'iw dev' and 'ip' commands of the controller and the scanner from the signal traces of the APs.
+    An AP is visible while its signal reaches 'sensitivity'. A connect completes 'association_delay' seconds after it
+    was issued if the AP is visible, an established connection is lost as soon as the AP is no longer visible.
+    Below 'usable_signal' an AP link loses packets: the loss grows linearly from 0 to 1 at 'sensitivity'.
+    """
+
+    def __init__(self, clock: VirtualClock, sensitivity: float = -90.0, association_delay: float = 0.1,
+                 usable_signal: float = -80.0):
+        self.clock = clock
+        self.sensitivity = sensitivity
+        self.usable_signal = max(usable_signal, sensitivity)
+        self.association_delay = association_delay
+        self.aps = {}
+        # interface -> (BSSID, time the association completes)
+        self.links = {}
+
+    def add_ap(self, ap: AccessPoint, trace: SignalTrace, freq: int = 2412):
+        self.aps[ap.bssid] = (ap, trace, freq)
+
+    def signal(self, bssid: str):
+        ap, trace, freq = self.aps[bssid]
+        signal = trace.signal(self.clock.now)
+        return signal if signal is not None and signal >= self.sensitivity else None
+
+    def link(self, interface: str):
+        """
+        Returns the BSSID the interface is associated with or None.
+        """
+        if interface not in self.links:
+            return None
+        bssid, since = self.links[interface]
+        if self.signal(bssid) is None:
+            del self.links[interface]
+            return None
+        return bssid if self.clock.now >= since else None
+
+    def associated(self):
+        return any(self.link(interface) for interface in list(self.links))
+
+    def loss(self):
+        """
+        Returns the share of packets lost on the best AP link (1 without a link).
+        """
+        bssids = [self.link(interface) for interface in list(self.links)]
+        signals = [self.signal(bssid) for bssid in bssids if bssid]
+        if not signals:
+            return 1.0
+        signal = max(signals)
+        if signal >= self.usable_signal or self.usable_signal <= self.sensitivity:
+            return 0.0
+        return (self.usable_signal - signal) / (self.usable_signal - self.sensitivity)
+
+    def cmd_iw_dev(self, interface: str, cmd: str, *args):
+        if cmd == 'link':
+            bssid = self.link(interface)
+            if not bssid:
+                return b'Not connected.\n', b''
+            ap, trace, freq = self.aps[bssid]
+            return "Connected to {} (on {})\n\tSSID: {}\n\tfreq: {}\n\tsignal: {:.0f} dBm\n" \
+                   "\trx bitrate: 54.0 MBit/s\n\ttx bitrate: 54.0 MBit/s\n".format(
+                       bssid, interface, ap.ssid, freq, self.signal(bssid)).encode(), b''
+        if cmd == 'connect':
+            self.links.pop(interface, None)
+            candidates = [bssid for bssid, (ap, trace, freq) in self.aps.items()
+                          if ap.ssid == args[0] and (len(args) < 2 or bssid == args[1].lower())
+                          and self.signal(bssid) is not None]
+            if candidates:
+                bssid = max(candidates, key=self.signal)
+                self.links[interface] = (bssid, self.clock.now + self.association_delay)
+            return b'', b''
+        if cmd == 'disconnect' or (cmd == 'set' and args[-1] == 'ibss'):
+            self.links.pop(interface, None)
+            return b'', b''
+        if cmd == 'scan':
+            return CommandOutput(self.scan(interface, list(args)).encode(), b'')
+        return b'', b''
+
+    def scan(self, interface: str, args: list):
+        frequencies, ssids, target = [], [], None
+        for arg in args:
+            if arg in ('freq', 'ssid'):
+                target = frequencies if arg == 'freq' else ssids
+            elif target is not None:
+                target.append(int(arg) if target is frequencies else arg)
+        blocks = []
+        for bssid, (ap, trace, freq) in self.aps.items():
+            signal = self.signal(bssid)
+            if signal is None or (frequencies and freq not in frequencies) or (ssids and ap.ssid not in ssids):
+                continue
+            blocks.append("BSS {}(on {})\n\tfreq: {}\n\tsignal: {:.2f} dBm\n\tSSID: {}\n".format(
+                bssid, interface, freq, signal, ap.ssid))
+        return ''.join(blocks)
+
+    def cmd_ip_link_set(self, interface: str, *args):
+        return b'', b''
+
+    def cmd_ip_link_show(self, interface: str):
+        return "1: {}: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 state UP\n".format(interface).encode(), b''
+
+    def cmd_ip_addr(self, cmd: str, *args):
+        if cmd == 'show':
+            return b'    inet 10.0.0.1/8 scope global\n', b''
+        return b'', b''
+
+
+class FakeOlsrd:
+    """
+    Stands in for the olsrd supervisor and the OLSR info source: olsrd is ready 'ready_delay' seconds after its start
+    and has routes into the MANET (which is assumed to be in range all the time) 'route_delay' seconds after it.
+    """
+
+    def __init__(self, clock: VirtualClock, ready_delay: float = 0.5, route_delay: float = 3.0):
+        self.clock = clock
+        self.ready_delay = ready_delay
+        self.route_delay = route_delay
+        self.config_file = None
+        self.started = None
+        self.starts = 0
+
+    @property
+    def pid(self):
+        return self.starts if self.started is not None else 0
+
+    @property
+    def running(self):
+        return self.started is not None
+
+    def start(self):
+        self.clock.sleep(self.ready_delay)
+        self.started = self.clock.now
+        self.starts += 1
+        return WaitResult('olsrd_ready', True, self.ready_delay, 1, True)
+
+    def stop(self):
+        returncode = 0 if self.running else None
+        self.started = None
+        return returncode
+
+    def restart(self, config_file: str = None):
+        if config_file:
+            self.config_file = config_file
+        self.stop()
+        return self.start()
+
+    def has_routes(self):
+        return self.running and self.clock.now - self.started >= self.route_delay
+
+    def has_route(self, destination: str):
+        return self.has_routes()
+
+    def neighbours(self):
+        return {'10.0.0.2'} if self.has_routes() else set()
+
+
+class FakeTcSession:
+    """
+    Stands in for the tc session of the controller: every tc command succeeds at once.
+    """
+
+    def start(self):
+        pass
+
+    def run(self, *commands: str):
+        return TcResult(list(commands), 0.0, True, [])
+
+    def init_htb(self, interface: str, rate: float, rate_unit: str):
+        return self.run('qdisc add dev {} root handle 1: htb default 1'.format(interface))
+
+    def set_htb_rate(self, interface: str, rate: float, rate_unit: str):
+        return self.run('class replace dev {} parent 1: classid 1:1 htb rate {}{}'.format(interface, rate, rate_unit))
+
+    def close(self):
+        pass
+
+
+class FakePing:
+    """
+    Stands in for the ping processes of the controller: a destination answers while the station is associated with an
+    AP or has OLSR routes.
+    """
+
+    def __init__(self, replay, args, stdout=None, stderr=None):
+        self.returncode = 0 if replay.connected() else 1
+
+    def communicate(self):
+        return b'', b''
+
+
+class ReplayScanner(Scanner):
+    """
+    Scanner without a thread: every scan is a timer of the virtual clock that is due one scan interval after the
+    previous scan. The first scan after a resume is due at once.
+    """
+
+    def __init__(self, clock: VirtualClock, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+        self.generation = 0
+
+    def start(self):
+        pass
+
+    def run_scan(self, args: list):
+        # The scan runs synchronously on the fake radio
+        return scanner.cmd_iw_dev(self.interface, *args)
+
+    def join(self, timeout: float = None):
+        pass
+
+    def resume(self):
+        super().resume()
+        self.schedule(0.0)
+
+    def schedule(self, delay: float = None):
+        # Scans scheduled before the last resume are dropped
+        self.generation += 1
+        delay = self.interval if delay is None else delay
+        self.clock.call_at(self.clock.now + delay, partial(self.scan_timer, self.generation))
+
+    def scan_timer(self, generation: int):
+        if generation != self.generation or self.paused or self.stopped.is_set():
+            return
+        if not self.held.is_set():
+            results, report = self.scan()
+            if self.callback:
+                self.callback(results, report)
+        self.schedule()
+
+
+class ControllerReplay:
+    """
+    Runs the decision logic of FlexibleSdnOlsrController.run_controller on recorded or synthetic signal traces instead
+    of live 'iw' output.
+    The controller is created from the same CLI arguments as flexible_sdn.py ('controller_args', e.g. ['-d', '-72']).
+    During the replay the 'time' and 'threading' modules, the command wrappers and the olsrd processes of the
+    controller modules are replaced by a virtual clock and fakes, so the replay runs as fast as the decisions can be
+    computed. The controller writes its statistics (e.g. <station>_events.csv) to 'out_path' as in a live run.
+    'traces' maps the BSSID of every AP (-B and --ap) to its SignalTrace.
+    The module replacements are process-wide, so only one replay can run per process at a time.
+    """
+
+    def __init__(self, traces: dict, out_path: str, controller_args: list = None, sensitivity: float = -90.0,
+                 association_delay: float = 0.1, olsrd_ready_delay: float = 0.5, route_delay: float = 3.0,
+                 verbose: bool = False, usable_signal: float = -80.0):
+        self.out_path = os.path.join(out_path, '')
+        self.args = parse_controller_args(controller_args, self.out_path)
+        self.args.linkbackend = 'iw'
+        self.args.linkevents = 'off'
+        self.args.linkeventreplay = None
+        self.args.probe = 0.0
+        self.aps = access_points(self.args)
+        self.traces = {bssid.lower(): trace for bssid, trace in traces.items()}
+        start = min(trace.start for trace in self.traces.values())
+        end = max(trace.end for trace in self.traces.values())
+        self.clock = VirtualClock(start, end, self.count_outage)
+        self.radio = FakeRadio(self.clock, sensitivity, association_delay, usable_signal)
+        for i, ap in enumerate(self.aps):
+            if ap.bssid in self.traces:
+                self.radio.add_ap(ap, self.traces[ap.bssid], 2412 + 25 * (i % 3))
+        self.olsrd = FakeOlsrd(self.clock, olsrd_ready_delay, route_delay)
+        self.verbose = verbose
+        self.outage = 0.0
+        self.handovers = {'ap': 0, 'olsr': 0}
+
+    def connected(self):
+        return self.radio.associated() or self.olsrd.has_routes()
+
+    def count_outage(self, start: float, end: float):
+        """
+        Adds the lost share of the interval to the outage: all of it without AP link and OLSR routes, the packet loss of
+        the AP link while the station stays at a weak AP.
+        """
+        if not self.olsrd.has_routes():
+            self.outage += (end - start) * self.radio.loss()
+
+    def patches(self):
+        """
+        Returns the list of (module, attribute, replacement) applied during the replay.
+        """
+        virtual_threading = VirtualThreading(self.clock)
+        patches = [(module, 'time', self.clock) for module in (flexible_sdn, wait_utils, event_log, scanner,
+                                                               scan_scheduler, scan_table, poll_scheduler,
+                                                               handover_policy)]
+        patches += [(flexible_sdn, 'threading', virtual_threading),
+                    (flexible_sdn, 'Popen', partial(FakePing, self)),
+                    (flexible_sdn, 'cmd_iw_dev', self.radio.cmd_iw_dev),
+                    (flexible_sdn, 'cmd_ip_link_set', self.radio.cmd_ip_link_set),
+                    (flexible_sdn, 'cmd_ip_link_show', self.radio.cmd_ip_link_show),
+                    (flexible_sdn, 'cmd_ip_addr', self.radio.cmd_ip_addr),
+                    (flexible_sdn, 'OlsrdSupervisor', lambda *args, **kwargs: self.olsrd),
+                    (flexible_sdn, 'OlsrInfo', lambda *args, **kwargs: self.olsrd),
+                    (flexible_sdn, 'TcSession', FakeTcSession),
+                    (flexible_sdn, 'Scanner', partial(ReplayScanner, self.clock)),
+                    (scanner, 'cmd_iw_dev', self.radio.cmd_iw_dev)]
+        return patches
+
+    def run(self):
+        """
+        Replays the traces from their first to their last sample.
+        Returns a summary with the replayed duration, the outage (time without AP connection and OLSR routes plus the
+        packet loss of a weak AP link as lost time), the
+        number of handovers, flaps and suppressed handovers and the wall clock time of the replay.
+        """
+        os.makedirs(self.out_path, exist_ok=True)
+        patches = self.patches()
+        originals = [(module, name, getattr(module, name)) for module, name, replacement in patches]
+        wall_start = time.perf_counter()
+        start = self.clock.now
+        controller = None
+        try:
+            for module, name, replacement in patches:
+                setattr(module, name, replacement)
+            with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stdout if self.verbose else devnull):
+                self.radio.cmd_iw_dev(self.args.interface, "connect", self.args.apssid)
+                try:
+                    controller = flexible_sdn.create_controller(self.args, self.out_path,
+                                                                {'disconnect': 0, 'reconnect': 0, 'unit': 'bit'})
+                    controller.record_handover = partial(self.record_handover, controller.record_handover)
+                    controller.run_controller()
+                except ReplayFinished:
+                    pass
+                finally:
+                    if controller:
+                        controller.close()
+        finally:
+            for module, name, original in originals:
+                setattr(module, name, original)
+        wall_time = time.perf_counter() - wall_start
+        duration = self.clock.now - start
+        return {'duration': duration, 'outage': self.outage, 'handovers_olsr': self.handovers['olsr'],
+                'handovers_ap': self.handovers['ap'], 'flaps': controller.policy.flaps if controller else 0,
+                'suppressed': controller.policy.suppressed if controller else 0, 'wall_time': wall_time,
+                'speedup': duration / wall_time if wall_time > 0 else float('inf')}
+
+    def record_handover(self, record, state: str, target: str = None):
+        self.handovers[state] += 1
+        record(state, target)
+
+
+def main(args, controller_args: list):
+    aps = access_points(parse_controller_args(controller_args))
+    if args.synthetic:
+        traces = synthetic_traces(aps, args.synthetic, args.period, args.near, args.far, args.noise, args.seed)
+    else:
+        traces = {aps[0].bssid: load_signal_trace(args.trace, aps[0].ssid, args.maxgap)}
+        for bssid, file in (args.aptrace if args.aptrace else []):
+            traces[bssid] = load_signal_trace(file, None, args.maxgap)
+    replay = ControllerReplay(traces, args.outdir, controller_args, args.sensitivity, args.associationdelay,
+                              args.olsrdreadydelay, args.routedelay, args.verbose, args.usablesignal)
+    summary = replay.run()
+    print("Replayed {:.1f} s in {:.3f} s ({:.0f}x real time)".format(summary['duration'], summary['wall_time'],
+                                                                     summary['speedup']))
+    print("Outage: {:.2f} s, handovers to OLSR: {}, handovers to AP: {}, flaps: {}, suppressed: {}".format(
+        summary['outage'], summary['handovers_olsr'], summary['handovers_ap'], summary['flaps'],
+        summary['suppressed']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic AP signal traces through the handover "
+                                                 "logic of flexible_sdn.py. All arguments not listed here are passed "
+                                                 "to the controller (see flexible_sdn.py --help), e.g. -d -72 -w 5",
+                                     allow_abbrev=False)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="Recorded <interface>_signal.csv file of the AP (-A/-B)", type=str)
+    source.add_argument("--synthetic", help="Replay synthetic traces of the given duration in seconds, the station "
+                                            "moves periodically towards every AP and away from it", type=float)
+    parser.add_argument("--aptrace", help="Recorded signal file of an additional AP (--ap) given as BSSID FILE (can be "
+                                          "used several times)", type=str, nargs=2, action='append', default=None,
+                        metavar=('BSSID', 'FILE'))
+    parser.add_argument("--maxgap", help="Seconds after the last sample of a recorded trace until the AP counts as out "
+                                         "of range (default: 10.0)", type=float, default=10.0)
+    parser.add_argument("--period", help="Period in seconds of the synthetic movement (default: 120.0)", type=float,
+                        default=120.0)
+    parser.add_argument("--near", help="Synthetic signal in dBm next to the AP (default: -40.0)", type=float,
+                        default=-40.0)
+    parser.add_argument("--far", help="Synthetic signal in dBm at the farthest point (default: -95.0)", type=float,
+                        default=-95.0)
+    parser.add_argument("--noise", help="Standard deviation in dB of the synthetic signal (default: 2.0)", type=float,
+                        default=2.0)
+    parser.add_argument("--seed", help="Seed of the synthetic noise (default: 0)", type=int, default=0)
+    parser.add_argument("--sensitivity", help="Signal in dBm below which an AP is out of range (default: -90.0)",
+                        type=float, default=-90.0)
+    parser.add_argument("--usablesignal", help="Signal in dBm below which the AP link loses packets, the loss grows "
+                                               "linearly to 100 %% at --sensitivity (default: -80.0)", type=float,
+                        default=-80.0)
+    parser.add_argument("--associationdelay", help="Seconds a connect to an AP in range takes (default: 0.1)",
+                        type=float, default=0.1)
+    parser.add_argument("--olsrdreadydelay", help="Seconds until a started olsrd is ready (default: 0.5)", type=float,
+                        default=0.5)
+    parser.add_argument("--routedelay", help="Seconds after the start of olsrd until OLSR routes exist (default: 3.0)",
+                        type=float, default=3.0)
+    parser.add_argument("--outdir", help="Directory for the statistics of the replay (default: ./data/replay)",
+                        type=str, default=os.path.dirname(os.path.abspath(__file__)) + '/data/replay')
+    parser.add_argument("--verbose", help="Show the console output of the controller", action='store_true',
+                        default=False)
+    args, controller_args = parser.parse_known_args()
+    main(args, controller_args)
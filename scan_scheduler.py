@@ -0,0 +1,82 @@
+import time
+
+from collections import deque
+
+from handover_predictor import linear_fit
+
+
+class AdaptiveScanScheduler:
+    """
+    Chooses when and on which channels the scanner looks for the AP.
+    Scans are restricted to the known frequencies of the AP candidates (configured or learned from previous scans and
+    the AP connection). Without configured frequencies, scans cover all channels as long as the frequency of a
+    candidate (see add_candidates) is unknown, so a candidate on another channel than the current AP is found.
+    While the AP stays out of range the interval grows by the factor 'backoff' up to 'max_interval'. When the AP is in
+    range the base 'interval' is used, and if its signal rises by at least 'rising_slope' dB/s over the last
+    'trend_window' scans (the station approaches the AP) the scanner switches to rapid scans with 'min_interval'.
+    """
+
+    def __init__(self, interval: float = 5.0, min_interval: float = 0.5, max_interval: float = 20.0,
+                 backoff: float = 2.0, frequencies: list = None, trend_window: int = 3, rising_slope: float = 0.5):
+        self.base_interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.backoff = backoff
+        self.frequencies = set(frequencies) if frequencies else set()
+        self.configured = bool(frequencies)
+        # BSSIDs of the candidates whose frequency has not been learned yet
+        self.unknown = set()
+        self.rising_slope = rising_slope
+        self.signals = deque(maxlen=max(trend_window, 2))
+        self.interval = interval
+
+    def scan_frequencies(self):
+        """
+        Returns the sorted list of frequencies (MHz) to scan, an empty list means all channels.
+        """
+        if self.unknown or not self.frequencies:
+            return []
+        return sorted(self.frequencies)
+
+    def add_candidates(self, bssids: list):
+        if not self.configured:
+            self.unknown.update(bssid.lower() for bssid in bssids)
+
+    def add_frequency(self, freq: int, bssid: str = None):
+        if freq:
+            self.frequencies.add(int(freq))
+            if bssid:
+                self.unknown.discard(bssid.lower())
+
+    def reset(self):
+        """
+        Starts over with the base interval, e.g. when the scanner is resumed after a disconnect.
+        """
+        self.signals.clear()
+        self.interval = self.base_interval
+
+    def update(self, signal: float = None, freq: int = None, timestamp: float = None):
+        """
+        Updates the schedule with the result of a scan: the signal (dBm) and frequency of the AP or None if the AP was
+        not found.
+        Returns the interval until the next scan.
+        """
+        if signal is None:
+            self.signals.clear()
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            return self.interval
+        self.add_frequency(freq)
+        self.signals.append((time.monotonic() if timestamp is None else timestamp, signal))
+        slope = self.trend()
+        if slope is not None and slope >= self.rising_slope:
+            self.interval = self.min_interval
+        else:
+            self.interval = self.base_interval
+        return self.interval
+
+    def trend(self):
+        """
+        Returns the slope (dB/s) of the least squares line through the recent AP signals or None if there are too few.
+        """
+        fit = linear_fit(self.signals)
+        return fit[0] if fit else None
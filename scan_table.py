@@ -0,0 +1,125 @@
+import time
+
+
+def parse_scan_dump(data: str, bssids: list = None):
+    """
+    Parses the output of 'iw dev <interface> scan' or 'scan dump' in a single pass.
+    Returns a dict BSSID -> {'bssid', 'ssid', 'signal' (dBm, float or None), 'freq' (MHz, int or None)}.
+    Only the top level 'freq', 'signal' and 'SSID' lines of each BSS block are searched for, the information elements
+    are not parsed.
+    If 'bssids' (lower case) is given, only the blocks of these BSSIDs are located and parsed, which costs about as
+    much as the search for the signal of a single BSSID (see benchmark_scan_parser.py). Without it every block is
+    parsed, several times the cost of that search.
+    """
+    if bssids is None:
+        blocks = ('\n' + data).split('\nBSS ')[1:]
+    else:
+        blocks = [block for block in (find_block(data, bssid) for bssid in bssids) if block]
+    entries = {}
+    for block in blocks:
+        bss = parse_block(block)
+        entries[bss['bssid']] = bss
+    return entries
+
+
+def find_block(data: str, bssid: str):
+    """
+    Returns the block of the BSSID (starting after 'BSS ') in the scan output or None.
+    """
+    if data.startswith('BSS ' + bssid):
+        start = 4
+    else:
+        start = data.find('\nBSS ' + bssid)
+        if start < 0:
+            return None
+        start += 5
+    end = data.find('\nBSS ', start)
+    return data[start:end] if end >= 0 else data[start:]
+
+
+def parse_block(block: str):
+    """
+    Returns the entry of the BSS block (the part of the scan output after 'BSS ').
+    """
+    bss = {'bssid': block[:17].lower(), 'ssid': None, 'signal': None, 'freq': None}
+    value = block_value(block, '\n\tsignal: ')
+    if value:
+        try:
+            bss['signal'] = float(value.split(None, 1)[0])
+        except ValueError:
+            pass
+    value = block_value(block, '\n\tfreq: ')
+    if value:
+        try:
+            bss['freq'] = int(float(value))
+        except ValueError:
+            pass
+    bss['ssid'] = block_value(block, '\n\tSSID: ')
+    return bss
+
+
+def block_value(block: str, key: str):
+    """
+    Returns the rest of the line after the first occurrence of 'key' in the block or None.
+    """
+    start = block.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    end = block.find('\n', start)
+    return block[start:end] if end >= 0 else block[start:]
+
+
+class ScanTable:
+    """
+    Signal table of the BSSs seen by the scanner, indexed by BSSID.
+    Every entry holds the SSID, signal and frequency of the last scan that found the BSS and the time it was last seen,
+    so the AP (or any other BSS) can be looked up in O(1) instead of searching the scan output again.
+    If 'bssids' is given, only these BSSs (e.g. the candidate APs) are indexed, which keeps an update about as cheap
+    as one search of the scan output; otherwise every BSS of a scan is indexed.
+    """
+
+    def __init__(self, bssids: list = None):
+        self.bssids = [bssid.lower() for bssid in bssids] if bssids else None
+        self.entries = {}
+
+    def update(self, data: str, timestamp: float = None):
+        """
+        Adds the results of a scan to the table.
+        Returns the dict of the BSSs found by this scan.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        found = parse_scan_dump(data, self.bssids)
+        for bss in found.values():
+            bss['last_seen'] = timestamp
+        self.entries.update(found)
+        return found
+
+    def get(self, bssid: str):
+        return self.entries.get(bssid.lower())
+
+    def signal(self, bssid: str):
+        entry = self.get(bssid)
+        return entry['signal'] if entry else None
+
+    def age(self, bssid: str, now: float = None):
+        """
+        Returns the seconds since the BSS was last seen or None if it was never seen.
+        """
+        entry = self.get(bssid)
+        if entry is None:
+            return None
+        return (time.monotonic() if now is None else now) - entry['last_seen']
+
+    def expire(self, max_age: float, now: float = None):
+        """
+        Removes the BSSs that were not seen for more than 'max_age' seconds.
+        """
+        now = time.monotonic() if now is None else now
+        self.entries = {bssid: bss for bssid, bss in self.entries.items() if now - bss['last_seen'] <= max_age}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, bssid: str):
+        return bssid.lower() in self.entries
@@ -1,51 +1,186 @@
 import logging
-import multiprocessing
-import os
-import csv
+import threading
+import time
 
-from time import sleep
-from datetime import datetime
-from cmd_utils import cmd_iw_dev
+from concurrent.futures import CancelledError
+
+from cmd_utils import CommandOutput, CommandRunner, cmd_iw_dev, use_runner
+from event_log import EventLog
+from scan_scheduler import AdaptiveScanScheduler
+from scan_table import ScanTable
 
 log = logging.getLogger('logger')
 
 
-class Scanner(multiprocessing.Process):
-    def __init__(self, interface: str, interval: float, log_path: str, station: str, ctrl_start_time: float,
-                 ssid: str = None):
-        super().__init__()
+class Scanner(threading.Thread):
+    """
+    Long-lived background scanner. It is started once, paused while the station is connected to the AP and resumed
+    when the station needs to look for the AP again.
+    The scan scheduler decides when the next scan is triggered and which frequencies it covers. The candidate APs
+    ('bssids', all BSSs if none are given) found by every scan are added to the BSSID-indexed scan table, the BSSs found by the scan (dict BSSID -> entry) and a report of the
+    scan are passed to 'callback(results, report)' (in the scanner thread), so no separate 'iw scan dump' is needed.
+    The report contains the duration of the scan and, if the scan interface carries data on 'data_freq', an estimate of
+    the time spent off the data channel (the share of the scanned channels that differ from the data channel).
+    A scan that was killed after its timeout is reported as 'timed_out' and leaves the scan table and the scheduler
+    unchanged, as its partial output says nothing about the APs in range.
+    The scans run in the thread pool of the command 'runner' of the controller, if given, so hold() and stop() kill a
+    running scan instead of waiting up to the scan timeout for it.
+    """
+
+    def __init__(self, interface: str, interval: float, event_log: EventLog, ssids: list = None, callback=None,
+                 bssids: list = None, scheduler: AdaptiveScanScheduler = None, data_freq: int = None,
+                 runner: CommandRunner = None):
+        super().__init__(daemon=True)
+        self.runner = runner
         self.interface = interface
-        self.interval = interval
-        self.ssid = ssid
-        self.log_file = log_path + station + '_events.csv'
-        self.control_start_time = ctrl_start_time
+        self.ssids = ssids if ssids else []
+        self.bssids = [bssid.lower() for bssid in bssids] if bssids else []
+        self.event_log = event_log
+        self.callback = callback
+        self.scheduler = scheduler if scheduler else AdaptiveScanScheduler(interval, interval, interval, 1.0)
+        self.scheduler.add_candidates(self.bssids)
+        self.data_freq = data_freq
+        self.table = ScanTable(self.bssids)
+        self.active = threading.Event()
+        self.stopped = threading.Event()
+        # Cuts the wait for the next scan short: the first scan after resume() starts at once
+        self.wakeup = threading.Event()
+        # Set while the scan interface is busy with a handover, held during every scan
+        self.held = threading.Event()
+        self.scan_lock = threading.Lock()
+        # Future of the running scan on the runner
+        self.running = None
+        self.scans = 0
+
+    @property
+    def interval(self):
+        return self.scheduler.interval
+
+    @property
+    def paused(self):
+        return not self.active.is_set()
+
+    def resume(self):
+        self.scheduler.reset()
+        log.info("*** {}: Scanner resumed. Searching for {} with interval {} on {}".format(
+            self.interface, ', '.join(self.ssids) or 'any SSID', self.interval,
+            self.scheduler.scan_frequencies() or 'all channels'))
+        self.wakeup.set()
+        self.active.set()
+
+    def pause(self):
+        log.info("*** {}: Scanner paused after {} scans".format(self.interface, self.scans))
+        self.active.clear()
+
+    def hold(self):
+        """
+        Stops scanning without pausing the scanner (e.g. while its interface is reconfigured during a handover), kills
+        a running scan and waits until the scanner has let go of the interface.
+        """
+        self.held.set()
+        self.cancel_scan()
+        with self.scan_lock:
+            pass
+
+    def release(self, interface: str = None):
+        """
+        Continues scanning after hold(), on 'interface' if given.
+        """
+        if interface and interface != self.interface:
+            log.info("*** {}: Scanner moved to {}".format(self.interface, interface))
+            self.interface = interface
+        self.held.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        self.active.set()
+        self.cancel_scan()
+
+    def cancel_scan(self):
+        running = self.running
+        if running and self.runner:
+            self.runner.cancel(running)
 
     def run(self):
-        log.info(
-            "*** {}: Scanner started. Searching for {} with interval {}".format(
-                self.interface, self.ssid, self.interval))
-        while True:
-            sleep(self.interval)
-            log.info("*** {}: Scanning for {}".format(self.interface, self.ssid))
-            self.log_event('scan_trigger')
-            if self.ssid:
-                stdout, stderr = cmd_iw_dev(self.interface, "scan", "ssid", self.ssid)
-            else:
-                stdout, stderr = cmd_iw_dev(self.interface, "scan")
-
-    def log_event(self, event: str):
-        csv_columns = ['time', 'disconnect', 'reconnect', 'scanner_start', 'scanner_stop', 'scan_trigger']
-        data = {k: 0 for k in csv_columns}
-        data.update({'time': datetime.now().timestamp() - self.control_start_time, event: 1})
-        self.write_or_append_csv_to_file(data, csv_columns)
-
-    def write_or_append_csv_to_file(self, data: dict, csv_columns: list):
-        if os.path.isfile(self.log_file):
-            with open(self.log_file, 'a') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=csv_columns)
-                writer.writerow(data)
+        if self.runner:
+            use_runner(self.runner)
+        while not self.stopped.is_set():
+            self.active.wait()
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.stopped.is_set():
+                break
+            with self.scan_lock:
+                if self.paused or self.held.is_set():
+                    continue
+                results, report = self.scan()
+            # Results of a scan that was running while the scanner got paused or held are outdated
+            if self.callback and not self.paused and not self.held.is_set():
+                self.callback(results, report)
+
+    def scan(self):
+        frequencies = self.scheduler.scan_frequencies()
+        log.info("*** {}: Scanning for {} on {}".format(self.interface, ', '.join(self.ssids) or 'any SSID',
+                                                        frequencies or 'all channels'))
+        args = ["scan"]
+        if frequencies:
+            args += ["freq"] + [str(f) for f in frequencies]
+        if self.ssids:
+            args += ["ssid"] + self.ssids
+        self.event_log.log('scan_trigger')
+        start = time.monotonic()
+        output = self.run_scan(args)
+        duration = time.monotonic() - start
+        self.scans += 1
+        if output.killed:
+            log.info("*** {}: Scan {} after {:.3f} s".format(self.interface,
+                                                            'timed out' if output.timed_out else 'cancelled', duration))
+            results, ap = {}, None
         else:
-            with open(self.log_file, 'w') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=csv_columns)
-                writer.writeheader()
-                writer.writerow(data)
+            results = self.table.update(output[0].decode(errors='replace'))
+            for bssid in self.bssids:
+                if bssid in results:
+                    self.scheduler.add_frequency(results[bssid]['freq'], bssid)
+            ap = self.find_ap(results)
+            self.scheduler.update(ap['signal'] if ap else None, ap['freq'] if ap else None)
+        report = {'interface': self.interface, 'frequencies': ' '.join(str(f) for f in frequencies) or 'all',
+                  'duration': duration, 'off_channel': self.off_channel_time(frequencies, duration),
+                  'found': int(ap is not None), 'bssid': ap['bssid'] if ap else None,
+                  'signal': ap['signal'] if ap else None, 'timed_out': int(output.timed_out),
+                  'next_interval': self.interval}
+        return results, report
+
+    def run_scan(self, args: list):
+        """
+        Runs 'iw dev <interface> scan' with the given args.
+        Returns the CommandOutput of the scan.
+        """
+        if not self.runner:
+            return cmd_iw_dev(self.interface, *args)
+        self.running = self.runner.submit(["iw", "dev", self.interface] + args)
+        try:
+            return self.running.result()
+        except CancelledError:
+            return CommandOutput(b'', b'', cancelled=True)
+        finally:
+            self.running = None
+
+    def find_ap(self, results: dict):
+        """
+        Returns the strongest of the searched APs found by the scan or None.
+        """
+        if self.bssids:
+            candidates = [results[bssid] for bssid in self.bssids if bssid in results]
+        else:
+            candidates = results.values()
+        candidates = [bss for bss in candidates
+                      if (not self.ssids or bss['ssid'] in self.ssids) and bss['signal'] is not None]
+        return max(candidates, key=lambda bss: bss['signal']) if candidates else None
+
+    def off_channel_time(self, frequencies: list, duration: float):
+        if not self.data_freq:
+            return 0.0
+        if not frequencies:
+            return duration
+        return duration * sum(1 for f in frequencies if f != self.data_freq) / len(frequencies)
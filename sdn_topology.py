@@ -17,7 +17,8 @@ from mn_wifi.replaying import ReplayingMobility
 
 def topology(scenario: int, signal_window: int, scan_interval: float, disconnect_threshold: float,
              reconnect_threshold: float, scan_iface: bool = False, no_olsr: bool = False,
-             qdisc_rates: dict = {'disconnect': 0, 'reconnect': 0}):
+             qdisc_rates: dict = {'disconnect': 0, 'reconnect': 0}, make_before_break: bool = False,
+             olsr_profile: str = 'default', multi_station: bool = False):
     """
     Build a custom topology and start it.
 
@@ -98,38 +99,37 @@ def topology(scenario: int, signal_window: int, scan_interval: float, disconnect
     statistics_dir = path + '/data/statistics/' + stat_dir
     if not os.path.isdir(statistics_dir):
         os.makedirs(statistics_dir)
-    cmd = "python3"
-    cmd += " {}/flexible_sdn.py".format(path)
-    cmd += " -i sta1-wlan0"
-    cmd += " -s {}".format(scan_interval)
-    cmd += " -d {}".format(disconnect_threshold)
-    cmd += " -r {}".format(reconnect_threshold)
-    cmd += " -o {}".format(stat_dir)
-    cmd += " -w {}".format(signal_window)
-    cmd += " -t {}".format(start_time.timestamp())
-    if scan_iface:
-        cmd += " -S sta1-wlan1"
+    args = " -s {}".format(scan_interval)
+    args += " -d {}".format(disconnect_threshold)
+    args += " -r {}".format(reconnect_threshold)
+    args += " -o {}".format(stat_dir)
+    args += " -w {}".format(signal_window)
+    args += " -t {}".format(start_time.timestamp())
+    args += " -P {}".format(olsr_profile)
+    if scan_iface and make_before_break:
+        args += " -M"
     if no_olsr:
-        cmd += " -O"
+        args += " -O"
     if qdisc_rates['disconnect'] > 0 and qdisc_rates['reconnect'] > 0:
-        cmd += " -qr {} -qd {}".format(qdisc_rates['reconnect'], qdisc_rates['disconnect'])
-    makeTerm(sta1, title='Station 1', cmd=cmd + " ; sleep 10")
-    cmd = "python3"
-    cmd += " {}/flexible_sdn.py".format(path)
-    cmd += " -i sta3-wlan0"
-    cmd += " -s {}".format(scan_interval)
-    cmd += " -d {}".format(disconnect_threshold)
-    cmd += " -r {}".format(reconnect_threshold)
-    cmd += " -o {}".format(stat_dir)
-    cmd += " -w {}".format(signal_window)
-    cmd += " -t {}".format(start_time.timestamp())
-    if scan_iface:
-        cmd += " -S sta3-wlan1"
-    if no_olsr:
-        cmd += " -O"
-    if qdisc_rates['disconnect'] > 0 and qdisc_rates['reconnect'] > 0:
-        cmd += " -qr {} -qd {}".format(qdisc_rates['reconnect'], qdisc_rates['disconnect'])
-    makeTerm(sta3, title='Station 3', cmd=cmd + " ; sleep 10")
+        args += " -qr {} -qd {}".format(qdisc_rates['reconnect'], qdisc_rates['disconnect'])
+    if multi_station:
+        # One controller process enters the network namespaces of both stations
+        cmd = "python3"
+        cmd += " {}/multi_station.py".format(path)
+        for sta in (sta1, sta3):
+            cmd += " --station {}-wlan0".format(sta.name)
+            if scan_iface:
+                cmd += " {}-wlan1".format(sta.name)
+            cmd += " --netns {} {}".format(sta.name, sta.pid)
+        makeTerm(sta1, title='Stations', cmd=cmd + args + " ; sleep 10")
+    else:
+        for sta, title in ((sta1, 'Station 1'), (sta3, 'Station 3')):
+            cmd = "python3"
+            cmd += " {}/flexible_sdn.py".format(path)
+            cmd += " -i {}-wlan0".format(sta.name)
+            if scan_iface:
+                cmd += " -S {}-wlan1".format(sta.name)
+            makeTerm(sta, title=title, cmd=cmd + args + " ; sleep 10")
     # cmd = "python3 {}/packet_sniffer.py -i sta1-wlan0 -o {}send_packets.csv -f 'icmp[icmptype] = icmp-echo'".format(path, stat_dir)
     # cmd = "python3 {}/packet_sniffer.py -i sta1-wlan0 -o {}send_packets.csv -f '-p udp -m udp --dport 8999' -T True".format(path, stat_dir)
     # makeTerm(sta1, title='Packet Sniffer sta1', cmd=cmd + " ; sleep 10")
@@ -210,8 +210,17 @@ if __name__ == '__main__':
     parser.add_argument("-qr", "--qdiscreconnect", help="Bandwidth in bits/s to throttle qdisc to during handover AP to"
                                                         " OLSR. If set to 0 qdisc feature is deactivated (default: 0)",
                         type=int, default=0)
+    parser.add_argument("-M", "--makebeforebreak", help="Bring up OLSR on the second interface before leaving the AP "
+                                                        "(make-before-break handover, default: False)",
+                        action='store_true', default=False)
+    parser.add_argument("-P", "--olsrprofile", help="olsrd emission interval profile used after a handover to OLSR: "
+                                                    "fast, default or relaxed (default: default)",
+                        type=str, choices=['fast', 'default', 'relaxed'], default='default')
+    parser.add_argument("-X", "--multistation", help="Run the controllers of all stations in one process "
+                                                     "(multi_station.py) instead of one process per station "
+                                                     "(default: False)", action='store_true', default=False)
     args = parser.parse_args()
     scenario = args.mobilityscenario
     qdisc_rates = {'disconnect': args.qdiscdisconnect, 'reconnect': args.qdiscreconnect}
     topology(scenario, args.signalwindow, args.scaninterval, args.disconnectthreshold, args.reconnectthreshold,
-             args.scaninterface, args.noolsr, qdisc_rates)
+             args.scaninterface, args.noolsr, qdisc_rates, args.makebeforebreak, args.olsrprofile, args.multistation)
@@ -0,0 +1,122 @@
+import bisect
+
+from collections import deque
+
+FILTERS = ['sma', 'ewma', 'median', 'kalman']
+
+
+class SmaFilter:
+    """
+    Simple moving average over the last 'window' samples (fewer at the start).
+    The window sum is the difference of two running totals, so an update costs O(1) independent of the window size and
+    equals the cumulative sum formulation of the offline version exactly.
+    """
+
+    def __init__(self, window: int = 3):
+        self.window = max(window, 1)
+        self.reset()
+
+    def reset(self):
+        self.total = 0.0
+        self.totals = deque([0.0], maxlen=self.window + 1)
+        self.value = None
+
+    def update(self, sample: float):
+        self.total += sample
+        self.totals.append(self.total)
+        self.value = (self.total - self.totals[0]) / (len(self.totals) - 1)
+        return self.value
+
+
+class EwmaFilter:
+    """
+    Exponentially weighted moving average, starting with the first sample.
+    """
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.value = None
+
+    def update(self, sample: float):
+        self.value = sample if self.value is None else self.value + self.alpha * (sample - self.value)
+        return self.value
+
+
+class MedianFilter:
+    """
+    Median of the last 'window' samples (fewer at the start). The samples are kept sorted, an update costs O(window).
+    """
+
+    def __init__(self, window: int = 3):
+        self.window = max(window, 1)
+        self.reset()
+
+    def reset(self):
+        self.samples = deque()
+        self.sorted = []
+        self.value = None
+
+    def update(self, sample: float):
+        self.samples.append(sample)
+        bisect.insort(self.sorted, sample)
+        if len(self.samples) > self.window:
+            del self.sorted[bisect.bisect_left(self.sorted, self.samples.popleft())]
+        n = len(self.sorted)
+        if n % 2:
+            self.value = self.sorted[n // 2]
+        else:
+            self.value = (self.sorted[n // 2 - 1] + self.sorted[n // 2]) / 2
+        return self.value
+
+
+class KalmanFilter:
+    """
+    Scalar Kalman filter with a random walk model of the signal.
+    'process_noise' (q) is the expected variance of the signal change between two samples, 'measurement_noise' (r) the
+    variance of the RSSI measurements. The first sample initialises the estimate with variance r.
+    """
+
+    def __init__(self, process_noise: float = 0.5, measurement_noise: float = 4.0):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.variance = None
+
+    def gain(self):
+        """
+        Advances the estimate variance by one step and returns the Kalman gain of the next sample.
+        """
+        predicted = self.variance + self.q
+        gain = predicted / (predicted + self.r)
+        self.variance = (1 - gain) * predicted
+        return gain
+
+    def update(self, sample: float):
+        if self.value is None:
+            self.value = sample
+            self.variance = self.r
+        else:
+            self.value = self.value + self.gain() * (sample - self.value)
+        return self.value
+
+
+def create_filter(name: str = 'sma', window: int = 3, alpha: float = 0.5, process_noise: float = 0.5,
+                  measurement_noise: float = 4.0):
+    """
+    Returns a new signal filter by name (one of FILTERS).
+    """
+    if name == 'sma':
+        return SmaFilter(window)
+    if name == 'ewma':
+        return EwmaFilter(alpha)
+    if name == 'median':
+        return MedianFilter(window)
+    if name == 'kalman':
+        return KalmanFilter(process_noise, measurement_noise)
+    raise ValueError("Unknown signal filter '{}'".format(name))
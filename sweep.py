@@ -0,0 +1,181 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+
+from replay import ControllerReplay, access_points, load_signal_trace, parse_controller_args, synthetic_traces
+
+SWEEP_COLUMNS = ['rank', 'disconnect_threshold', 'reconnect_threshold', 'signal_window', 'scan_interval', 'outage',
+                 'outage_per_hour', 'handovers', 'flaps', 'suppressed', 'traces']
+
+SORT_KEYS = {'outage': ('outage', 'handovers', 'flaps'),
+             'handovers': ('handovers', 'flaps', 'outage'),
+             'flaps': ('flaps', 'handovers', 'outage')}
+
+# Traces and replay options of the worker processes, set once per worker by init_worker
+worker_traces = {}
+worker_options = {}
+
+
+def parameter_grid(disconnect_thresholds: list, reconnect_thresholds: list, signal_windows: list,
+                   scan_intervals: list, skip_invalid: bool = True):
+    """
+    Returns all combinations (disconnect threshold, reconnect threshold, signal window, scan interval).
+    Combinations whose reconnect threshold is below the disconnect threshold (a handover loop between AP and MANET)
+    are skipped unless 'skip_invalid' is False.
+    """
+    return [combination for combination in itertools.product(disconnect_thresholds, reconnect_thresholds,
+                                                             signal_windows, scan_intervals)
+            if not skip_invalid or combination[1] >= combination[0]]
+
+
+def combination_args(combination: tuple):
+    disconnect_threshold, reconnect_threshold, signal_window, scan_interval = combination
+    return ['-d', str(disconnect_threshold), '-r', str(reconnect_threshold), '-w', str(signal_window),
+            '-s', str(scan_interval)]
+
+
+def init_worker(traces: dict, options: dict):
+    worker_traces.update(traces)
+    worker_options.update(options)
+
+
+def run_job(job: tuple):
+    """
+    Replays one trace with one parameter combination in a worker process.
+    Returns the index of the combination, the name of the trace and the summary of the replay.
+    """
+    index, combination, trace_name, controller_args, out_path = job
+    replay = ControllerReplay(worker_traces[trace_name], out_path, controller_args + combination_args(combination),
+                              **worker_options)
+    return index, trace_name, replay.run()
+
+
+def rank(results: list, sort: str = 'outage'):
+    """
+    Sorts the aggregated results of the combinations by the given key (ties are broken by the other two metrics) and
+    numbers them.
+    """
+    keys = SORT_KEYS[sort]
+    results = sorted(results, key=lambda result: tuple(result[key] for key in keys))
+    for i, result in enumerate(results):
+        result['rank'] = i + 1
+    return results
+
+
+def sweep(traces: dict, grid: list, out_path: str, controller_args: list = None, processes: int = None,
+          sort: str = 'outage', **options):
+    """
+    Replays every trace ('traces' maps a name to the traces of the APs, BSSID -> SignalTrace) with every combination
+    of the grid across a process pool.
+    The replay of combination i and trace t writes its statistics to <out_path>/<i>/<t>/. 'options' are passed to
+    ControllerReplay (e.g. route_delay).
+    Returns the ranked list of the combinations with outage (s), handovers and flaps summed over all traces.
+    """
+    controller_args = controller_args if controller_args else []
+    jobs = [(index, combination, trace_name, controller_args, os.path.join(out_path, str(index), trace_name))
+            for index, combination in enumerate(grid) for trace_name in traces]
+    results = [{'disconnect_threshold': combination[0], 'reconnect_threshold': combination[1],
+                'signal_window': combination[2], 'scan_interval': combination[3], 'outage': 0.0, 'duration': 0.0,
+                'handovers': 0, 'flaps': 0, 'suppressed': 0, 'traces': 0} for combination in grid]
+    with multiprocessing.Pool(processes, init_worker, (traces, options)) as pool:
+        for index, trace_name, summary in pool.imap_unordered(run_job, jobs):
+            result = results[index]
+            result['outage'] += summary['outage']
+            result['duration'] += summary['duration']
+            result['handovers'] += summary['handovers_olsr'] + summary['handovers_ap']
+            result['flaps'] += summary['flaps']
+            result['suppressed'] += summary['suppressed']
+            result['traces'] += 1
+    for result in results:
+        result['outage_per_hour'] = result['outage'] * 3600 / result['duration'] if result['duration'] else 0.0
+    return rank(results, sort)
+
+
+def write_results(file: str, results: list):
+    with open(file, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=SWEEP_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(args, controller_args: list):
+    aps = access_points(parse_controller_args(controller_args))
+    if args.synthetic:
+        traces = {'synthetic-{}'.format(seed): synthetic_traces(aps, args.synthetic, args.period, args.near, args.far,
+                                                                args.noise, seed)
+                  for seed in range(args.seeds)}
+    else:
+        traces = {os.path.splitext(os.path.basename(file))[0]: {aps[0].bssid: load_signal_trace(file, aps[0].ssid,
+                                                                                                args.maxgap)}
+                  for file in args.trace}
+    grid = parameter_grid(args.disconnectthreshold, args.reconnectthreshold, args.signalwindow, args.scaninterval)
+    print("*** Sweeping {} combinations over {} traces".format(len(grid), len(traces)))
+    start = time.perf_counter()
+    results = sweep(traces, grid, args.outdir, controller_args, args.processes, args.sort,
+                    sensitivity=args.sensitivity, usable_signal=args.usablesignal,
+                    association_delay=args.associationdelay,
+                    olsrd_ready_delay=args.olsrdreadydelay, route_delay=args.routedelay)
+    print("*** {} replays in {:.2f} s".format(len(grid) * len(traces), time.perf_counter() - start))
+    write_results(os.path.join(args.outdir, 'sweep.csv'), results)
+    print("rank, -d, -r, -w, -s, outage (s), outage (s/h), handovers, flaps, suppressed")
+    for result in results[:args.top]:
+        print("{}, {}, {}, {}, {}, {:.2f}, {:.2f}, {}, {}, {}".format(
+            result['rank'], result['disconnect_threshold'], result['reconnect_threshold'], result['signal_window'],
+            result['scan_interval'], result['outage'], result['outage_per_hour'], result['handovers'],
+            result['flaps'], result['suppressed']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep the handover thresholds, the signal window and the scan "
+                                                 "interval of flexible_sdn.py over recorded or synthetic signal traces "
+                                                 "(offline replays in a process pool) and rank the combinations. All "
+                                                 "arguments not listed here are passed to every replay (see "
+                                                 "replay.py and flexible_sdn.py --help)", allow_abbrev=False)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="Recorded <interface>_signal.csv files of the AP (-A/-B)", type=str,
+                        nargs='+')
+    source.add_argument("--synthetic", help="Sweep over synthetic traces of the given duration in seconds", type=float)
+    parser.add_argument("-d", "--disconnectthreshold", help="Disconnect thresholds in dBm (default: -75 -72 -70)",
+                        type=float, nargs='+', default=[-75.0, -72.0, -70.0])
+    parser.add_argument("-r", "--reconnectthreshold", help="Reconnect thresholds in dBm (default: -70 -65)",
+                        type=float, nargs='+', default=[-70.0, -65.0])
+    parser.add_argument("-w", "--signalwindow", help="Signal filter windows (default: 3 5)", type=int, nargs='+',
+                        default=[3, 5])
+    parser.add_argument("-s", "--scaninterval", help="Scan intervals in seconds (default: 2 5)", type=float,
+                        nargs='+', default=[2.0, 5.0])
+    parser.add_argument("--seeds", help="Number of synthetic traces with different noise (default: 3)", type=int,
+                        default=3)
+    parser.add_argument("--maxgap", help="Seconds after the last sample of a recorded trace until the AP counts as out "
+                                         "of range (default: 10.0)", type=float, default=10.0)
+    parser.add_argument("--period", help="Period in seconds of the synthetic movement (default: 120.0)", type=float,
+                        default=120.0)
+    parser.add_argument("--near", help="Synthetic signal in dBm next to the AP (default: -40.0)", type=float,
+                        default=-40.0)
+    parser.add_argument("--far", help="Synthetic signal in dBm at the farthest point (default: -95.0)", type=float,
+                        default=-95.0)
+    parser.add_argument("--noise", help="Standard deviation in dB of the synthetic signal (default: 2.0)", type=float,
+                        default=2.0)
+    parser.add_argument("--sensitivity", help="Signal in dBm below which an AP is out of range (default: -90.0)",
+                        type=float, default=-90.0)
+    parser.add_argument("--usablesignal", help="Signal in dBm below which the AP link loses packets, the loss grows "
+                                               "linearly to 100 %% at --sensitivity (default: -80.0)", type=float,
+                        default=-80.0)
+    parser.add_argument("--associationdelay", help="Seconds a connect to an AP in range takes (default: 0.1)",
+                        type=float, default=0.1)
+    parser.add_argument("--olsrdreadydelay", help="Seconds until a started olsrd is ready (default: 0.5)", type=float,
+                        default=0.5)
+    parser.add_argument("--routedelay", help="Seconds after the start of olsrd until OLSR routes exist (default: 3.0)",
+                        type=float, default=3.0)
+    parser.add_argument("--processes", help="Number of worker processes (default: number of CPUs)", type=int,
+                        default=None)
+    parser.add_argument("--sort", help="Metric the combinations are ranked by (default: outage)", type=str,
+                        choices=list(SORT_KEYS), default='outage')
+    parser.add_argument("--top", help="Number of combinations to print (default: 10)", type=int, default=10)
+    parser.add_argument("--outdir", help="Directory for the statistics of the replays and the ranked sweep.csv "
+                                         "(default: ./data/sweep)", type=str,
+                        default=os.path.dirname(os.path.abspath(__file__)) + '/data/sweep')
+    args, controller_args = parser.parse_known_args()
+    main(args, controller_args)
@@ -0,0 +1,149 @@
+import logging
+import os
+import select
+import subprocess
+import threading
+import time
+
+from subprocess import PIPE, DEVNULL
+
+log = logging.getLogger('logger')
+
+# Interface that does not exist: every command is followed by 'qdisc show dev <SYNC_DEVICE>', whose error marks the
+# end of the command in the error output of tc
+SYNC_DEVICE = 'tcsync-none'
+
+
+class TcResult:
+    """
+    Outcome of a batch of tc commands: whether all commands succeeded, how long the batch took and the error output of
+    the failed commands.
+    """
+
+    def __init__(self, commands: list, duration: float, success: bool, errors: list):
+        self.commands = commands
+        self.duration = duration
+        self.success = success
+        self.errors = errors
+
+
+class TcSession:
+    """
+    Persistent 'tc -force -batch -' process that runs tc commands without starting a shell and a tc binary per command.
+    tc does not acknowledge a command in batch mode, so each command is followed by a command that always fails; its
+    'Command failed -:<line>' message tells that the command before has been executed, and a failure message for the
+    line of the command itself tells that it failed.
+    The process is started by start() or on the first command in the network namespace of the calling thread and
+    restarted if it dies or does not answer within 'timeout' seconds. The session is thread-safe.
+    """
+
+    def __init__(self, timeout: float = 2.0):
+        self.timeout = timeout
+        self.process = None
+        self.line = 0
+        # Error output of tc that has been read but not yet split into lines
+        self.buffer = b''
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen(['tc', '-force', '-batch', '-'], stdin=PIPE, stdout=DEVNULL, stderr=PIPE)
+        self.line = 0
+        self.buffer = b''
+        log.info("*** Started tc batch session (PID: {})".format(self.process.pid))
+
+    def run(self, *commands: str):
+        """
+        Runs the tc commands (without the leading 'tc', e.g. 'qdisc show dev sta1-wlan0') in order.
+        Returns a TcResult.
+        """
+        start = time.monotonic()
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            lines = []
+            batch = ''
+            for command in commands:
+                lines.append(self.line + 1)
+                batch += command + '\n' + 'qdisc show dev ' + SYNC_DEVICE + '\n'
+                self.line += 2
+            success, errors = self.read_result(batch, lines, start + self.timeout)
+        duration = time.monotonic() - start
+        if not success:
+            log.info("*** tc {} failed after {:.3f} s: {}".format('; '.join(commands), duration, ' '.join(errors)))
+        return TcResult(list(commands), duration, success, errors)
+
+    def read_result(self, batch: str, lines: list, deadline: float):
+        """
+        Writes the batch to tc and reads the error output until the sync command after the last command failed.
+        Returns whether all commands succeeded and the error messages of the failed ones.
+        """
+        sync_line = 'Command failed -:{}'.format(self.line)
+        errors = []
+        message = []
+        success = True
+        try:
+            self.process.stdin.write(batch.encode())
+            self.process.stdin.flush()
+            while True:
+                output = self.read_line(deadline)
+                if output is None:
+                    # No answer in time or tc exited, the next command starts a new session
+                    self.kill()
+                    return False, errors + ['tc batch session did not answer']
+                if output == sync_line:
+                    return success, errors
+                if output.startswith('Command failed -:'):
+                    if int(output.rsplit(':', 1)[1]) in lines:
+                        success = False
+                        errors.append(' '.join(message))
+                    message = []
+                else:
+                    message.append(output)
+        except (OSError, ValueError):
+            self.kill()
+            return False, errors + ['tc batch session closed']
+
+    def read_line(self, deadline: float):
+        """
+        Returns the next line of the error output of tc or None if there is none before the deadline.
+        """
+        fd = self.process.stderr.fileno()
+        while b'\n' not in self.buffer:
+            ready, _, _ = select.select([fd], [], [], max(0.0, deadline - time.monotonic()))
+            data = os.read(fd, 4096) if ready else b''
+            if not data:
+                return None
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.decode(errors='replace').strip()
+
+    def kill(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def close(self):
+        with self.lock:
+            if self.process and self.process.poll() is None:
+                self.process.stdin.close()
+                try:
+                    self.process.wait(self.timeout)
+                except subprocess.TimeoutExpired:
+                    self.kill()
+            self.process = None
+
+    def init_htb(self, interface: str, rate: float, rate_unit: str):
+        """
+        Replaces the root qdisc of the interface with an HTB qdisc whose default class 1:1 is limited to the rate.
+        """
+        # Deleting the root qdisc fails if there is none yet, which is fine
+        self.run('qdisc del dev {} root'.format(interface))
+        return self.run('qdisc add dev {} root handle 1: htb default 1'.format(interface),
+                        'class add dev {} parent 1: classid 1:1 htb rate {}{}'.format(interface, rate, rate_unit))
+
+    def set_htb_rate(self, interface: str, rate: float, rate_unit: str):
+        """
+        Updates the rate of the HTB class 1:1 (Minimum: 8 bit).
+        """
+        return self.run('class replace dev {} parent 1: classid 1:1 htb rate {}{}'.format(interface, rate, rate_unit))
@@ -0,0 +1,139 @@
+import socket
+import struct
+import threading
+
+from link_events import LinkEventMonitor, parse_iw_event_line
+from nl80211 import (GENL_ID_CTRL, NL80211_ATTR_DISCONNECTED_BY_AP, NL80211_ATTR_IFINDEX, NL80211_ATTR_MAC,
+                     NL80211_ATTR_REASON_CODE, NL80211_CMD_CONNECT, NL80211_CMD_DEAUTHENTICATE,
+                     NL80211_CMD_DISCONNECT)
+from test_nl80211 import NL80211_FAMILY_ID, FakeNetlinkSocket, genl_message, responder
+
+INTERFACE = 'lo'
+IFINDEX = socket.if_nametoindex(INTERFACE)
+
+IW_EVENTS = """1700000000.000000: lo (phy #0): connected to 00:00:00:00:01:00
+1700000000.010000: lo (phy #0): new station 02:00:00:00:00:05
+1700000000.020000: sta2-wlan0 (phy #1): disconnected (by AP) reason: 3: Deauthenticated because sending STA is leaving
+1700000000.030000: lo (phy #0): deauth 00:00:00:00:01:00 -> 02:00:00:00:00:00 reason 3: Deauthenticated
+1700000000.040000: lo (phy #0): disconnected (by AP) reason: 3: Deauthenticated because sending STA is leaving
+1700000000.050000: lo (phy #0): roamed to 00:00:00:00:02:00
+"""
+
+
+class SocketPairNetlink(FakeNetlinkSocket):
+    """
+    Fake netlink responder whose datagrams go through a socket pair, so the monitor thread can wait for them with
+    select like for a real netlink socket.
+    """
+
+    def __init__(self, responses: dict):
+        super().__init__(responses)
+        self.kernel, self.user = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def send(self, data: bytes):
+        length = super().send(data)
+        while self.datagrams:
+            self.kernel.send(self.datagrams.pop(0))
+        return length
+
+    def event(self, datagram: bytes):
+        self.kernel.send(datagram)
+
+    def recv(self, size: int):
+        return self.user.recv(size)
+
+    def fileno(self):
+        return self.user.fileno()
+
+    def close(self):
+        super().close()
+        self.user.close()
+        self.kernel.close()
+
+
+def mlme_event(cmd: int, ifindex: int = IFINDEX, by_ap: bool = False):
+    attrs = [(NL80211_ATTR_IFINDEX, struct.pack('=I', ifindex)), (NL80211_ATTR_MAC, bytes([0, 0, 0, 0, 1, 0])),
+             (NL80211_ATTR_REASON_CODE, struct.pack('=H', 3))]
+    if by_ap:
+        attrs.append((NL80211_ATTR_DISCONNECTED_BY_AP, b''))
+    return genl_message(NL80211_FAMILY_ID, 0, cmd, attrs)
+
+
+class Events:
+    """
+    Callback of the monitor that collects the events and signals when 'expected' events have arrived.
+    """
+
+    def __init__(self, expected: int):
+        self.events = []
+        self.expected = expected
+        self.complete = threading.Event()
+
+    def __call__(self, event):
+        self.events.append(event)
+        if len(self.events) >= self.expected:
+            self.complete.set()
+
+
+def test_parse_iw_event_lines():
+    events = [parse_iw_event_line(line, INTERFACE) for line in IW_EVENTS.splitlines()]
+    assert [event.kind if event else None for event in events] == \
+        ['connected', None, None, 'deauth', 'disconnected', 'roamed']
+    disconnect = events[4]
+    assert disconnect.link_lost and disconnect.by_ap and disconnect.reason == 3
+    assert disconnect.timestamp == 1700000000.04
+    assert events[0].bssid == '00:00:00:00:01:00' and not events[0].link_lost
+    assert parse_iw_event_line("lo (phy #0): disconnected", INTERFACE).timestamp is not None
+
+
+def test_replayed_iw_event_stream(tmp_path):
+    replay_file = tmp_path / 'events.txt'
+    replay_file.write_text(IW_EVENTS)
+    events = Events(4)
+    monitor = LinkEventMonitor(INTERFACE, events, 'replay', str(replay_file))
+    monitor.start()
+    monitor.join(5.0)
+    assert not monitor.is_alive()
+    assert [event.kind for event in events.events] == ['connected', 'deauth', 'disconnected', 'roamed']
+    assert [event.link_lost for event in events.events] == [False, True, True, False]
+
+
+def test_stop_interrupts_replay(tmp_path):
+    replay_file = tmp_path / 'events.txt'
+    replay_file.write_text("1700000000.0: lo (phy #0): connected to 00:00:00:00:01:00\n"
+                           "1700003600.0: lo (phy #0): disconnected\n")
+    events = Events(1)
+    monitor = LinkEventMonitor(INTERFACE, events, 'replay', str(replay_file))
+    monitor.start()
+    assert events.complete.wait(5.0)
+    monitor.stop()
+    monitor.join(5.0)
+    assert not monitor.is_alive()
+    assert [event.kind for event in events.events] == ['connected']
+
+
+def test_nl80211_mlme_events():
+    sock = SocketPairNetlink(responder().responses)
+    events = Events(2)
+    monitor = LinkEventMonitor(INTERFACE, events, 'nl80211', sock=sock)
+    assert monitor.source == 'nl80211'
+    monitor.start()
+    sock.event(mlme_event(NL80211_CMD_CONNECT))
+    sock.event(mlme_event(NL80211_CMD_DISCONNECT, IFINDEX + 1000))
+    sock.event(genl_message(GENL_ID_CTRL, 0, NL80211_CMD_DISCONNECT, []))
+    sock.event(mlme_event(NL80211_CMD_DEAUTHENTICATE, by_ap=True))
+    assert events.complete.wait(5.0)
+    monitor.stop()
+    monitor.join(5.0)
+    assert not monitor.is_alive()
+    assert sock.closed
+    assert [event.kind for event in events.events] == ['connected', 'deauth']
+    deauth = events.events[1]
+    assert deauth.link_lost and deauth.by_ap and deauth.reason == 3 and deauth.bssid == '00:00:00:00:01:00'
+
+
+def test_stop_of_a_monitor_that_was_not_started():
+    sock = SocketPairNetlink(responder().responses)
+    monitor = LinkEventMonitor(INTERFACE, Events(1), 'nl80211', sock=sock)
+    monitor.stop()
+    assert sock.closed and monitor.wakeup is None
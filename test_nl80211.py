@@ -0,0 +1,163 @@
+import errno
+import socket
+import struct
+
+import pytest
+
+from nl80211 import (CTRL_ATTR_FAMILY_ID, CTRL_ATTR_FAMILY_NAME, CTRL_ATTR_MCAST_GROUPS, CTRL_ATTR_MCAST_GRP_ID,
+                     CTRL_ATTR_MCAST_GRP_NAME, CTRL_CMD_GETFAMILY, GENL_ID_CTRL, GENLMSGHDR, NETLINK_ADD_MEMBERSHIP,
+                     NL80211_ATTR_IFINDEX, NL80211_ATTR_MAC, NL80211_ATTR_SSID, NL80211_ATTR_STA_INFO,
+                     NL80211_ATTR_WIPHY_FREQ, NL80211_CMD_DISCONNECT, NL80211_CMD_GET_INTERFACE,
+                     NL80211_CMD_GET_STATION, NL80211_RATE_INFO_BITRATE, NL80211_RATE_INFO_BITRATE32,
+                     NL80211_STA_INFO_RX_BITRATE, NL80211_STA_INFO_SIGNAL, NL80211_STA_INFO_TX_BITRATE, NLM_F_DUMP,
+                     NLMSG_DONE, NLMSG_ERROR, NLMSGHDR, SOL_NETLINK, GenlSocket, Nl80211, pack_attr, parse_attrs)
+
+NL80211_FAMILY_ID = 0x1c
+MLME_GROUP_ID = 5
+INTERFACE = 'lo'
+
+
+def netlink_message(msg_type: int, seq: int, payload: bytes, flags: int = 0):
+    message = NLMSGHDR.pack(NLMSGHDR.size + len(payload), msg_type, flags, seq, 0) + payload
+    return message + b'\x00' * (-len(message) % 4)
+
+
+def genl_message(msg_type: int, seq: int, cmd: int, attrs: list):
+    return netlink_message(msg_type, seq, GENLMSGHDR.pack(cmd, 1, 0) + b''.join(pack_attr(t, p) for t, p in attrs))
+
+
+def error_message(seq: int, error: int):
+    return netlink_message(NLMSG_ERROR, seq, struct.pack('=i', error) + NLMSGHDR.pack(0, 0, 0, seq, 0))
+
+
+def done_message(seq: int):
+    return netlink_message(NLMSG_DONE, seq, struct.pack('=i', 0))
+
+
+def ack_message(seq: int):
+    return error_message(seq, 0)
+
+
+def family_reply(seq: int):
+    groups = pack_attr(1, pack_attr(CTRL_ATTR_MCAST_GRP_NAME, b'mlme\x00')
+                       + pack_attr(CTRL_ATTR_MCAST_GRP_ID, struct.pack('=I', MLME_GROUP_ID)))
+    return genl_message(GENL_ID_CTRL, seq, CTRL_CMD_GETFAMILY,
+                        [(CTRL_ATTR_FAMILY_ID, struct.pack('=H', NL80211_FAMILY_ID)),
+                         (CTRL_ATTR_FAMILY_NAME, b'nl80211\x00'), (CTRL_ATTR_MCAST_GROUPS, groups)])
+
+
+def station_reply(seq: int, signal: int = -57):
+    sta_info = (pack_attr(NL80211_STA_INFO_SIGNAL, struct.pack('=b', signal))
+                + pack_attr(NL80211_STA_INFO_TX_BITRATE, pack_attr(NL80211_RATE_INFO_BITRATE, struct.pack('=H', 540)))
+                + pack_attr(NL80211_STA_INFO_RX_BITRATE,
+                            pack_attr(NL80211_RATE_INFO_BITRATE32, struct.pack('=I', 1300))))
+    return genl_message(NL80211_FAMILY_ID, seq, NL80211_CMD_GET_STATION,
+                        [(NL80211_ATTR_MAC, bytes([0, 0, 0, 0, 1, 0])), (NL80211_ATTR_STA_INFO, sta_info)])
+
+
+def interface_reply(seq: int):
+    return genl_message(NL80211_FAMILY_ID, seq, NL80211_CMD_GET_INTERFACE,
+                        [(NL80211_ATTR_IFINDEX, struct.pack('=I', socket.if_nametoindex(INTERFACE))),
+                         (NL80211_ATTR_SSID, b'ssid-ap1'), (NL80211_ATTR_WIPHY_FREQ, struct.pack('=I', 2412))])
+
+
+class FakeNetlinkSocket:
+    """
+    Fake netlink responder: answers every request with the datagrams that 'responses' maps the command of the request
+    to (functions of the sequence number), and hands out queued multicast events.
+    """
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.datagrams = []
+        self.requests = []
+        self.memberships = []
+        self.closed = False
+
+    def bind(self, address):
+        pass
+
+    def send(self, data: bytes):
+        length, family_id, flags, seq, pid = NLMSGHDR.unpack_from(data)
+        cmd = GENLMSGHDR.unpack_from(data, NLMSGHDR.size)[0]
+        self.requests.append((family_id, cmd, flags, parse_attrs(data[NLMSGHDR.size + GENLMSGHDR.size:length])))
+        self.datagrams += [response(seq) for response in self.responses[cmd]]
+        return len(data)
+
+    def recv(self, size: int):
+        return self.datagrams.pop(0)
+
+    def setsockopt(self, level: int, option: int, value: int):
+        self.memberships.append((level, option, value))
+
+    def close(self):
+        self.closed = True
+
+
+def responder(station: list = None, interface: list = None):
+    return FakeNetlinkSocket({CTRL_CMD_GETFAMILY: [family_reply, ack_message], NL80211_CMD_GET_STATION: station or [],
+                              NL80211_CMD_GET_INTERFACE: interface or []})
+
+
+def test_resolve_family():
+    sock = responder()
+    genl = GenlSocket('nl80211', sock)
+    assert genl.family_id == NL80211_FAMILY_ID
+    assert genl.mcast_groups == {'mlme': MLME_GROUP_ID}
+    family_id, cmd, flags, attrs = sock.requests[0]
+    assert (family_id, cmd) == (GENL_ID_CTRL, CTRL_CMD_GETFAMILY)
+    assert attrs[CTRL_ATTR_FAMILY_NAME] == b'nl80211\x00'
+
+
+def test_unknown_family():
+    sock = FakeNetlinkSocket({CTRL_CMD_GETFAMILY: [lambda seq: error_message(seq, -errno.ENOENT)]})
+    with pytest.raises(OSError) as error:
+        GenlSocket('nl80211', sock)
+    assert error.value.errno == errno.ENOENT
+
+
+def test_station_info():
+    sock = responder(station=[station_reply, done_message], interface=[interface_reply, ack_message])
+    info = Nl80211(INTERFACE, sock).get_station_info()
+    assert info.bssid == '00:00:00:00:01:00'
+    assert info.ssid == 'ssid-ap1'
+    assert info.signal == -57
+    assert info.tx_bitrate == '54.0 MBit/s'
+    assert info.rx_bitrate == '130.0 MBit/s'
+    assert info.freq == 2412
+    family_id, cmd, flags, attrs = sock.requests[1]
+    assert (family_id, cmd) == (NL80211_FAMILY_ID, NL80211_CMD_GET_STATION)
+    assert flags & NLM_F_DUMP == NLM_F_DUMP
+    assert struct.unpack('=I', attrs[NL80211_ATTR_IFINDEX])[0] == socket.if_nametoindex(INTERFACE)
+
+
+def test_station_info_of_unassociated_interface():
+    sock = responder(station=[done_message])
+    assert Nl80211(INTERFACE, sock).get_station_info() is None
+
+
+def test_station_info_error():
+    sock = responder(station=[lambda seq: error_message(seq, -errno.ENODEV)])
+    with pytest.raises(OSError) as error:
+        Nl80211(INTERFACE, sock).get_station_info()
+    assert error.value.errno == errno.ENODEV
+
+
+def test_replies_of_other_requests_are_skipped():
+    stale = lambda seq: station_reply(seq - 1, signal=-90)
+    sock = responder(station=[stale, station_reply, done_message], interface=[interface_reply, ack_message])
+    assert Nl80211(INTERFACE, sock).get_station_info().signal == -57
+
+
+def test_multicast_events():
+    sock = responder()
+    genl = GenlSocket('nl80211', sock)
+    genl.subscribe('mlme')
+    assert sock.memberships == [(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, MLME_GROUP_ID)]
+    sock.datagrams.append(genl_message(NL80211_FAMILY_ID, 0, NL80211_CMD_DISCONNECT,
+                                       [(NL80211_ATTR_IFINDEX, struct.pack('=I', 1))])
+                          + genl_message(GENL_ID_CTRL, 0, CTRL_CMD_GETFAMILY, []))
+    messages = genl.recv_messages()
+    assert [cmd for cmd, attrs in messages] == [NL80211_CMD_DISCONNECT]
+    genl.close()
+    assert sock.closed
@@ -0,0 +1,116 @@
+import os
+import signal
+import socket
+import sys
+import time
+
+from functools import partial
+
+import pytest
+
+from olsrd_supervisor import OlsrdSupervisor, olsr_port_bound
+
+# Stand-in for olsrd: reads its behaviour from the configuration file (-f), waits 'StubDelay' seconds, then exits
+# with 'StubExit' or binds the UDP port 'OlsrPort' like olsrd binds 698 and runs until it is terminated
+STUB_OLSRD = """#!{python}
+import signal
+import socket
+import sys
+import time
+
+config = dict(line.split(None, 1) for line in open(sys.argv[sys.argv.index('-f') + 1]) if line.strip())
+time.sleep(float(config.get('StubDelay', 0)))
+if 'StubExit' in config:
+    sys.exit(int(config['StubExit']))
+if 'StubIgnoreTerm' in config:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+sock.bind(('127.0.0.1', int(config['OlsrPort'])))
+while True:
+    time.sleep(1)
+"""
+
+
+def free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def olsrd_bin(tmp_path):
+    path = tmp_path / 'olsrd'
+    path.write_text(STUB_OLSRD.format(python=sys.executable))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def port():
+    return free_udp_port()
+
+
+def config(tmp_path, port: int, name: str = 'olsrd.conf', **stub):
+    path = tmp_path / name
+    path.write_text('OlsrPort {}\n'.format(port) + ''.join('Stub{} {}\n'.format(k, v) for k, v in stub.items()))
+    return str(path)
+
+
+def supervisor(olsrd_bin: str, config_file: str, port: int, **kwargs):
+    return OlsrdSupervisor('lo', config_file, olsrd_bin, ready_check=partial(olsr_port_bound, port=port), **kwargs)
+
+
+def test_start_and_stop(tmp_path, olsrd_bin, port):
+    olsrd = supervisor(olsrd_bin, config(tmp_path, port, Delay=0.2), port)
+    result = olsrd.start()
+    assert result.success and olsrd.running and olsrd.pid > 0
+    assert olsrd.time_to_ready == [result.duration] and result.duration >= 0.2
+    assert olsrd.stop() == -signal.SIGTERM
+    assert not olsrd.running and olsrd.pid == 0
+    assert olsrd.stop() is None
+
+
+def test_missing_binary(tmp_path, port):
+    olsrd = supervisor(str(tmp_path / 'missing'), config(tmp_path, port), port)
+    assert not olsrd.start().success
+    assert not olsrd.running and olsrd.time_to_ready == []
+
+
+def test_exit_at_start(tmp_path, olsrd_bin, port):
+    olsrd = supervisor(olsrd_bin, config(tmp_path, port, Exit=1), port)
+    assert not olsrd.start().success
+    assert not olsrd.running and olsrd.time_to_ready == []
+    assert olsrd.restart(config(tmp_path, port, 'fixed.conf')).success
+    assert olsrd.running and len(olsrd.time_to_ready) == 1
+    olsrd.stop()
+
+
+def test_restart_after_crash(tmp_path, olsrd_bin, port):
+    olsrd = supervisor(olsrd_bin, config(tmp_path, port), port)
+    assert olsrd.start().success
+    pid = olsrd.pid
+    os.kill(pid, signal.SIGKILL)
+    olsrd.process.wait()
+    assert not olsrd.running and not olsrd.is_ready()
+    assert olsrd.restart().success
+    assert olsrd.running and olsrd.pid != pid and len(olsrd.time_to_ready) == 2
+    olsrd.stop()
+
+
+def test_forced_stop(tmp_path, olsrd_bin, port):
+    olsrd = supervisor(olsrd_bin, config(tmp_path, port, IgnoreTerm=1), port, stop_timeout=0.3)
+    assert olsrd.start().success
+    start = time.monotonic()
+    assert olsrd.stop() == -signal.SIGKILL
+    assert time.monotonic() - start >= 0.3
+
+
+def test_port_of_another_process_is_not_ready(tmp_path, olsrd_bin, port):
+    # Another station in the same namespace already runs olsrd on the port
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as other:
+        other.bind(('127.0.0.1', port))
+        assert olsr_port_bound(port=port)
+        olsrd = supervisor(olsrd_bin, config(tmp_path, port, Delay=30), port, ready_timeout=0.5)
+        assert not olsrd.start().success
+        assert olsrd.running and not olsr_port_bound(olsrd.pid, port)
+        olsrd.stop()
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+pytest.importorskip('pandas')
+
+import eval_signal
+
+from signal_filters import FILTERS, create_filter
+
+# Largest difference allowed between the online filters and their offline versions (dB)
+TOLERANCE = 1e-9
+
+
+def signal_trace(samples: int = 5000, seed: int = 0):
+    rng = random.Random(seed)
+    return [-60.0 + 20.0 * np.sin(i / 200.0) + rng.gauss(0.0, 3.0) for i in range(samples)]
+
+
+@pytest.mark.parametrize('name', FILTERS)
+@pytest.mark.parametrize('window', [1, 3, 10])
+def test_offline_filter_equals_online_filter(name, window):
+    x = signal_trace()
+    online_filter = create_filter(name, window, 0.3, 0.5, 4.0)
+    online = [online_filter.update(sample) for sample in x]
+    offline = eval_signal.apply_filter(np.array(x), name, window, 0.3, 0.5, 4.0)
+    assert np.max(np.abs(offline - np.array(online))) <= TOLERANCE
+
+
+@pytest.mark.parametrize('name', FILTERS)
+def test_offline_filter_of_short_signals(name):
+    for x in ([], [-70.0], [-70.0, -72.0]):
+        online_filter = create_filter(name)
+        online = [online_filter.update(sample) for sample in x]
+        assert np.allclose(eval_signal.apply_filter(np.array(x), name), online, rtol=0.0, atol=TOLERANCE)
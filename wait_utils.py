@@ -0,0 +1,52 @@
+import time
+
+
+class WaitTimeout(Exception):
+    """
+    Raised when a condition did not become true before the deadline of a wait.
+    """
+
+    def __init__(self, name: str, duration: float, attempts: int):
+        super().__init__("Waiting for {} timed out after {:.3f} s ({} attempts)".format(name, duration, attempts))
+        self.name = name
+        self.duration = duration
+        self.attempts = attempts
+
+
+class WaitResult:
+    """
+    Outcome of a wait: the last value returned by the condition, how long the wait took and how often the condition
+    was checked.
+    """
+
+    def __init__(self, name: str, value, duration: float, attempts: int, success: bool):
+        self.name = name
+        self.value = value
+        self.duration = duration
+        self.attempts = attempts
+        self.success = success
+
+
+def wait_for(condition, name: str = 'condition', timeout: float = 10.0, initial_delay: float = 0.01,
+             max_delay: float = 0.2, backoff: float = 2.0, raise_on_timeout: bool = True):
+    """
+    Calls 'condition' until it returns a truthy value or the deadline 'timeout' (seconds) has passed.
+    Between two checks the delay grows exponentially from 'initial_delay' by the factor 'backoff' up to 'max_delay'.
+    Returns a WaitResult. Raises WaitTimeout if the deadline passed and 'raise_on_timeout' is set.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        value = condition()
+        now = time.monotonic()
+        if value:
+            return WaitResult(name, value, now - start, attempts, True)
+        if now >= deadline:
+            if raise_on_timeout:
+                raise WaitTimeout(name, now - start, attempts)
+            return WaitResult(name, value, now - start, attempts, False)
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)